@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+battery_collector.py
+
+Python replacement for the sampling loop of bt-battery.sh.
+
+bt-battery.sh runs `bluetoothctl devices` and then two `bluetoothctl info`
+processes per device, so one cycle with many paired peripherals spawns
+dozens of processes. This collector reads every device in one batch:
+
+  dbus          one GetManagedObjects() call to BlueZ (org.bluez.Device1 +
+                org.bluez.Battery1); needs the dbus-python module
+  bluetoothctl  one `bluetoothctl devices` plus a single bluetoothctl
+                session that is fed an `info` command per device
+  fake          generated devices, for testing without Bluetooth hardware
+
+Each cycle writes both logs in exactly the format bt-battery.sh uses, with
+one buffered append per file, so the line-oriented readers (battery_log.py,
+bt-battery-plot.py --follow) never see a half-written cycle.
+
+    python3 battery_collector.py                  # one sample, like bt-battery.sh
+    python3 battery_collector.py --all --interval 300
+    python3 battery_collector.py --backend fake --count 5 --interval 1
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+LOG_JSON = SCRIPT_DIR / "logs/json/bt-battery-log.json"   # same files as bt-battery.sh / battery_log.py
+LOG_CSV = SCRIPT_DIR / "logs/csv/bt-battery-log.csv"
+
+try:
+    from zoneinfo import ZoneInfo
+    LOG_TZ = ZoneInfo("Europe/London")   # bt-battery.sh logs UK/GB local time
+except Exception:   # Python < 3.9 or no tz database: local time
+    LOG_TZ = None
+
+NO_BATTERY = "No battery info"
+
+
+# ---- backends ----------------------------------------------------------------
+# A backend's read(mode) returns [{"name", "mac", "battery"}], battery = percent or None;
+# mode is "Connected" or "Paired", as for `bluetoothctl devices`.
+
+class DbusBackend:
+    """All devices and battery levels from one BlueZ ObjectManager call."""
+
+    def __init__(self):
+        import dbus   # optional dependency; ImportError lets "auto" fall back to bluetoothctl
+        self.dbus = dbus
+        self.bus = dbus.SystemBus()
+
+    def read(self, mode):
+        manager = self.dbus.Interface(self.bus.get_object("org.bluez", "/"),
+                                      "org.freedesktop.DBus.ObjectManager")
+        devices = []
+        for interfaces in manager.GetManagedObjects().values():
+            dev = interfaces.get("org.bluez.Device1")
+            if dev is None or not dev.get(mode, False):
+                continue
+            battery = interfaces.get("org.bluez.Battery1", {}).get("Percentage")
+            devices.append({"name": str(dev.get("Alias", dev.get("Name", ""))), "mac": str(dev["Address"]),
+                            "battery": None if battery is None else int(battery)})
+        return devices
+
+
+class BluetoothctlBackend:
+    """`bluetoothctl devices` once, then every `info` through one bluetoothctl session."""
+
+    BATTERY = re.compile(r"Battery Percentage:.*?(?:\((\d+)\)|(\d+)%)")
+
+    def read(self, mode):
+        listing = subprocess.run(["bluetoothctl", "devices", mode], capture_output=True, text=True,
+                                 timeout=10).stdout
+        macs = re.findall(r"^Device ([0-9A-F:]{17})", listing, re.M | re.I)
+        if not macs:
+            return []
+        script = "".join(f"info {mac}\n" for mac in macs) + "quit\n"
+        output = subprocess.run(["bluetoothctl"], input=script, capture_output=True, text=True,
+                                timeout=10 + len(macs)).stdout
+        return self.parse_info(output, macs)
+
+    def parse_info(self, output, macs):
+        """Split the session transcript into per-device blocks ("Device <mac> ..." headers)."""
+        found = {}
+        current = None
+        for line in re.sub(r"\x1b\[[0-9;]*m", "", output).splitlines():
+            header = re.match(r"\s*Device ([0-9A-F:]{17})", line, re.I)
+            if header and header.group(1).upper() in macs:
+                current = found.setdefault(header.group(1).upper(), {"name": "", "battery": None})
+                continue
+            if current is None:
+                continue
+            line = line.strip()
+            if line.startswith("Name:"):
+                current["name"] = line[5:].strip()
+            match = self.BATTERY.search(line)
+            if match:
+                current["battery"] = int(match.group(1) or match.group(2))
+        return [{"mac": mac, **found[mac]} for mac in macs if mac in found]
+
+
+class FakeBackend:
+    """
+    Simulated devices that slowly drain and recharge; `devices` may also be
+    a fixed list of {"name", "mac", "battery"} dicts to return every cycle.
+    """
+
+    def __init__(self, devices=None, count=3, seed=0):
+        self.rng = random.Random(seed)
+        self.fixed = devices
+        self.levels = {f"FA:KE:00:00:00:{i:02X}": [f"Fake device {i}", self.rng.randint(20, 100)]
+                       for i in range(count)}
+
+    def read(self, mode):
+        if self.fixed is not None:
+            return [dict(d) for d in self.fixed]
+        devices = []
+        for mac, state in self.levels.items():
+            state[1] = state[1] - self.rng.randint(0, 2) if state[1] > 5 else 100
+            devices.append({"name": state[0], "mac": mac, "battery": state[1]})
+        return devices
+
+
+BACKENDS = {"dbus": DbusBackend, "bluetoothctl": BluetoothctlBackend, "fake": FakeBackend}
+
+
+def make_backend(name="auto"):
+    if name != "auto":
+        return BACKENDS[name]()
+    try:
+        return DbusBackend()
+    except Exception:   # no dbus-python or no system bus: fall back to the CLI
+        return BluetoothctlBackend()
+
+
+# ---- logging -----------------------------------------------------------------
+
+def log_timestamp(now=None):
+    """ "14-09-2025, 10:14:24+01:00", as bt-battery.sh writes it."""
+    now = now or (datetime.now(LOG_TZ) if LOG_TZ else datetime.now().astimezone())
+    offset = now.strftime("%z")
+    return now.strftime("%d-%m-%Y, %H:%M:%S") + f"{offset[:3]}:{offset[3:]}"
+
+
+def format_cycle(devices, timestamp):
+    """One cycle -> (NDJSON text, CSV text) exactly as bt-battery.sh would append them."""
+    rows = [{"name": d["name"], "mac": d["mac"],
+             "battery": NO_BATTERY if d["battery"] is None else f"{d['battery']}%"} for d in devices]
+    json_text = ""
+    if rows:
+        json_text = json.dumps({"timestamp": timestamp, "devices": rows}, separators=(",", ":"),
+                               ensure_ascii=False) + "\n"
+    csv_text = "".join(f"{timestamp},{r['name']},{r['mac']},{r['battery']}\n" for r in rows)
+    return json_text, csv_text
+
+
+def append(path, text):
+    """Append in one write(2) on an O_APPEND descriptor: readers never see half a cycle."""
+    if not text:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        data = text.encode()
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+def collect(backend, mode="Connected", verbose=False, json_path=LOG_JSON, csv_path=LOG_CSV):
+    """One sampling cycle: read every device, append both logs; returns the devices logged."""
+    devices = [d for d in backend.read(mode) if verbose or d["battery"] is not None]
+    json_text, csv_text = format_cycle(devices, log_timestamp())
+    append(json_path, json_text)
+    append(csv_path, csv_text)
+    return devices
+
+
+def rotate_logs(json_path=LOG_JSON, csv_path=LOG_CSV):
+    """Move finished months into compressed segments (battery_store.py, imported lazily: it needs NumPy)."""
+    from battery_store import BatteryStore
+    store = BatteryStore({"json": json_path, "csv": csv_path})
+    if store.rotation_due():
+        store.rotate()
+
+
+def print_table(devices):
+    print(f"{'Device Name':<25} {'MAC Address':<20} {'Battery':<10}")
+    print(f"{'-----------':<25} {'-----------':<20} {'-------':<10}")
+    for d in devices:
+        battery = NO_BATTERY if d["battery"] is None else f"{d['battery']}%"
+        print(f"{d['name']:<25} {d['mac']:<20} {battery:<10}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Log Bluetooth battery levels (JSON + CSV), all devices per batch.")
+    parser.add_argument("--all", action="store_true", help="include all paired devices, not only connected ones")
+    parser.add_argument("--verbose", action="store_true", help="include devices with no battery info")
+    parser.add_argument("--backend", choices=["auto"] + list(BACKENDS), default="auto")
+    parser.add_argument("--interval", type=float, help="keep sampling every N seconds")
+    parser.add_argument("--count", type=int, help="stop after N cycles (with --interval)")
+    parser.add_argument("--quiet", action="store_true", help="do not print the table")
+    parser.add_argument("--no-rotate", action="store_true",
+                        help="do not move finished months out of the live logs")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    backend = make_backend(args.backend)
+    mode = "Paired" if args.all else "Connected"
+    cycles = 0
+    while True:
+        started = time.monotonic()
+        devices = collect(backend, mode, args.verbose)
+        if not args.quiet:
+            print_table(devices)
+        if not args.no_rotate:
+            rotate_logs()
+        cycles += 1
+        if args.interval is None or (args.count and cycles >= args.count):
+            break
+        time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+battery_log.py
+
+Incremental, checkpointed ingestion of the bt-battery.sh logs.
+
+bt-battery.sh only ever appends to logs/json/bt-battery-log.json (NDJSON)
+and logs/csv/bt-battery-log.csv, so there is no need to re-parse them on
+every run. The parsed readings are kept in a binary cache next to the logs
+(logs/cache/): one typed column file per field (device id, epoch seconds,
+battery level) plus index.json, which holds the device table and, for
+every source log, the byte offset up to which it has been ingested.
+
+Each update() parses only the complete lines appended since the last
+checkpoint; everything older is memory-mapped straight from the column
+files. If a log is truncated or replaced (different inode, smaller size
+or a changed first line) the cache is rebuilt from scratch.
+
+Devices are identified by MAC address (the name is a label that may
+change). bt-battery.sh writes every sample to both logs, so readings are
+de-duplicated by (mac, timestamp) when the series are built.
+
+    log = BatteryLog()
+    new = log.update()
+    for mac, s in log.series().items(): ... s["name"], s["epochs"], s["levels"]
+"""
+
+import ctypes
+import ctypes.util
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import select
+import struct
+import sys
+from array import array
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).parent
+LOG_JSON = SCRIPT_DIR / "logs/json/bt-battery-log.json"
+LOG_CSV = SCRIPT_DIR / "logs/csv/bt-battery-log.csv"
+CACHE_DIR = SCRIPT_DIR / "logs/cache"
+
+# Bump when the cache layout or the parsing rules change
+CACHE_VERSION = 2
+
+# Column name -> array typecode: device id, epoch seconds, battery %
+COLUMNS = {"device": "H", "epoch": "q", "level": "B"}
+
+# Bytes of a log's first line kept in the index to detect a replaced file
+HEAD_BYTES = 64
+
+# bt-battery.sh timestamps, e.g. "14-09-2025, 10:14:24+01:00" (UK/GB local time)
+TS_FORMAT = "%d-%m-%Y, %H:%M:%S%z"
+
+
+# ---- parsing -----------------------------------------------------------------
+
+# "DD-MM-YYYY" + "+HH:MM" -> epoch of that day's midnight; a log only has a few distinct days
+_DAY_CACHE = {}
+
+
+def parse_timestamp(text):
+    """
+    Log timestamp -> epoch seconds (bt-battery.sh format, or ISO 8601).
+
+    "14-09-2025, 10:14:24+01:00" is split at fixed positions: the date and
+    UTC offset are looked up in a cache of parsed days and the time of day
+    is added as plain integers, so strptime runs once per day, not per row.
+    """
+    text = text.strip()
+    if len(text) == 26 and text[10:12] == ", " and text[14] == text[17] == ":":
+        try:
+            h, m, sec = int(text[12:14]), int(text[15:17]), int(text[18:20])
+        except ValueError:
+            h = None
+        if h is not None and h < 24 and m < 60 and sec < 60:
+            day = text[:10] + text[20:]
+            base = _DAY_CACHE.get(day)
+            if base is None:
+                base = _DAY_CACHE[day] = int(datetime.strptime(day, "%d-%m-%Y%z").timestamp())
+            return base + h * 3600 + m * 60 + sec
+    try:
+        return int(datetime.strptime(text, TS_FORMAT).timestamp())
+    except ValueError:
+        return int(datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp())
+
+
+def parse_level(text):
+    """ "50%" -> 50; None for "No battery info" and other non-levels."""
+    try:
+        level = int(str(text).strip().rstrip("%"))
+    except ValueError:
+        return None
+    return level if 0 <= level <= 100 else None
+
+
+def parse_json_line(line):
+    """One NDJSON log line -> [(mac, name, epoch, level)]."""
+    data = json.loads(line)
+    epoch = parse_timestamp(data["timestamp"])
+    readings = []
+    for dev in data.get("devices", []):
+        level = parse_level(dev.get("battery", ""))
+        if level is not None:
+            readings.append((dev.get("mac", ""), dev.get("name", "Unknown"), epoch, level))
+    return readings
+
+
+def parse_csv_line(line):
+    """
+    One CSV log line -> [(mac, name, epoch, level)].
+
+    The timestamp itself contains a comma ("14-09-2025, 10:14:24+01:00"),
+    so the row is split from the right: timestamp, name, mac, battery.
+    """
+    fields = line.rstrip("\r\n").rsplit(",", 3)
+    if len(fields) != 4:
+        return []
+    ts, name, mac, battery = fields
+    level = parse_level(battery)
+    if level is None:
+        return []
+    return [(mac, name, parse_timestamp(ts), level)]
+
+
+PARSERS = {"json": parse_json_line, "csv": parse_csv_line}
+
+
+def ingest_lines(kind, text, new, devices, device_ids):
+    """
+    Parse log text of one kind into the `new` columns ({column: array});
+    devices / device_ids are the device table and its mac -> id map, extended
+    in place. Returns the number of malformed lines that were skipped.
+    """
+    parse = PARSERS[kind]
+    skipped = 0
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            readings = parse(line)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            skipped += 1   # malformed or partial entries are ignored, as before
+            continue
+        for mac, name, epoch, level in readings:
+            mac = mac.strip().upper() or name   # a reading without a MAC is keyed by its name
+            device = device_ids.get(mac)
+            if device is None:
+                device = device_ids[mac] = len(devices)
+                devices.append({"mac": mac, "name": name})
+            else:
+                devices[device]["name"] = name   # latest name wins
+            new["device"].append(device)
+            new["epoch"].append(epoch)
+            new["level"].append(level)
+    return skipped
+
+
+def group_series(device, epoch, level, devices):
+    """
+    Column arrays -> {mac: {"name", "epochs", "levels"}} in time order, one
+    reading per (mac, timestamp): the JSON and CSV copies of a sample collapse
+    into one. devices: the device table the ids refer to.
+    """
+    if not len(epoch):
+        return {}
+    order = np.lexsort((epoch, device))
+    device, epoch, level = device[order], epoch[order], level[order]
+    keep = np.ones(len(epoch), dtype=bool)
+    keep[1:] = (device[1:] != device[:-1]) | (epoch[1:] != epoch[:-1])
+    device, epoch, level = device[keep], epoch[keep], level[keep]
+    starts = np.flatnonzero(np.r_[True, device[1:] != device[:-1]])
+    series = {}
+    for start, stop in zip(starts, np.r_[starts[1:], len(device)]):
+        dev = devices[device[start]]
+        series[dev["mac"]] = {"name": dev["name"], "epochs": epoch[start:stop], "levels": level[start:stop]}
+    return series
+
+
+def merge_series(parts):
+    """Several series dicts (e.g. one per segment) -> one, still sorted and de-duplicated."""
+    merged = {}
+    for part in parts:
+        for mac, s in part.items():
+            merged.setdefault(mac, []).append(s)
+    series = {}
+    for mac, pieces in merged.items():
+        if len(pieces) == 1:
+            series[mac] = pieces[0]
+            continue
+        epochs = np.concatenate([p["epochs"] for p in pieces])
+        levels = np.concatenate([p["levels"] for p in pieces])
+        epochs, first = np.unique(epochs, return_index=True)   # sorted, one reading per timestamp
+        series[mac] = {"name": pieces[-1]["name"], "epochs": epochs, "levels": levels[first]}
+    return series
+
+
+# ---- cache -------------------------------------------------------------------
+
+class BatteryLog:
+    """
+    Battery readings from the JSON and CSV logs, backed by the binary cache.
+
+    sources: {kind: path} with kind "json" or "csv"
+    """
+
+    def __init__(self, sources=None, cache_dir=CACHE_DIR):
+        self.sources = {k: Path(p) for k, p in (sources or {"json": LOG_JSON, "csv": LOG_CSV}).items()}
+        self.cache_dir = Path(cache_dir)
+        self.index_path = self.cache_dir / "index.json"
+        self.index = self._empty_index()
+        self.skipped = 0
+
+    def _empty_index(self):
+        return {"version": CACHE_VERSION, "byteorder": sys.byteorder, "count": 0,
+                "devices": [], "sources": {}}
+
+    def _column_path(self, column):
+        return self.cache_dir / f"{column}.bin"
+
+    # ---- checkpointing -------------------------------------------------------
+
+    def update(self, rebuild=False):
+        """
+        Ingest whatever was appended to the logs since the last run; returns
+        the number of new readings. rebuild=True re-parses everything.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_dir / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)   # another plot or collector may be updating too
+            self.index = self._load_index()
+            if rebuild or not self._sources_intact():
+                self._reset()
+            new = {c: array(t) for c, t in COLUMNS.items()}
+            device_ids = {d["mac"]: i for i, d in enumerate(self.index["devices"])}
+            for kind, path in self.sources.items():
+                self._ingest(kind, path, new, device_ids)
+            if len(new["epoch"]):
+                for column, values in new.items():
+                    with open(self._column_path(column), "ab") as f:
+                        values.tofile(f)
+                self.index["count"] += len(new["epoch"])
+            self._save_index()
+        return len(new["epoch"])
+
+    def _load_index(self):
+        try:
+            index = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            return self._empty_index()
+        if index.get("version") != CACHE_VERSION or index.get("byteorder") != sys.byteorder:
+            return self._empty_index()
+        # Columns written by a run that died before saving its index are cut back
+        for column, typecode in COLUMNS.items():
+            path = self._column_path(column)
+            size = index["count"] * array(typecode).itemsize
+            if not path.exists() or path.stat().st_size < size:
+                return self._empty_index()
+            if path.stat().st_size > size:
+                os.truncate(path, size)
+        return index
+
+    def _save_index(self):
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.index))
+        os.replace(tmp, self.index_path)
+
+    def _reset(self):
+        self.index = self._empty_index()
+        for column in COLUMNS:
+            self._column_path(column).write_bytes(b"")
+
+    def _sources_intact(self):
+        """False if any ingested log was truncated, rotated or rewritten."""
+        for key, state in self.index["sources"].items():
+            path = Path(key)
+            if not path.exists():
+                return False
+            st = path.stat()
+            if st.st_ino != state["inode"] or st.st_size < state["offset"]:
+                return False
+            with open(path, "rb") as f:
+                if hashlib.sha1(f.read(state["head_len"])).hexdigest() != state["head"]:
+                    return False
+        return True
+
+    def _ingest(self, kind, path, new, device_ids):
+        """Parse the complete lines appended to one log since its checkpoint."""
+        if not path.exists():
+            return
+        key = str(path.resolve())
+        state = self.index["sources"].get(key, {"offset": 0})
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            f.seek(state["offset"])
+            chunk = f.read(st.st_size - state["offset"])
+            end = chunk.rfind(b"\n") + 1   # a half-written last line waits for the next run
+            f.seek(0)
+            head = f.read(min(HEAD_BYTES, state["offset"] + end))
+        self.skipped += ingest_lines(kind, chunk[:end].decode("utf-8", "replace"), new,
+                                     self.index["devices"], device_ids)
+        self.index["sources"][key] = {"kind": kind, "inode": st.st_ino, "offset": state["offset"] + end,
+                                      "head_len": len(head), "head": hashlib.sha1(head).hexdigest()}
+
+    # ---- reading -------------------------------------------------------------
+
+    @property
+    def devices(self):
+        """Device table: index = device id, {"mac", "name"}."""
+        return self.index["devices"]
+
+    def columns(self, start=0):
+        """{"device", "epoch", "level"} -> memory-mapped NumPy views of readings start..end."""
+        return {column: map_column(self._column_path(column), typecode, self.index["count"])[start:]
+                for column, typecode in COLUMNS.items()}
+
+    def series(self, start=0):
+        """
+        {mac: {"name", "epochs", "levels"}} (see group_series()).
+        start: only readings cached after the first `start` (see update()).
+        """
+        cols = self.columns(start)
+        return group_series(cols["device"], cols["epoch"], cols["level"], self.devices)
+
+
+def map_column(path, typecode, count):
+    """Read-only typed view of the first `count` items of a column file."""
+    if count == 0 or not path.exists():
+        return np.empty(0, dtype=typecode)
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(mm, dtype=typecode, count=count)
+
+
+# ---- watching ----------------------------------------------------------------
+
+# inotify(7) event masks; the directories are watched so a rotated or newly created log is seen too
+IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE = 0x2, 0x8, 0x80, 0x100
+_EVENT = struct.Struct("iIII")
+
+
+class LogWatcher:
+    """
+    Tells whether any of the logs changed since the last check, without
+    reading them: inotify on their directories where available, otherwise
+    a stat() of each log (size, mtime, inode) per check.
+    """
+
+    def __init__(self, paths):
+        self.paths = [Path(p).resolve() for p in paths]
+        self.names = {p.name.encode() for p in self.paths}
+        self.fd = self._inotify()
+        self.stamps = self._stamps()
+
+    def _inotify(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        for directory in {p.parent for p in self.paths}:
+            directory.mkdir(parents=True, exist_ok=True)
+            if libc.inotify_add_watch(fd, str(directory).encode(), mask) < 0:
+                os.close(fd)
+                return None
+        return fd
+
+    def _stamps(self):
+        stamps = []
+        for path in self.paths:
+            try:
+                st = path.stat()
+                stamps.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                stamps.append(None)
+        return stamps
+
+    @property
+    def mode(self):
+        return "inotify" if self.fd is not None else "polling"
+
+    def changed(self, timeout=0):
+        """True if a log was written, created or replaced (waits up to `timeout` seconds)."""
+        if self.fd is None:
+            stamps = self._stamps()
+            changed, self.stamps = stamps != self.stamps, stamps
+            return changed
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return False
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            pos = 0
+            while pos < len(data):
+                _wd, _mask, _cookie, size = _EVENT.unpack_from(data, pos)
+                name = data[pos + _EVENT.size:pos + _EVENT.size + size].rstrip(b"\0")
+                changed = changed or name in self.names
+                pos += _EVENT.size + size
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+# ---- downsampling ------------------------------------------------------------
+
+def downsample(epochs, levels, max_points):
+    """
+    Min/max bucketing: cut the time range into max_points // 2 equal buckets
+    (about one per horizontal pixel) and keep the lowest and highest reading
+    of each, so drops and charge spikes survive. Returns (epochs, levels) in
+    time order with at most max_points readings (+ the first and last one).
+    """
+    n = len(epochs)
+    buckets = max(1, max_points // 2)
+    if max_points <= 0 or n <= max_points:
+        return epochs, levels
+    span = int(epochs[-1] - epochs[0]) + 1
+    bucket = (epochs - epochs[0]) * buckets // span
+    order = np.lexsort((levels, bucket))           # by bucket, then by level
+    edges = np.flatnonzero(np.diff(bucket[order])) + 1
+    lowest = order[np.r_[0, edges]]
+    highest = order[np.r_[edges - 1, n - 1]]
+    keep = np.unique(np.concatenate((lowest, highest, [0, n - 1])))
+    return epochs[keep], levels[keep]
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+battery_render.py
+
+Chart drawing for bt-battery-plot.py, kept free of pyplot so it can run
+headless: draw()/decorate() work on any Axes, and render() writes one
+chart per device plus a combined one with the Agg canvas, in a pool of
+worker processes (this module is importable, so the workers can find
+render_chart()).
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from battery_log import downsample
+
+TITLE = "Bluetooth Device Battery Levels Over Time (Merged JSON + CSV)"
+
+
+def draw(ax, lines, series, max_points):
+    """Create or update one line per device; long histories are reduced to the min/max of every pixel column."""
+    for mac, s in series.items():
+        epochs, levels = downsample(s["epochs"], s["levels"], max_points)
+        times = [datetime.fromtimestamp(e) for e in epochs.tolist()]
+        marker = "o" if len(epochs) <= 200 else None   # markers only while they are distinguishable
+        if mac in lines:
+            lines[mac].set_data(times, levels)
+            lines[mac].set_marker(marker)
+        else:
+            lines[mac], = ax.plot(times, levels, marker=marker, label=f"{s['name']} ({mac})")
+
+
+def decorate(ax, title=TITLE):
+    ax.set_xlabel("Time")
+    ax.set_ylabel("Battery %")
+    ax.set_title(title)
+    if ax.get_lines():
+        ax.legend()
+    ax.grid(True)
+
+
+def render_chart(path, series, title, max_points):
+    """Process-pool worker: one chart to a PNG/SVG file with the Agg canvas, no pyplot or display."""
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    draw(ax, {}, series, max_points)
+    decorate(ax, title)
+    fig.tight_layout()
+    fig.savefig(path)
+    return str(path)
+
+
+def render(series, out_dir, fmt="png", max_points=2000):
+    """Write one chart per device plus all-devices.<fmt> in parallel; returns the paths."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    jobs = [(out_dir / f"all-devices.{fmt}", series, TITLE)]
+    for mac, s in series.items():
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", s["name"]).strip("-").lower() or "device"
+        key = re.sub(r"[^A-Za-z0-9]+", "", mac).lower()   # a device logged without a MAC is keyed by its name
+        jobs.append((out_dir / f"{slug}-{key}.{fmt}", {mac: s},
+                     f"{s['name']} ({mac}) Battery Level Over Time"))
+    with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+        futures = [pool.submit(render_chart, path, data, title, max_points) for path, data, title in jobs]
+        return [f.result() for f in futures]
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+battery_store.py
+
+Segmented, compressed storage for the battery logs.
+
+bt-battery.sh (and battery_collector.py) keep appending to the two live
+logs. rotate() moves every reading of a finished month out of them into
+gzip-compressed monthly segments under logs/archive/:
+
+    logs/archive/2025-09.json.gz   NDJSON lines of September 2025
+    logs/archive/2025-09.csv.gz    CSV lines of September 2025
+    logs/archive/index.json        per segment: time range, devices, readings
+
+so the live logs only ever hold the current month. load() takes a time
+range and a device filter, opens only the segments whose index entry
+overlaps them (each one parsed once into a binary column cache under
+logs/cache/segments/) and merges them with the live logs, so plotting last
+week reads the current month instead of the whole history.
+
+    python3 battery_store.py --rotate     # also done by the plot and the collector
+    python3 battery_store.py              # list the segments
+"""
+
+import argparse
+import fcntl
+import gzip
+import json
+import os
+import shutil
+import time
+from array import array
+from pathlib import Path
+
+from battery_log import (CACHE_DIR, COLUMNS, SCRIPT_DIR, BatteryLog, group_series, ingest_lines, map_column,
+                         merge_series, parse_timestamp)
+
+ARCHIVE_DIR = SCRIPT_DIR / "logs/archive"
+
+
+def month_of(epoch):
+    """Epoch seconds -> "YYYY-MM" in local time (the segment a reading belongs to)."""
+    return time.strftime("%Y-%m", time.localtime(epoch))
+
+
+def line_epoch(kind, line):
+    """Timestamp of one raw log line, or None if the line cannot be parsed."""
+    try:
+        if kind == "json":
+            if line.startswith('{"timestamp":"'):   # as bt-battery.sh writes it: no need to decode the line
+                return parse_timestamp(line[14:line.index('"', 14)])
+            return parse_timestamp(json.loads(line)["timestamp"])
+        return parse_timestamp(line.rsplit(",", 3)[0])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def matches(mac, name, devices):
+    """Device filter: any entry equal to the MAC or contained (case-insensitively) in the name."""
+    if not devices:
+        return True
+    return any(d.upper() == mac or d.lower() in name.lower() for d in devices)
+
+
+class BatteryStore:
+    """
+    The live logs (through a BatteryLog) plus the compressed monthly segments.
+
+    sources: {kind: path} of the live logs, as for BatteryLog
+    """
+
+    def __init__(self, sources=None, archive_dir=ARCHIVE_DIR, cache_dir=CACHE_DIR):
+        self.live = BatteryLog(sources, cache_dir)
+        self.archive_dir = Path(archive_dir)
+        self.cache_dir = Path(cache_dir) / "segments"
+        self.index_path = self.archive_dir / "index.json"
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            return json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            return {"segments": {}}
+
+    def _save_index(self):
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.index, indent=1, sort_keys=True))
+        os.replace(tmp, self.index_path)
+
+    # ---- rotation ------------------------------------------------------------
+
+    def rotation_due(self, now=None):
+        """True if a live log starts with a reading from before the current month."""
+        current = month_of(now or time.time())
+        for kind, path in self.live.sources.items():
+            try:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        epoch = line_epoch(kind, line)
+                        if epoch is not None:
+                            if month_of(epoch) < current:
+                                return True
+                            break
+            except OSError:
+                continue
+        return False
+
+    def rotate(self, now=None):
+        """
+        Move the lines of every finished month from the live logs into their
+        compressed segments; returns the months that were written.
+
+        A live log is renamed before it is read, so writers that append in the
+        meantime start a fresh file; the current month's lines are put back in
+        front of what they wrote (see _restore_live). Lines that cannot be
+        parsed stay in the live log.
+
+        Each step is recorded in the index ("rotating": per kind, the renamed
+        file's inode, the segment sizes before the append and whether the
+        append is done), so a rotation interrupted at any point is finished by
+        the next one without archiving a line twice.
+        """
+        current = month_of(now or time.time())
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        touched = set()
+        with open(self.archive_dir / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.index = self._load_index()
+            pending = self.index.setdefault("rotating", {})
+            for kind, path in self.live.sources.items():
+                rotating = path.with_name(path.name + ".rotating")
+                if not rotating.exists():   # else: left over by an interrupted rotation, finish it
+                    if not path.exists():
+                        continue
+                    os.rename(path, rotating)
+                ino = os.stat(rotating).st_ino
+                state = pending.get(kind)
+                if state is not None and state["ino"] != ino:
+                    state = None
+                keep, closed = [], {}
+                with open(rotating, encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        epoch = line_epoch(kind, line)
+                        month = month_of(epoch) if epoch is not None else current
+                        (keep if month >= current else closed.setdefault(month, [])).append(line)
+                if closed and not (state and state["archived"]):
+                    if state:   # interrupted while appending: cut the segments back to where they ended
+                        for name, size in state["sizes"].items():
+                            if (self.archive_dir / name).exists():
+                                os.truncate(self.archive_dir / name, size)
+                    sizes = {}
+                    for month in closed:
+                        segment = self.archive_dir / f"{month}.{kind}.gz"
+                        sizes[segment.name] = segment.stat().st_size if segment.exists() else 0
+                    pending[kind] = {"ino": ino, "sizes": sizes, "archived": False}
+                    self._save_index()
+                    for month, lines in sorted(closed.items()):
+                        with gzip.open(self.archive_dir / f"{month}.{kind}.gz", "at", encoding="utf-8") as seg:
+                            seg.writelines(lines)   # a new gzip member per rotation; readers see one stream
+                        self._index_segment(month, kind, lines)
+                    pending[kind]["archived"] = True
+                    self._save_index()
+                touched.update(closed)
+                if keep:
+                    self._restore_live(path, keep)
+                os.unlink(rotating)
+                pending.pop(kind, None)
+                self._save_index()
+        return sorted(touched)
+
+    @staticmethod
+    def _restore_live(path, keep):
+        """
+        Make `keep` (the current month's lines) the start of the live log again,
+        followed by whatever writers appended since it was renamed, so the log
+        stays in time order: both go into a temp file that replaces the log.
+        Lines a writer appends to the old file while it is being replaced are
+        copied over afterwards.
+        """
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            appended = open(path, "rb")
+        except FileNotFoundError:
+            appended = None
+        with open(tmp, "wb") as out:
+            out.write("".join(keep).encode("utf-8"))
+            if appended:
+                shutil.copyfileobj(appended, out)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+        if appended:
+            with appended:
+                late = appended.read()
+            if late:
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+                with os.fdopen(fd, "wb") as live:
+                    live.write(late)
+
+    def _index_segment(self, month, kind, lines):
+        """Fold newly archived lines into the segment's index entry."""
+        entry = self.index["segments"].setdefault(month, {"start": None, "end": None, "devices": {},
+                                                          "readings": 0, "files": [], "version": 0})
+        new = {c: array(t) for c, t in COLUMNS.items()}
+        devices, device_ids = [], {}
+        ingest_lines(kind, "".join(lines), new, devices, device_ids)
+        name = f"{month}.{kind}.gz"
+        if name not in entry["files"]:
+            entry["files"].append(name)
+        if len(new["epoch"]):
+            entry["start"] = min(filter(None, [entry["start"], min(new["epoch"])]))
+            entry["end"] = max(filter(None, [entry["end"], max(new["epoch"])]))
+        entry["devices"].update({d["mac"]: d["name"] for d in devices})
+        entry["version"] += 1   # invalidates the segment's column cache
+        # Counted over the whole segment: bt-battery.sh logs every sample to both
+        # logs, and the series hold each (mac, timestamp) pair once
+        entry["readings"] = sum(len(s["epochs"]) for s in self._segment_series(month).values())
+
+    # ---- reading -------------------------------------------------------------
+
+    def segments(self, since=None, until=None, devices=None):
+        """Months whose index entry overlaps [since, until] and holds a matching device."""
+        selected = []
+        for month, entry in sorted(self.index["segments"].items()):
+            if entry["start"] is None:
+                continue
+            if (since is not None and entry["end"] < since) or (until is not None and entry["start"] > until):
+                continue
+            if not any(matches(mac, name, devices) for mac, name in entry["devices"].items()):
+                continue
+            selected.append(month)
+        return selected
+
+    def _segment_series(self, month):
+        """Series of one segment, from its column cache (built on first use)."""
+        entry = self.index["segments"][month]
+        cache = self.cache_dir / month
+        try:
+            meta = json.loads((cache / "meta.json").read_text())
+        except (OSError, ValueError):
+            meta = None
+        if meta is None or meta["version"] != entry["version"]:
+            new = {c: array(t) for c, t in COLUMNS.items()}
+            devices, device_ids = [], {}
+            for name in entry["files"]:
+                kind = name.split(".")[-2]
+                with gzip.open(self.archive_dir / name, "rt", encoding="utf-8", errors="replace") as f:
+                    ingest_lines(kind, f.read(), new, devices, device_ids)
+            cache.mkdir(parents=True, exist_ok=True)
+            for column, values in new.items():
+                with open(cache / f"{column}.bin", "wb") as f:
+                    values.tofile(f)
+            meta = {"version": entry["version"], "count": len(new["epoch"]), "devices": devices}
+            (cache / "meta.json").write_text(json.dumps(meta))
+        cols = {c: map_column(cache / f"{c}.bin", t, meta["count"]) for c, t in COLUMNS.items()}
+        return group_series(cols["device"], cols["epoch"], cols["level"], meta["devices"])
+
+    def load(self, since=None, until=None, devices=None, rebuild=False):
+        """
+        {mac: {"name", "epochs", "levels"}} for readings in [since, until]
+        (epoch seconds, None = open) of the devices matching `devices`
+        (MACs or name fragments, None = all), from the live logs plus only
+        the segments that can contain such readings.
+        """
+        self.index = self._load_index()   # a collector may have rotated since
+        if rebuild:
+            for meta in self.cache_dir.glob("*/meta.json"):
+                meta.unlink()
+        self.live.update(rebuild=rebuild)
+        parts = [self._segment_series(month) for month in self.segments(since, until, devices)]
+        parts.append(self.live.series())
+        return select(merge_series(parts), since, until, devices)
+
+
+def select(series, since=None, until=None, devices=None):
+    """Cut a series dict down to a time range and a device filter."""
+    selected = {}
+    for mac, s in series.items():
+        if not matches(mac, s["name"], devices):
+            continue
+        epochs = s["epochs"]
+        lo = 0 if since is None else int(epochs.searchsorted(since, "left"))
+        hi = len(epochs) if until is None else int(epochs.searchsorted(until, "right"))
+        if hi > lo:
+            selected[mac] = {"name": s["name"], "epochs": epochs[lo:hi], "levels": s["levels"][lo:hi]}
+    return selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rotate the battery logs into monthly segments / list them.")
+    parser.add_argument("--rotate", action="store_true", help="archive every finished month now")
+    args = parser.parse_args()
+    store = BatteryStore()
+    if args.rotate:
+        print("Archived:", ", ".join(store.rotate()) or "nothing")
+    for month, entry in sorted(store.index["segments"].items()):
+        print(f"{month}  {entry['readings']:>8} readings  {len(entry['devices']):>3} devices  "
+              f"{', '.join(entry['files'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,168 @@
 #!/usr/bin/env python3
-import json, csv, matplotlib.pyplot as plt
+import argparse
+import re
+import time
 from datetime import datetime
 from pathlib import Path
 
-SCRIPT_DIR = Path(__file__).parent
-LOG_JSON = SCRIPT_DIR / "logs/json/bt-battery-log.json"
-LOG_CSV = SCRIPT_DIR / "logs/csv/bt-battery-log.csv"
-
-entries = []
-
-# Read JSON logs if they exist
-if LOG_JSON.exists():
-    with open(LOG_JSON, "r") as f:
-        for line in f:
-            try:
-                data = json.loads(line)
-                ts = datetime.fromisoformat(data["timestamp"].replace("Z", "+00:00"))
-                for dev in data["devices"]:
-                    name = dev.get("name", "Unknown")
-                    battery = dev.get("battery", "0%").rstrip("%")
-                    try: battery = int(battery)
-                    except ValueError: continue
-                    entries.append((name, ts, battery))
-            except json.JSONDecodeError:
-                continue
-
-# Read CSV logs if they exist
-if LOG_CSV.exists():
-    with open(LOG_CSV, "r") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) != 4: continue
-            ts_str, name, mac, battery = row
-            try:
-                ts = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
-                battery = int(battery.rstrip("%"))
-            except Exception: continue
-            entries.append((name, ts, battery))
-
-if not entries:
-    raise FileNotFoundError("No valid JSON or CSV log entries found.")
-
-# Group entries by device
-devices = {}
-for name, ts, battery in entries:
-    devices.setdefault(name, []).append((ts, battery))
-
-# Plot
-plt.figure(figsize=(10, 6))
-for name, values in devices.items():
-    values.sort(key=lambda x: x[0])
-    times, bats = zip(*values)
-    plt.plot(times, bats, marker="o", label=name)
-
-plt.xlabel("Time")
-plt.ylabel("Battery %")
-plt.title("Bluetooth Device Battery Levels Over Time (Merged JSON + CSV)")
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.show()
+import numpy as np
+
+from battery_log import LogWatcher
+from battery_render import decorate, draw, render
+from battery_store import BatteryStore, select
+
+UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_when(text):
+    """ "7d", "12h", "30m", "2w" (ago) or "2025-09-14[ 10:00]" -> epoch seconds."""
+    match = re.fullmatch(r"(\d+)([mhdw])", text.strip())
+    if match:
+        return int(time.time()) - int(match.group(1)) * UNITS[match.group(2)]
+    try:
+        return int(datetime.fromisoformat(text.strip()).timestamp())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a time or duration: {text!r}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Plot Bluetooth battery levels from the JSON + CSV logs.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="re-parse the whole logs instead of only the newly appended lines")
+    parser.add_argument("--max-points", type=int,
+                        help="readings drawn per device (default: two per pixel of the figure width, 0 = all)")
+    parser.add_argument("--follow", action="store_true",
+                        help="keep the window open and add new readings as bt-battery.sh logs them")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between checks for new log lines in --follow mode")
+    parser.add_argument("--since", type=parse_when, help="start of the range: 7d, 12h, 2025-09-14, ...")
+    parser.add_argument("--until", type=parse_when, help="end of the range (same formats)")
+    parser.add_argument("--device", action="append",
+                        help="only this device (MAC or part of the name); repeat for several")
+    parser.add_argument("--summary", action="store_true",
+                        help="print level, min/max and drain rate per device instead of plotting")
+    parser.add_argument("--render", type=Path, metavar="DIR",
+                        help="write one chart per device plus a combined one to DIR (no display needed)")
+    parser.add_argument("--format", choices=["png", "svg"], default="png", help="file format for --render")
+    return parser.parse_args()
+
+
+# ---- text summary (no matplotlib) --------------------------------------------
+
+def drain_rate(epochs, levels):
+    """% per hour over the latest discharge (since the last time the level went up), or None."""
+    rises = np.flatnonzero(np.diff(levels.astype(np.int16)) > 0)
+    start = rises[-1] + 1 if len(rises) else 0
+    hours = (int(epochs[-1]) - int(epochs[start])) / 3600
+    if hours <= 0:
+        return None
+    return (int(levels[start]) - int(levels[-1])) / hours
+
+
+def format_duration(hours):
+    if hours >= 48:
+        return f"{hours / 24:.1f}d"
+    return f"{hours:.1f}h"
+
+
+def summary(series):
+    """One line per device: current level, min/max, drain rate and time left at that rate."""
+    rows = [("Device", "MAC", "Level", "Min", "Max", "Drain/h", "Empty in", "Last reading")]
+    for mac, s in sorted(series.items(), key=lambda kv: kv[1]["name"].lower()):
+        epochs, levels = s["epochs"], s["levels"]
+        rate = drain_rate(epochs, levels)
+        left = format_duration(int(levels[-1]) / rate) if rate and rate > 0 else "-"
+        rows.append((s["name"], mac, f"{levels[-1]}%", f"{levels.min()}%", f"{levels.max()}%",
+                     "-" if rate is None else f"{rate:.2f}%", left,
+                     datetime.fromtimestamp(int(epochs[-1])).strftime("%d-%m-%Y %H:%M")))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.ljust(w) for cell, w in zip(row, widths)).rstrip() for row in rows)
+
+
+# ---- live view ---------------------------------------------------------------
+
+def follow(store, series, fig, ax, lines, max_points, interval, since=None, until=None, devices=None):
+    """
+    Re-check the logs every `interval` seconds from the GUI event loop. Only
+    lines appended since the last check are parsed, and only the devices that
+    got new readings have their line data replaced; nothing is re-plotted.
+    """
+    log = store.live
+    watcher = LogWatcher(log.sources.values())
+    print(f"Following {', '.join(str(p) for p in log.sources.values())} ({watcher.mode})")
+
+    def poll():
+        if not watcher.changed():
+            return
+        start = log.index["count"]
+        added = log.update()
+        if not added:
+            return
+        if log.index["count"] != start + added:   # a log was rotated or replaced and the cache rebuilt
+            changed = store.load(since, until, devices)
+            series.clear()
+        else:
+            changed = {}
+            for mac, new in select(log.series(start), since, until, devices).items():
+                old = series.get(mac)
+                if old is not None:
+                    fresh = new["epochs"] > old["epochs"][-1]   # drops the other log's copy of a sample
+                    if not fresh.any():
+                        continue
+                    new = {"name": new["name"], "epochs": np.concatenate((old["epochs"], new["epochs"][fresh])),
+                           "levels": np.concatenate((old["levels"], new["levels"][fresh]))}
+                changed[mac] = new
+        if not changed:
+            return
+        series.update(changed)
+        known = set(lines)
+        draw(ax, lines, changed, max_points)
+        if set(lines) != known:
+            ax.legend()
+        ax.relim()
+        ax.autoscale_view()
+        fig.canvas.draw_idle()
+
+    timer = fig.canvas.new_timer(interval=int(interval * 1000))
+    timer.add_callback(poll)
+    timer.start()
+    return timer
+
+
+def main():
+    args = parse_args()
+
+    # Finished months go to compressed segments; only the ones overlapping the range are read.
+    # Of the live logs, only what bt-battery.sh appended since the last run is parsed.
+    store = BatteryStore()
+    if store.rotation_due():
+        store.rotate()
+    series = store.load(args.since, args.until, args.device, rebuild=args.rebuild)
+    if not series and not args.follow:
+        raise FileNotFoundError("No valid JSON or CSV log entries found.")
+
+    if args.summary:
+        print(summary(series))
+        return
+    if args.render:
+        max_points = args.max_points if args.max_points is not None else 2000   # 10in x 100dpi, two per pixel
+        for path in render(series, args.render, args.format, max_points):
+            print("Wrote", path)
+        return
+
+    # Plot (pyplot is only imported here: it is slow to load and needs a display)
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 6))
+    max_points = args.max_points if args.max_points is not None else int(2 * fig.get_figwidth() * fig.dpi)
+    lines = {}
+    draw(ax, lines, series, max_points)
+    decorate(ax)
+    fig.tight_layout()
+    if args.follow:
+        timer = follow(store, series, fig, ax, lines, max_points, args.interval,   # noqa: F841 (keep it alive)
+                       args.since, args.until, args.device)
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
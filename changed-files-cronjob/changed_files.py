@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+changed_files.py — Python engine for changed_files.sh
+
+Writes the same log entries as changed_files.sh: every regular file under
+SEARCH_PATH modified since the last run, the 10 biggest of them (in du -h
+notation) and the full list. The differences are in how they are found:
+
+* the exclusions file is compiled into a trie of path components once; each
+  directory carries its trie node, so an excluded path is pruned with one
+  dict lookup instead of a -path test per exclusion
+* directories are read by parallel os.scandir() workers (slow or network
+  filesystems get many requests in flight)
+* each changed file is stat()ed once, during the walk: its size goes into a
+  bounded heap for the top 10, so there is no temporary file, no second
+  `du` over the list and no argument list that can exceed ARG_MAX
+
+Entries in the exclusions file that contain *, ? or [ are matched against
+the whole path like find -path does, the others through the trie.
+"""
+
+import argparse
+import fnmatch
+import heapq
+import math
+import os
+import queue
+import stat
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Log file location
+LOG_FILE = "/var/log/changed_files.log"
+
+# Timestamp file to track last run
+STAMP_FILE = "/var/log/changed_files.stamp"
+
+# Directories to search
+SEARCH_PATH = "/"
+
+# Exclusions file (one path per line)
+EXCLUDES_FILE = "/etc/changed_files_excludes.txt"
+
+TOP_N = 10
+
+EXCLUDED = object()   # trie node of an excluded path
+
+
+# ---- exclusions --------------------------------------------------------------
+
+def load_excludes(path):
+    """Exclusion lines (blank lines and comments skipped); none if the file is missing."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+    except FileNotFoundError:
+        return []
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def compile_excludes(excludes):
+    """
+    Exclusions -> (trie, patterns). The trie maps path components to child
+    nodes, with EXCLUDED as the node of an excluded path; patterns are the
+    entries with glob characters.
+    """
+    trie, patterns = {}, []
+    for path in excludes:
+        if any(c in path for c in "*?["):
+            patterns.append(path)
+            continue
+        node = trie
+        parts = [p for p in path.split("/") if p]
+        for part in parts[:-1]:
+            child = node.setdefault(part, {})
+            if child is EXCLUDED:
+                break   # a parent is already excluded
+            node = child
+        else:
+            if parts:
+                node[parts[-1]] = EXCLUDED
+    return trie, patterns
+
+
+# ---- walk --------------------------------------------------------------------
+
+def disk_usage(st):
+    """Bytes allocated for a file, as du counts them."""
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+
+def scan_dir(path, node, patterns, since_ns):
+    """
+    Worker: read one directory. Returns (subdirectories as (path, trie node),
+    changed regular files as (bytes, path), errors).
+    """
+    subdirs, changed, errors = [], [], 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                child = node.get(entry.name) if node else None
+                if child is EXCLUDED:
+                    continue
+                if patterns and any(fnmatch.fnmatchcase(entry.path, p) for p in patterns):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append((entry.path, child))
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    errors += 1
+                    continue
+                if stat.S_ISREG(st.st_mode) and st.st_mtime_ns > since_ns:
+                    changed.append((disk_usage(st), entry.path))
+    except OSError:
+        errors += 1
+    return subdirs, changed, errors
+
+
+def find_changed(root, excludes, since, workers=None, top=TOP_N):
+    """
+    Regular files under `root` modified after `since` (epoch seconds), like
+    `find root <excludes> -type f -newermt @since`. Returns (sorted paths,
+    the `top` largest as [(bytes, path)], unreadable entries); the walk is
+    parallel, so sorting keeps the log the same from run to run.
+    """
+    trie, patterns = compile_excludes(excludes)
+    root = os.path.abspath(root)
+    node = trie   # the trie is rooted at "/": walk it down to `root`
+    for part in [p for p in root.split("/") if p]:
+        node = node.get(part) if node else None
+        if node is EXCLUDED:
+            return [], [], 0
+    since_ns = int(since) * 1_000_000_000
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    results = queue.Queue()
+    paths, largest, errors = [], [], 0
+
+    def task(path, node):
+        try:
+            results.put(scan_dir(path, node, patterns, since_ns))
+        except BaseException as e:   # always answer, or the loop below waits forever
+            results.put(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pool.submit(task, root, node)
+        outstanding = 1
+        while outstanding:
+            result = results.get()
+            outstanding -= 1
+            if isinstance(result, BaseException):
+                raise result
+            subdirs, changed, dir_errors = result
+            errors += dir_errors
+            for size, path in changed:
+                paths.append(path)
+                if len(largest) < top:
+                    heapq.heappush(largest, (size, path))
+                elif size > largest[0][0]:
+                    heapq.heapreplace(largest, (size, path))
+            for path, node in subdirs:
+                pool.submit(task, path, node)
+            outstanding += len(subdirs)
+    paths.sort()
+    return paths, sorted(largest, reverse=True), errors
+
+
+# ---- log ---------------------------------------------------------------------
+
+def du_size(size):
+    """Bytes -> du -h notation: 0, 4.0K, 5.3M, 12M (rounded up like du)."""
+    if size < 1024:
+        return str(size)
+    value = size
+    for unit in "KMGTPE":
+        value /= 1024
+        if value < 10:
+            tenths = math.ceil(value * 10) / 10
+            if tenths < 10:
+                return f"{tenths:.1f}{unit}"
+        whole = math.ceil(value)
+        if whole < 1024:
+            return f"{whole}{unit}"
+    return f"{math.ceil(value)}E"
+
+
+def log_entry(paths, largest):
+    lines = [f"========== {time.strftime('%a %b %e %H:%M:%S %Z %Y')} ==========",
+             f"Changed files since last run: {len(paths)}"]
+    if paths:
+        lines.append(f"--- Top {TOP_N} biggest changed files ---")
+        lines += [f"{du_size(size)}\t{path}" for size, path in largest]
+        lines += ["", "--- Full list of changed files ---"]
+        lines += paths
+    else:
+        lines.append("No changes detected.")
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Log the files changed since the last run (see changed_files.sh).")
+    parser.add_argument("--path", default=SEARCH_PATH, help="directory to search (default: %(default)s)")
+    parser.add_argument("--log", default=LOG_FILE, help="log file to append to (default: %(default)s)")
+    parser.add_argument("--stamp", default=STAMP_FILE, help="time of the last run (default: %(default)s)")
+    parser.add_argument("--excludes", default=EXCLUDES_FILE, help="paths to skip (default: %(default)s)")
+    parser.add_argument("--workers", type=int, help="parallel directory reads")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # If stamp file doesn't exist, initialize to 24h ago
+    if not os.path.exists(args.stamp):
+        with open(args.stamp, "w") as f:
+            f.write(f"{int(time.time()) - 86400}\n")
+    with open(args.stamp) as f:
+        last_run = int(f.read().strip())
+    current_time = int(time.time())
+
+    paths, largest, errors = find_changed(args.path, load_excludes(args.excludes), last_run, args.workers)
+    if errors:   # find reports these on stderr (cron mails them)
+        print(f"changed_files: {errors} unreadable entries skipped", file=sys.stderr)
+
+    # One append per run: the whole entry lands in the log at once
+    with open(args.log, "a", encoding="utf-8", errors="surrogateescape") as log:
+        log.write(log_entry(paths, largest))
+
+    # Update stamp
+    with open(args.stamp, "w") as f:
+        f.write(f"{current_time}\n")
+
+
+if __name__ == "__main__":
+    main()
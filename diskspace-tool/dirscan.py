@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+dirscan.py — parallel directory-size scanner for diskspace.py --scan
+
+Every directory is read by one os.scandir() task on a thread pool (scandir
+and stat release the GIL, so slow disks and network storage are read with
+many requests in flight). The coordinating thread folds the results into
+per-directory totals the way `du -x` counts:
+
+* disk usage is allocated blocks (st_blocks * 512), directories included
+* a file with several hard links is counted once, by (st_dev, st_ino)
+* directories on another filesystem than PATH are not entered
+
+Only directories whose subtree is still being scanned are held in memory;
+the N largest directories and files are kept in bounded heaps.
+
+With a cache file (SQLite), every directory's inode, mtime, own bytes, file
+count, subdirectory names, hard-linked and largest files and subtree total
+are stored. On the next scan a directory whose inode and mtime are unchanged
+is not listed again: its cached entries are reused and only its
+subdirectories are stat()ed, to find out which of them changed. A directory's
+mtime changes when entries are created, removed or renamed in it, not when an
+existing file grows in place, so that growth is only seen once the directory
+changes or on a scan with rebuild=True.
+"""
+
+import heapq
+import json
+import os
+import queue
+import sqlite3
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TOP_N = 10
+CACHE_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY, ino INTEGER, mtime_ns INTEGER, own INTEGER, files INTEGER, errors INTEGER,
+    total INTEGER, subdirs TEXT, linked TEXT, big TEXT
+);
+"""
+
+
+def disk_usage(st):
+    """Bytes allocated for an inode (like du); st_size where st_blocks is unknown (Windows)."""
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+
+def entry_stat(entry):
+    """
+    lstat() of a scandir entry. On Windows DirEntry.stat() leaves st_dev,
+    st_ino and st_nlink at 0, which the filesystem check and the hard-link
+    key need, so the entry is stat()ed by path there.
+    """
+    if os.name == "nt":
+        return os.stat(entry.path, follow_symlinks=False)
+    return entry.stat(follow_symlinks=False)
+
+
+class TopN:
+    """Bounded min-heap keeping the N largest (size, path) pairs."""
+
+    def __init__(self, n):
+        self.n = n
+        self.heap = []
+
+    @property
+    def threshold(self):
+        """Smallest size that can still get in (0 while the heap is not full)."""
+        return self.heap[0][0] if len(self.heap) >= self.n else 0
+
+    def push(self, size, path):
+        if len(self.heap) < self.n:
+            heapq.heappush(self.heap, (size, path))
+        elif size > self.heap[0][0]:
+            heapq.heapreplace(self.heap, (size, path))
+
+    def largest(self):
+        return sorted(self.heap, reverse=True)
+
+
+def scan_dir(path, dev, threshold):
+    """
+    Worker: read one directory. Returns (own bytes, file count, subdirectories
+    as (path, stat), hard-linked files as (key, size, path), files above
+    `threshold` as (size, path), errors). Nothing below this directory is touched.
+    """
+    own = files = 0
+    subdirs, linked, big, errors = [], [], [], 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    st = entry_stat(entry)
+                except OSError:
+                    errors += 1
+                    continue
+                if st.st_dev != dev:
+                    continue   # a mount point of another filesystem (-x)
+                if stat.S_ISDIR(st.st_mode):
+                    subdirs.append((entry.path, st))
+                    continue
+                size = disk_usage(st)
+                files += 1
+                if st.st_nlink > 1:
+                    linked.append(((st.st_dev, st.st_ino), size, entry.path))
+                    continue
+                own += size
+                if size > threshold:
+                    big.append((size, entry.path))
+    except OSError:
+        errors += 1
+    return own, files, subdirs, linked, big, errors
+
+
+def reuse_dir(path, dev, row):
+    """
+    Worker: scan_dir()'s result for a directory that is unchanged since it was
+    cached, from its cache row; only the subdirectories are stat()ed. None if
+    one of them is gone or no longer a directory on this filesystem.
+    """
+    _, _, own, files, errors, _, names, linked, big = row
+    subdirs = []
+    for name in json.loads(names):
+        sub = os.path.join(path, name)
+        try:
+            st = os.stat(sub, follow_symlinks=False)
+        except OSError:
+            return None
+        if not stat.S_ISDIR(st.st_mode) or st.st_dev != dev:
+            return None
+        subdirs.append((sub, st))
+    return (own, files, subdirs, [(tuple(key), size, p) for key, size, p in json.loads(linked)],
+            [tuple(b) for b in json.loads(big)], errors)
+
+
+class ScanCache:
+    """
+    The per-directory results of earlier scans (see the module docstring).
+    Used from the coordinating thread only; nothing is committed before save().
+    """
+
+    def __init__(self, path, top, rebuild=False):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        stored_top = int(meta.get("top", 0))
+        # Each row keeps its directory's `top` largest files: a larger `top` needs them all re-read
+        self.stale = rebuild or meta.get("version") != str(CACHE_VERSION) or top > stored_top
+        self.top = top if self.stale else stored_top
+
+    def get(self, path):
+        if self.stale:
+            return None
+        return self.db.execute("SELECT ino, mtime_ns, own, files, errors, total, subdirs, linked, big "
+                               "FROM dirs WHERE path = ?", (path,)).fetchone()
+
+    def row(self, path, st, result):
+        """Cache row of a directory that was just read (its total is added by put())."""
+        own, files, subdirs, linked, big, errors = result
+        return (path, st.st_ino, st.st_mtime_ns, own, files, errors,
+                json.dumps([os.path.basename(p) for p, _ in subdirs]), json.dumps(linked), json.dumps(big))
+
+    def put(self, path, total, cached_total, row):
+        if row is not None:
+            self.db.execute("INSERT OR REPLACE INTO dirs (path, ino, mtime_ns, own, files, errors, subdirs, "
+                            "linked, big, total) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row + (total,))
+        elif total != cached_total:
+            self.db.execute("UPDATE dirs SET total = ? WHERE path = ?", (total, path))
+
+    def drop(self, path):
+        """Forget a directory and everything below it."""
+        prefix = path.rstrip(os.sep) + os.sep
+        self.db.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                        (path, prefix, prefix[:-1] + chr(ord(os.sep) + 1)))
+
+    def save(self):
+        self.db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                            [("version", str(CACHE_VERSION)), ("top", str(self.top))])
+        self.db.commit()
+        self.db.close()
+
+
+def scan(root, top=TOP_N, workers=None, cache=None, rebuild=False):
+    """
+    Size of the tree under `root` on root's filesystem. Returns a dict with
+    total bytes, file/dir/error counts, elapsed seconds and the `top`
+    largest directories and files as [(bytes, path)].
+
+    cache: SQLite file to reuse the unchanged directories of the last scan
+    from and to store this one in; rebuild=True reads every directory again.
+    """
+    root = os.path.abspath(root)
+    st = os.stat(root)
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    top_dirs, top_files = TopN(top), TopN(top)
+    store = ScanCache(cache, top, rebuild) if cache else None
+    if store and store.stale:
+        store.drop(root)
+    seen_links = set()
+    # path -> [parent, subdirectories still open, bytes so far, cached total, new cache row];
+    # only the open frontier is kept
+    nodes = {root: [None, 0, disk_usage(st), None, None]}
+    results = queue.Queue()
+    counts = {"files": 0, "dirs": 1, "errors": 0, "cached": 0}
+    t0 = time.monotonic()
+
+    def task(path, st, row):
+        try:
+            result = None
+            if row is not None and row[:2] == (st.st_ino, st.st_mtime_ns):
+                result = reuse_dir(path, st.st_dev, row)
+            fresh = result is None
+            if fresh:
+                # For the cache, each directory's own largest files are kept, whatever the global threshold
+                result = scan_dir(path, st.st_dev, 0 if store else top_files.threshold)
+                if store:
+                    result = result[:4] + (heapq.nlargest(store.top, result[4]),) + result[5:]
+            results.put((path, st, row, fresh, result))
+        except BaseException as e:   # always answer, or the coordinator waits forever
+            results.put((path, st, row, True, e))
+
+    def finish(path):
+        """A directory and all its subdirectories are done: roll its total up the tree."""
+        while path is not None:
+            parent, _, total, cached_total, row = nodes.pop(path)
+            top_dirs.push(total, path)
+            if store:
+                store.put(path, total, cached_total, row)
+            if parent is None:
+                return total
+            node = nodes[parent]
+            node[2] += total
+            node[1] -= 1
+            if node[1]:
+                return None
+            path = parent
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pool.submit(task, root, st, store.get(root) if store else None)
+        outstanding = 1
+        total = 0
+        while outstanding:
+            path, dir_st, row, fresh, result = results.get()
+            outstanding -= 1
+            if isinstance(result, BaseException):
+                raise result
+            own, files, subdirs, linked, big, errors = result
+            node = nodes[path]
+            if store and fresh:
+                node[4] = store.row(path, dir_st, result)
+                if row is not None:   # subdirectories removed since the last scan
+                    for name in set(json.loads(row[6])) - {os.path.basename(p) for p, _ in subdirs}:
+                        store.drop(os.path.join(path, name))
+            elif store:
+                node[3] = row[5]
+                counts["cached"] += 1
+            for key, size, file_path in linked:
+                if key not in seen_links:   # hard links: first one found gets the bytes
+                    seen_links.add(key)
+                    own += size
+                    big.append((size, file_path))
+            for size, file_path in big:
+                top_files.push(size, file_path)
+            node[2] += own
+            counts["files"] += files
+            counts["errors"] += errors
+            counts["dirs"] += len(subdirs)
+            node[1] += len(subdirs)
+            for sub, sub_st in subdirs:
+                nodes[sub] = [path, 0, disk_usage(sub_st), None, None]
+                pool.submit(task, sub, sub_st, store.get(sub) if store else None)
+            outstanding += len(subdirs)
+            if not subdirs:
+                total = finish(path) or total
+    if store:
+        store.save()
+    return {"path": root, "total": total, **counts, "seconds": time.monotonic() - t0,
+            "top_dirs": top_dirs.largest(), "top_files": top_files.largest(), "cache": cache}
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+diskhistory.py — disk usage history for diskspace.py --sample / --history
+
+Samples go into one fixed-size file used as a ring buffer, so it never
+grows and an append is O(1) (a few struct.pack_into() calls on an mmap):
+
+    header      magic, version, record size, capacity, mount slots, appended
+    mount table MAX_MOUNTS x 256-byte mountpoint names, NUL-padded (mount id = slot)
+    records     capacity x RECORD: time, mount id, status, total, used, free,
+                inodes total, inodes free
+
+Once `capacity` records have been written the oldest ones are overwritten.
+The report reads every record at once as a NumPy structured array and fits
+a least-squares line of used bytes over time per mount and per window
+(last hour / day / week) with grouped sums, giving a fill rate and the
+time until the disk is full at that rate.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import time
+
+CAPACITY = 100_000          # records; 10 mounts sampled every 5 minutes = about 5 weeks
+MAX_MOUNTS = 256
+NAME_SIZE = 256
+MAGIC = b"DSKR"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHIIQ")          # magic, version, record size, capacity, mount slots, appended
+RECORD = struct.Struct("<dIIQQQQQ")         # time, mount, status, total, used, free, inodes total, inodes free
+RECORD_FIELDS = [("time", "<f8"), ("mount", "<u4"), ("status", "<u4"), ("total", "<u8"), ("used", "<u8"),
+                 ("free", "<u8"), ("inodes_total", "<u8"), ("inodes_free", "<u8")]
+HEADER_SIZE = 64
+TABLE_OFFSET = HEADER_SIZE
+RECORDS_OFFSET = TABLE_OFFSET + MAX_MOUNTS * NAME_SIZE
+
+STATUS = {"ok": 0, "stalled": 1, "error": 2}
+
+# Report windows: label -> seconds
+WINDOWS = {"1h": 3600, "24h": 86400, "7d": 7 * 86400}
+
+
+class UsageRing:
+    """The ring-buffer file, memory-mapped; create=True makes a new one if it is missing."""
+
+    def __init__(self, path, capacity=CAPACITY, create=True):
+        self.path = path
+        if not os.path.exists(path):
+            if not create:
+                raise FileNotFoundError(f"no usage history at {path}")
+            self._create(capacity)
+        self.file = open(path, "r+b")
+        size = os.fstat(self.file.fileno()).st_size
+        header = HEADER.unpack(self.file.read(HEADER.size)) if size >= RECORDS_OFFSET else None
+        if (header is None or header[:3] != (MAGIC, VERSION, RECORD.size) or header[4] != MAX_MOUNTS
+                or size < RECORDS_OFFSET + header[3] * RECORD.size):
+            self.file.close()
+            raise ValueError(f"{path} is not a version {VERSION} usage history file")
+        self.capacity = header[3]
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def _create(self, capacity):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, capacity, MAX_MOUNTS, 0).ljust(HEADER_SIZE, b"\0"))
+            f.truncate(RECORDS_OFFSET + capacity * RECORD.size)   # sparse until written
+        os.replace(tmp, self.path)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def appended(self):
+        return HEADER.unpack_from(self.map, 0)[5]
+
+    def _table(self):
+        """Mount id -> stored name (bytes) for every used slot of the mount table."""
+        table = {}
+        for slot in range(MAX_MOUNTS):
+            raw = self.map[TABLE_OFFSET + slot * NAME_SIZE:TABLE_OFFSET + (slot + 1) * NAME_SIZE]
+            if raw[0] == 0:
+                break
+            table[slot] = raw.rstrip(b"\0")
+        return table
+
+    def mounts(self):
+        """Mount id -> mountpoint for every used slot of the mount table."""
+        return {slot: raw.decode("utf-8", "replace") for slot, raw in self._table().items()}
+
+    def _mount_id(self, table, mountpoint):
+        # Names longer than a table slot are stored cut short: compare them in that form
+        encoded = os.fsencode(mountpoint)[:NAME_SIZE - 1]
+        for slot, raw in table.items():
+            if raw == encoded:
+                return slot
+        slot = len(table)
+        if slot >= MAX_MOUNTS:
+            raise ValueError(f"more than {MAX_MOUNTS} mountpoints in {self.path}")
+        self.map[TABLE_OFFSET + slot * NAME_SIZE:TABLE_OFFSET + slot * NAME_SIZE + len(encoded)] = encoded
+        table[slot] = encoded
+        return slot
+
+    def append(self, samples, when=None):
+        """
+        Add one record per mount dict (as returned by diskspace.collect_mounts);
+        the records go in before the header's counter moves on, so a reader never
+        sees a half-written record.
+        """
+        when = time.time() if when is None else when
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        try:
+            table = self._table()
+            appended = self.appended
+            for s in samples:
+                slot = appended % self.capacity
+                RECORD.pack_into(self.map, RECORDS_OFFSET + slot * RECORD.size, when,
+                                 self._mount_id(table, s["mountpoint"]), STATUS.get(s["status"], 2),
+                                 s.get("total") or 0, s.get("used") or 0, s.get("free") or 0,
+                                 s.get("inodes_total") or 0, s.get("inodes_free") or 0)
+                appended += 1
+            struct.pack_into("<Q", self.map, HEADER.size - 8, appended)
+        finally:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        return appended
+
+    def records(self):
+        """All stored records (oldest first) as a NumPy structured array."""
+        import numpy as np
+        dtype = np.dtype(RECORD_FIELDS)
+        count = min(self.appended, self.capacity)
+        data = np.frombuffer(self.map, dtype=dtype, count=count, offset=RECORDS_OFFSET)
+        start = self.appended % self.capacity if self.appended > self.capacity else 0
+        return np.concatenate((data[start:], data[:start])) if start else data.copy()
+
+
+# ---- report ------------------------------------------------------------------
+
+def fill_rates(records, now=None, windows=WINDOWS):
+    """
+    Per mount id: latest sample plus, per window, the growth of used bytes in
+    bytes/second (least-squares slope over the window's samples, None with
+    fewer than two) and the seconds until full at that rate (None if not growing).
+    """
+    import numpy as np
+    ok = records[records["status"] == STATUS["ok"]]
+    if not len(ok):
+        return {}
+    now = time.time() if now is None else now
+    mount = ok["mount"].astype(np.intp)
+    t = ok["time"] - now                      # centred on now: keeps the sums well conditioned
+    used = ok["used"].astype(np.float64)
+    size = int(mount.max()) + 1
+    latest = np.full(size, -1)
+    latest[mount] = np.arange(len(ok))        # records are oldest first, so the last write wins
+    rates = {}
+    for label, seconds in windows.items():
+        w = (t >= -seconds).astype(np.float64)
+        n = np.bincount(mount, w, size)
+        sx, sy = np.bincount(mount, w * t, size), np.bincount(mount, w * used, size)
+        sxx, sxy = np.bincount(mount, w * t * t, size), np.bincount(mount, w * t * used, size)
+        denom = n * sxx - sx * sx
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates[label] = np.where((n >= 2) & (denom > 0), (n * sxy - sx * sy) / denom, np.nan)
+    report = {}
+    for mid in np.flatnonzero(latest >= 0):
+        last = ok[latest[mid]]
+        entry = {"time": float(last["time"]), "total": int(last["total"]), "used": int(last["used"]),
+                 "free": int(last["free"]), "windows": {}}
+        for label in windows:
+            rate = rates[label][mid]
+            rate = None if np.isnan(rate) else float(rate)
+            full_in = entry["free"] / rate if rate and rate > 0 else None
+            entry["windows"][label] = {"rate": rate, "full_in": full_in}
+        report[int(mid)] = entry
+    return report
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    for unit, size in (("y", 365 * 86400), ("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds / size:.1f}{unit}"
+    return f"{seconds:.0f}s"
+
+
+def history_report(ring, human_readable, warn_days=7.0, now=None):
+    names = ring.mounts()
+    report = fill_rates(ring.records(), now)
+    rows = [("Mounted on", "Used", "Free", "Growth/day (24h)")
+            + tuple(f"Full in ({w})" for w in WINDOWS) + ("",)]
+    for mid, entry in sorted(report.items(), key=lambda kv: names.get(kv[0], "")):
+        day = entry["windows"]["24h"]["rate"]
+        growth = "-" if day is None else ("-" if day < 0 else "+") + human_readable(abs(day) * 86400)
+        fulls = [entry["windows"][w]["full_in"] for w in WINDOWS]
+        soon = any(f is not None and f < warn_days * 86400 for f in fulls)
+        rows.append((names.get(mid, f"#{mid}"), human_readable(entry["used"]), human_readable(entry["free"]),
+                     growth) + tuple(format_duration(f) for f in fulls) + ("<-- filling up" if soon else "",))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    header = (f"{min(ring.appended, ring.capacity)} samples in {ring.path} "
+              f"(ring of {ring.capacity}, {ring.appended} written)\n")
+    return header + "\n".join("  ".join(c.ljust(w) for c, w in zip(row, widths)).rstrip() for row in rows)
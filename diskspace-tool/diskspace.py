@@ -1,53 +1,311 @@
 #!/usr/bin/env python3
+import argparse
+import csv
+import json
 import os
 import platform
-import shutil
+import socket
+import sys
+import threading
+import time
 import psutil
-import subprocess
+
+import dirscan
+
+# Directory tree cache for --scan --cache (see dirscan.py)
+DEFAULT_SCAN_CACHE = os.path.expanduser("~/.cache/diskspace/scan.sqlite")
+
+# Usage history file for --sample / --history (see diskhistory.py)
+DEFAULT_RING = os.path.expanduser("~/.cache/diskspace/usage.ring")
+
+# Seconds a mountpoint may take to answer statvfs() before it is reported as stalled
+MOUNT_TIMEOUT = 2.0
+
+# Network/remote filesystems: listed even though they are not backed by a local block device
+NETWORK_FS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "sshfs", "fuse.sshfs", "ceph", "fuse.ceph",
+              "glusterfs", "fuse.glusterfs", "9p", "afpfs", "webdav", "davfs"}
+
+MOUNT_FIELDS = ["device", "mountpoint", "fstype", "status", "total", "used", "free", "percent",
+                "inodes_total", "inodes_used", "inodes_free", "seconds", "error"]
 
 def human_readable(size):
     for unit in ['B','KB','MB','GB','TB']:
         if size < 1024:
             return f"{size:.2f} {unit}"
         size /= 1024
+    return f"{size:.2f} PB"
+
+# ---- mounts ------------------------------------------------------------------
+
+def list_mounts(include_all=False):
+    """Mount table entries worth reporting (read from the OS, no filesystem is touched)."""
+    mounts = []
+    seen = set()
+    for part in psutil.disk_partitions(all=True):
+        if not include_all and not (part.device.startswith("/") or ":" in part.device
+                                    or part.fstype in NETWORK_FS):
+            continue   # proc, sysfs, cgroup, tmpfs, overlay, ...
+        if part.mountpoint in seen:
+            continue
+        seen.add(part.mountpoint)
+        mounts.append({"device": part.device, "mountpoint": part.mountpoint, "fstype": part.fstype})
+    return mounts
+
+def stat_mount(mountpoint):
+    """Usage of one mountpoint; statvfs() where available (it also has inode counts)."""
+    if hasattr(os, "statvfs"):
+        st = os.statvfs(mountpoint)
+        total = st.f_blocks * st.f_frsize
+        free = st.f_bavail * st.f_frsize
+        used = total - st.f_bfree * st.f_frsize
+        # Like df: percentage of the space available to users (reserved blocks excluded)
+        percent = round(100.0 * used / (used + free), 1) if used + free else 0.0
+        return {"total": total, "used": used, "free": free, "percent": percent,
+                "inodes_total": st.f_files, "inodes_used": st.f_files - st.f_ffree, "inodes_free": st.f_ffree}
+    usage = psutil.disk_usage(mountpoint)
+    return {"total": usage.total, "used": usage.used, "free": usage.free, "percent": usage.percent,
+            "inodes_total": None, "inodes_used": None, "inodes_free": None}
+
+def collect_mounts(mounts, timeout=MOUNT_TIMEOUT):
+    """
+    Stat every mountpoint in parallel; returns the mount dicts with usage and
+    a status: "ok", "stalled" (no answer within `timeout`) or "error".
+
+    Each mount gets its own daemon thread: a statvfs() stuck on a dead NFS/CIFS
+    server cannot be cancelled, and unlike ThreadPoolExecutor workers, daemon
+    threads do not keep the process alive at exit.
+    """
+    results = [dict(m, status="stalled", seconds=None, error=None) for m in mounts]
+
+    def worker(result):
+        t0 = time.monotonic()
+        try:
+            usage = stat_mount(result["mountpoint"])
+        except OSError as e:
+            result.update(status="error", error=e.strerror or str(e))
+        else:
+            result.update(usage, status="ok")
+        result["seconds"] = round(time.monotonic() - t0, 3)
+
+    threads = [threading.Thread(target=worker, args=(r,), daemon=True, name=f"stat {r['mountpoint']}")
+               for r in results]
+    deadline = time.monotonic() + timeout
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(max(0.0, deadline - time.monotonic()))
+    for r in results:
+        if r["status"] == "stalled":
+            r["error"] = f"no answer within {timeout:g}s"
+    return results
+
+# ---- block devices -----------------------------------------------------------
+
+def _read_sys(path, default=None):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+def _labels():
+    """Device name -> filesystem label, from the /dev/disk/by-label symlinks."""
+    labels = {}
+    try:
+        for entry in os.scandir("/dev/disk/by-label"):
+            labels[os.path.basename(os.path.realpath(entry.path))] = entry.name.replace("\\x20", " ")
+    except OSError:
+        pass
+    return labels
+
+def block_devices(mounts=(), sys_block="/sys/block"):
+    """
+    Block devices and their partitions straight from sysfs (what lsblk shows),
+    without spawning processes; mountpoint and fstype come from `mounts`.
+    """
+    by_device = {os.path.basename(m["device"]): m for m in mounts if m["device"].startswith("/dev/")}
+    labels = _labels()
 
-def windows_disk_info():
+    def describe(name, path):
+        mount = by_device.get(name, {})
+        return {"name": name, "size": int(_read_sys(os.path.join(path, "size"), "0")) * 512,
+                "mountpoint": mount.get("mountpoint"), "fstype": mount.get("fstype"), "label": labels.get(name)}
+
+    devices = []
+    try:
+        names = sorted(os.listdir(sys_block))
+    except OSError:
+        return devices   # not Linux
+    for name in names:
+        path = os.path.join(sys_block, name)
+        dev = describe(name, path)
+        dev.update(removable=_read_sys(os.path.join(path, "removable")) == "1",
+                   ro=_read_sys(os.path.join(path, "ro")) == "1",
+                   rotational=_read_sys(os.path.join(path, "queue/rotational")) == "1",
+                   model=_read_sys(os.path.join(path, "device/model")),
+                   partitions=[])
+        if name.startswith("loop") and dev["size"] == 0:
+            continue   # unused loop devices
+        for part in sorted(os.listdir(path)):
+            if os.path.exists(os.path.join(path, part, "partition")):
+                dev["partitions"].append(describe(part, os.path.join(path, part)))
+        devices.append(dev)
+    return devices
+
+# ---- output ------------------------------------------------------------------
+
+def _size(value):
+    return "-" if value is None else human_readable(value)
+
+def format_mounts(results):
+    rows = [("Filesystem", "Type", "Size", "Used", "Avail", "Use%", "IUse%", "Mounted on", "Status")]
+    for r in results:
+        if r["status"] == "ok":
+            iuse = f"{100 * r['inodes_used'] / r['inodes_total']:.0f}%" if r.get("inodes_total") else "-"
+            rows.append((r["device"], r["fstype"], _size(r["total"]), _size(r["used"]), _size(r["free"]),
+                         f"{r['percent']:.0f}%", iuse, r["mountpoint"], "ok"))
+        else:
+            rows.append((r["device"], r["fstype"], "-", "-", "-", "-", "-", r["mountpoint"],
+                         f"{r['status'].upper()}: {r['error']}"))
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(str(c).ljust(w) for c, w in zip(row, widths)).rstrip() for row in rows)
+
+def format_block_devices(devices):
+    rows = [("NAME", "SIZE", "TYPE", "FSTYPE", "MOUNTPOINT", "LABEL")]
+    for d in devices:
+        rows.append((d["name"], _size(d["size"]), "disk", d["fstype"] or "", d["mountpoint"] or "", d["label"] or ""))
+        for p in d["partitions"]:
+            rows.append((f"`-{p['name']}", _size(p["size"]), "part", p["fstype"] or "", p["mountpoint"] or "",
+                         p["label"] or ""))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(c.ljust(w) for c, w in zip(row, widths)).rstrip() for row in rows)
+
+def write_json(path, mounts, devices):
+    report = {"host": socket.gethostname(), "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+              "mounts": mounts, "block_devices": devices}
+    text = json.dumps(report, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+
+def write_csv(path, mounts):
+    f = sys.stdout if path == "-" else open(path, "w", newline="")
+    try:
+        writer = csv.DictWriter(f, fieldnames=MOUNT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(mounts)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+# ---- reports -----------------------------------------------------------------
+
+def windows_disk_info(mounts):
     print("=== Disk Space (Windows) ===\n")
-    for part in psutil.disk_partitions(all=False):
-        usage = psutil.disk_usage(part.mountpoint)
-        print(f"Drive: {part.device}")
-        print(f"  File System: {part.fstype}")
-        print(f"  Total: {human_readable(usage.total)}")
-        print(f"  Used : {human_readable(usage.used)}")
-        print(f"  Free : {human_readable(usage.free)}")
-        print(f"  Used %: {usage.percent}%\n")
-
-def unix_disk_info():
+    for m in mounts:
+        print(f"Drive: {m['device']}")
+        print(f"  File System: {m['fstype']}")
+        if m["status"] != "ok":
+            print(f"  {m['status'].upper()}: {m['error']}\n")
+            continue
+        print(f"  Total: {human_readable(m['total'])}")
+        print(f"  Used : {human_readable(m['used'])}")
+        print(f"  Free : {human_readable(m['free'])}")
+        print(f"  Used %: {m['percent']}%\n")
+
+def unix_disk_info(mounts, devices):
     print("=== Mounted Filesystems ===\n")
-    try:
-        subprocess.run(["df", "-hT"], check=True)
-    except Exception:
-        print("Could not run df -hT; falling back to psutil.\n")
-        for part in psutil.disk_partitions(all=False):
-            usage = psutil.disk_usage(part.mountpoint)
-            print(f"{part.device:<20} {part.fstype:<8} "
-                  f"{human_readable(usage.total):>10} total, "
-                  f"{human_readable(usage.used):>10} used, "
-                  f"{human_readable(usage.free):>10} free "
-                  f"({usage.percent:>5.1f}%) at {part.mountpoint}")
+    print(format_mounts(mounts))
     print("\n=== Block Devices ===\n")
-    subprocess.run(["lsblk", "-o", "NAME,FSTYPE,SIZE,MOUNTPOINT,LABEL"], check=False)
+    print(format_block_devices(devices) if devices else "No block device information (/sys/block) on this system.")
+
+def scan_report(result):
+    cached = f", {result['cached']} unchanged directories from {result['cache']}" if result["cache"] else ""
+    lines = [f"=== Disk Usage of {result['path']} ===\n",
+             f"{human_readable(result['total'])} in {result['files']} files, {result['dirs']} directories "
+             f"({result['errors']} unreadable) - scanned in {result['seconds']:.1f}s{cached}\n",
+             f"--- Top {len(result['top_dirs'])} directories ---"]
+    lines += [f"{human_readable(size):>12}  {path}" for size, path in result["top_dirs"]]
+    lines += ["", f"--- Top {len(result['top_files'])} files ---"]
+    lines += [f"{human_readable(size):>12}  {path}" for size, path in result["top_files"]]
+    return "\n".join(lines)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cross-platform disk usage viewer.")
+    parser.add_argument("--timeout", type=float, default=MOUNT_TIMEOUT,
+                        help="seconds before an unresponsive mount is reported as stalled")
+    parser.add_argument("--all", action="store_true", help="include pseudo filesystems (tmpfs, proc, ...)")
+    parser.add_argument("--json", metavar="FILE", help="also write the report as JSON ('-' = stdout only)")
+    parser.add_argument("--csv", metavar="FILE", help="also write the mount table as CSV ('-' = stdout only)")
+    parser.add_argument("--scan", metavar="PATH",
+                        help="report the size of PATH (like du -sx) with its largest directories and files")
+    parser.add_argument("--top", type=int, default=dirscan.TOP_N, help="directories/files listed by --scan")
+    parser.add_argument("--workers", type=int, help="parallel directory reads for --scan")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_SCAN_CACHE, metavar="FILE",
+                        help="--scan only re-reads directories changed since the last scan cached here "
+                             "(default: %(const)s)")
+    parser.add_argument("--rebuild", action="store_true", help="with --cache: re-read every directory")
+    parser.add_argument("--sample", nargs="?", const=DEFAULT_RING, metavar="FILE",
+                        help="append the usage of every mount to a history file (default: %(const)s); run from cron")
+    parser.add_argument("--history", nargs="?", const=DEFAULT_RING, metavar="FILE",
+                        help="show the fill rate and time until full of every mount from a history file")
+    parser.add_argument("--capacity", type=int, default=None,
+                        help="records a new history file holds before the oldest are overwritten")
+    parser.add_argument("--warn-days", type=float, default=7.0,
+                        help="flag mounts that fill up within this many days in --history")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    if args.scan:
+        try:
+            result = dirscan.scan(args.scan, args.top, args.workers, args.cache, args.rebuild)
+        except OSError as e:
+            sys.exit(f"diskspace: {e}")
+        if args.json:
+            f = sys.stdout if args.json == "-" else open(args.json, "w")
+            try:
+                f.write(json.dumps(result, indent=2) + "\n")
+            finally:
+                if f is not sys.stdout:
+                    f.close()
+        if args.json != "-":
+            print(scan_report(result))
+        return
+    if args.history:
+        import diskhistory   # needs numpy; the other modes do not
+        try:
+            ring = diskhistory.UsageRing(args.history, create=False)
+        except (OSError, ValueError) as e:
+            sys.exit(f"diskspace: {e}")
+        with ring:
+            print(diskhistory.history_report(ring, human_readable, args.warn_days))
+        return
     os_type = platform.system()
-    print(f"Detected OS: {os_type}\n")
-    if os_type == "Windows":
-        windows_disk_info()
-    elif os_type in ("Linux", "Darwin"):
-        unix_disk_info()
-    else:
+    if os_type not in ("Windows", "Linux", "Darwin"):
         print("Unsupported OS. Please run on Windows, Linux, or macOS.")
+        return
+    mounts = collect_mounts(list_mounts(args.all), args.timeout)
+    devices = block_devices(mounts) if os_type == "Linux" else []
+    # Structured output on stdout replaces the table; --sample on its own (from cron) prints nothing
+    if "-" not in (args.json, args.csv) and (args.json or args.csv or not args.sample):
+        print(f"Detected OS: {os_type}\n")
+        if os_type == "Windows":
+            windows_disk_info(mounts)
+        else:
+            unix_disk_info(mounts, devices)
+    if args.json:
+        write_json(args.json, mounts, devices)
+    if args.csv:
+        write_csv(args.csv, mounts)
+    if args.sample:
+        import diskhistory
+        with diskhistory.UsageRing(args.sample, args.capacity or diskhistory.CAPACITY) as ring:
+            ring.append(mounts)
+    if any(m["status"] == "stalled" for m in mounts):
+        sys.exit(2)
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+gns3_client.py
+
+Thin GNS3 v2 REST client built for bulk topology work.
+
+- One requests.Session with a keep-alive connection pool shared by every call
+- Nodes and links are created in parallel on a bounded thread pool
+- 409 (conflict/locked) and 5xx answers, dropped connections and timeouts
+  are retried with exponential backoff and jitter
+"""
+
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from lab_trace import TRACE
+
+# Status codes worth retrying: GNS3 answers 409 while a node/compute is busy
+RETRY_STATUSES = {409, 500, 502, 503, 504}
+
+# Project/node/link ids in paths, folded so trace spans group by endpoint
+_ID = re.compile(r"/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+class Gns3Error(RuntimeError):
+    """Raised when the GNS3 server rejects a request (after retries)."""
+
+    def __init__(self, method, path, status, message):
+        super().__init__(f"{method} {path} -> {status}: {message}")
+        self.status = status
+
+
+class Gns3Client:
+    """
+    Pooled GNS3 REST client.
+
+    max_workers bounds how many requests are in flight at once; the HTTP
+    pool is sized to match so every worker reuses a kept-alive connection.
+    """
+
+    def __init__(self, server, max_workers=8, retries=4, backoff=0.25, timeout=30, auth=None):
+        self.base_url = server.rstrip("/") + "/v2"
+        self.max_workers = max(1, max_workers)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        if auth:
+            self.session.auth = auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._templates = None
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- raw requests ------------------------------------------------------
+
+    def request(self, method, path, json=None):
+        """
+        Perform one API call with retry/backoff; returns the decoded JSON body
+        (None for empty bodies). Note that a retried POST may be replayed if
+        the server failed after acting on it.
+        """
+        url = self.base_url + path
+        with TRACE.span(f"{method} {_ID.sub('/{id}', path)}", cat="http"):
+            for attempt in range(self.retries + 1):
+                TRACE.count("http_calls")
+                try:
+                    r = self.session.request(method, url, json=json, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if attempt == self.retries:
+                        raise Gns3Error(method, path, "connection", e)
+                    TRACE.count("http_retries")
+                    self._sleep(attempt)
+                    continue
+                if r.status_code in RETRY_STATUSES and attempt < self.retries:
+                    TRACE.count("http_retries")
+                    self._sleep(attempt)
+                    continue
+                if r.status_code >= 400:
+                    raise Gns3Error(method, path, r.status_code, self._message(r))
+                return r.json() if r.content else None
+
+    def _sleep(self, attempt):
+        delay = self.backoff * (2 ** attempt)
+        time.sleep(delay + random.uniform(0, delay))
+
+    @staticmethod
+    def _message(response):
+        try:
+            return response.json().get("message", response.text)
+        except ValueError:
+            return response.text
+
+    def get(self, path):
+        return self.request("GET", path)
+
+    def post(self, path, json=None):
+        return self.request("POST", path, json=json)
+
+    def put(self, path, json=None):
+        return self.request("PUT", path, json=json)
+
+    def delete(self, path):
+        return self.request("DELETE", path)
+
+    def stream(self, path):
+        """
+        Open a long-lived streaming GET (e.g. the project notification feed).
+        The caller iterates response.iter_lines() and must close the response.
+        """
+        TRACE.count("http_calls")
+        r = self.session.get(self.base_url + path, stream=True, timeout=(self.timeout, None))
+        if r.status_code >= 400:
+            message = self._message(r)
+            r.close()
+            raise Gns3Error("GET", path, r.status_code, message)
+        return r
+
+    def map(self, fn, items):
+        """Run fn over items on the bounded worker pool; results keep input order."""
+        items = list(items)
+        if len(items) <= 1:
+            return [fn(i) for i in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+            return list(pool.map(fn, items))
+
+    # ---- projects ----------------------------------------------------------
+
+    def find_project(self, name):
+        for p in self.get("/projects"):
+            if p["name"] == name:
+                return p
+        return None
+
+    def get_or_create_project(self, name):
+        """Return (project, created) for `name`, opening it if it already exists."""
+        project = self.find_project(name)
+        created = project is None
+        if created:
+            project = self.post("/projects", {"name": name})
+        if project.get("status") != "opened":
+            project = self.post(f"/projects/{project['project_id']}/open")
+        return project, created
+
+    # ---- nodes and links ---------------------------------------------------
+
+    def template_id(self, name):
+        if self._templates is None:
+            self._templates = {t["name"]: t["template_id"] for t in self.get("/templates")}
+        if name not in self._templates:
+            raise Gns3Error("GET", "/templates", 404, f"template {name!r} not found")
+        return self._templates[name]
+
+    def nodes(self, project_id):
+        return self.get(f"/projects/{project_id}/nodes")
+
+    def links(self, project_id):
+        return self.get(f"/projects/{project_id}/links")
+
+    def start_node(self, project_id, node_id):
+        """Start one node; returns the node as reported after the start call."""
+        return self.post(f"/projects/{project_id}/nodes/{node_id}/start", {})
+
+    def stop_node(self, project_id, node_id):
+        return self.post(f"/projects/{project_id}/nodes/{node_id}/stop", {})
+
+    # ---- snapshots ---------------------------------------------------------
+
+    def snapshots(self, project_id):
+        return self.get(f"/projects/{project_id}/snapshots")
+
+    def find_snapshot(self, project_id, name):
+        return next((s for s in self.snapshots(project_id) if s["name"] == name), None)
+
+    def create_snapshot(self, project_id, name):
+        """Snapshot the project (GNS3 requires every node to be stopped)."""
+        return self.post(f"/projects/{project_id}/snapshots", {"name": name})
+
+    def restore_snapshot(self, project_id, snapshot_id):
+        """Roll the project back to a snapshot; returns the reopened project."""
+        return self.post(f"/projects/{project_id}/snapshots/{snapshot_id}/restore", {})
+
+    def create_node(self, project_id, name, template, x=0, y=0):
+        """Instantiate `template` in the project and rename it to `name`."""
+        tid = self.template_id(template)
+        node = self.post(f"/projects/{project_id}/templates/{tid}",
+                         {"x": x, "y": y, "compute_id": "local"})
+        if node.get("name") != name:
+            node = self.put(f"/projects/{project_id}/nodes/{node['node_id']}", {"name": name})
+        return node
+
+    def create_nodes(self, project_id, specs):
+        """
+        Create many nodes in parallel.
+
+        specs: list of {"name", "template", optional "x", "y"}
+        Returns {name: node} as reported by the server.
+        """
+        for spec in specs:   # warm the template cache once, not from every worker
+            self.template_id(spec["template"])
+        nodes = self.map(lambda s: self.create_node(project_id, s["name"], s["template"],
+                                                    s.get("x", 0), s.get("y", 0)), specs)
+        return {n["name"]: n for n in nodes}
+
+    def create_link(self, project_id, node_a_id, adapter_a, port_a, node_b_id, adapter_b, port_b):
+        payload = {
+            "nodes": [
+                {"node_id": node_a_id, "adapter_number": adapter_a, "port_number": port_a},
+                {"node_id": node_b_id, "adapter_number": adapter_b, "port_number": port_b},
+            ]
+        }
+        return self.post(f"/projects/{project_id}/links", payload)
+
+    def create_links(self, project_id, links):
+        """
+        Create many links in parallel.
+
+        links: list of (node_a_id, adapter_a, port_a, node_b_id, adapter_b, port_b)
+        """
+        return self.map(lambda l: self.create_link(project_id, *l), links)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+lab_benchmark.py
+
+End-to-end provisioning benchmark against the local GNS3 simulator.
+
+For every lab size (VLANs x hosts per VLAN) a fresh lab_simulator.py
+server is started and the full vlan_lab_automation.run_lab() flow runs
+against it: project, reconcile (node/link creation), boot + config push,
+and the ping matrix. A second pass on the same server measures the
+idempotent re-run, and a third one rebuilds the lab after all its nodes
+were deleted (restoring the golden snapshot saved by the first pass).
+Wall time per phase is printed as a table and can be saved as JSON (with
+the lab_trace counters and span totals of every run) for comparing runs.
+
+    python lab_benchmark.py --sizes 3x2,8x4,16x8 --boot-ios 2 --json bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import vlan_lab_automation as lab_automation
+from gns3_client import Gns3Client
+from lab_simulator import DEFAULT_BOOT, Gns3Simulator
+from lab_trace import TRACE
+
+PHASES = ["project", "restore", "reconcile", "provision", "verify", "snapshot"]
+
+
+def parse_size(text):
+    vlans, _, hosts = text.lower().partition("x")
+    return int(vlans), int(hosts or 1)
+
+
+def wipe_project(server, name):
+    """Delete every node of a project, as if the lab had been torn down."""
+    with Gns3Client(server) as client:
+        project = client.find_project(name)
+        client.map(lambda n: client.delete(f"/projects/{project['project_id']}/nodes/{n['node_id']}"),
+                   client.nodes(project["project_id"]))
+
+
+def bench_size(vlans, hosts, sim_options, verify="vlan", rerun=True, verbose=False,
+               window=lab_automation.CONFIG_WINDOW, golden=True):
+    """
+    Run one lab size on a fresh simulator; returns a list of result rows:
+    first build, idempotent re-run, and (with golden) a rebuild of the
+    wiped project from its golden snapshot.
+    """
+    lab = lab_automation.build_lab(vlans, hosts, "10.0.0.0/8", None)
+    spec = lab_automation.build_lab_spec(lab)
+    rows = []
+    with Gns3Simulator(**sim_options) as sim, tempfile.TemporaryDirectory() as tmp:
+        runs = ["first"] + (["rerun"] if rerun else []) + (["wiped"] if golden else [])
+        for run in runs:
+            if run == "wiped":
+                wipe_project(sim.url, spec["project"])
+            TRACE.reset()
+            t0 = time.time()
+            with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+                outcome = lab_automation.run_lab(lab, spec, server=sim.url, verify=verify, settle=0, window=window,
+                                                 golden=golden, state_file=Path(tmp) / "state.json", report_dir=tmp)
+            reachable = sum(1 for r in outcome["rows"] if r["received"] > 0)
+            rows.append({"size": f"{vlans}x{hosts}", "run": run, "nodes": len(spec["nodes"]),
+                         "links": len(spec["links"]), "total": time.time() - t0,
+                         **{p: outcome["phases"].get(p) for p in PHASES},
+                         "configured": len(outcome["configured"]), "failed": len(outcome["failed"]),
+                         "pings": f"{reachable}/{len(outcome['rows'])}",
+                         "counters": dict(TRACE.counters), "spans": TRACE.totals()})
+        rows[-1]["sim"] = dict(sim.stats)
+    return rows
+
+
+def format_table(rows):
+    cols = ["size", "run", "nodes", "links"] + PHASES + ["total", "configured", "failed", "pings"]
+    cells = [[_cell(r.get(c)) for c in cols] for r in rows]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) for i, c in enumerate(cols)]
+    lines = ["  ".join(c.rjust(w) for c, w in zip(cols, widths))]
+    lines += ["  ".join(v.rjust(w) for v, w in zip(row, widths)) for row in cells]
+    return "\n".join(lines)
+
+
+def _cell(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.2f}s"
+    return str(value)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark lab provisioning against the local GNS3 simulator.")
+    parser.add_argument("--sizes", default="3x2,8x4,16x8", help="comma-separated VLANSxHOSTS lab sizes")
+    parser.add_argument("--verify", choices=["vlan", "full", "gateway", "none"], default="vlan")
+    parser.add_argument("--no-rerun", action="store_true", help="skip the idempotent second pass")
+    parser.add_argument("--no-golden", action="store_true", help="skip golden snapshots and the wiped-lab pass")
+    parser.add_argument("--boot-ios", type=float, default=DEFAULT_BOOT["ios"], help="simulated IOS boot delay (s)")
+    parser.add_argument("--boot-vpcs", type=float, default=DEFAULT_BOOT["vpcs"], help="simulated VPCS boot delay (s)")
+    parser.add_argument("--prompt-latency", type=float, default=0.005, help="device seconds per console line")
+    parser.add_argument("--console-rtt", type=float, default=0.0, help="network round trip of console answers (s)")
+    parser.add_argument("--window", type=int, default=lab_automation.CONFIG_WINDOW,
+                        help="IOS config lines in flight (0 = one prompt at a time)")
+    parser.add_argument("--http-latency", type=float, default=0.0, help="seconds added to every REST call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability an IOS config line is rejected")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="probability a console drops on a command")
+    parser.add_argument("--start-fail-rate", type=float, default=0.0, help="probability a start request gets 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the result rows to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the automation's own output")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sim_options = {"boot": {"ios": args.boot_ios, "vpcs": args.boot_vpcs},
+                   "prompt_latency": args.prompt_latency, "console_rtt": args.console_rtt,
+                   "http_latency": args.http_latency,
+                   "error_rate": args.error_rate, "drop_rate": args.drop_rate,
+                   "start_fail_rate": args.start_fail_rate, "seed": args.seed}
+    rows = []
+    for size in args.sizes.split(","):
+        vlans, hosts = parse_size(size)
+        print(f"Benchmarking {vlans} VLANs x {hosts} hosts...", flush=True)
+        rows += bench_size(vlans, hosts, sim_options, args.verify, not args.no_rerun, args.verbose,
+                           args.window, not args.no_golden)
+    print(format_table(rows))
+    if args.json:
+        Path(args.json).write_text(json.dumps({"options": sim_options, "rows": rows}, indent=2))
+        print("Results written to", args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,688 @@
+#!/usr/bin/env python3
+"""
+lab_console.py
+
+Asyncio console driver for GNS3 device consoles.
+
+Speaks just enough telnet over asyncio streams to push CLI lines to IOS
+and VPCS consoles, and drives many consoles at the same time behind a
+configurable concurrency limit.
+
+Commands are paced by the device itself: each line is sent as soon as the
+previous one has returned to a known prompt, with a per-command timeout,
+and the output of every command is returned separately.
+
+ConsoleSessions keeps one logged-in session per node for a whole run and
+reconnects transparently if a session drops. No telnetlib is used (the
+module is gone in Python 3.13).
+"""
+
+import asyncio
+import re
+import time
+
+from lab_trace import TRACE
+
+# Telnet command bytes (RFC 854)
+IAC = 255
+DONT = 254
+DO = 253
+WONT = 252
+WILL = 251
+SB = 250
+SE = 240
+
+# Options we are happy to let the server enable (ECHO, SUPPRESS-GO-AHEAD)
+OPT_ECHO = 1
+OPT_SGA = 3
+ACCEPTED_OPTIONS = (OPT_ECHO, OPT_SGA)
+
+# Prompts, matched against the tail of the console buffer.
+# IOS: "R1>", "R1#", "R1(config)#", "SW1(config-if)#", "SW1(config-vlan)#", ...
+# VPCS: "PC1>"
+PROMPTS = {
+    "ios": re.compile(r"(?:^|[\r\n])[\w.\-]+(?:\(config[\w\-]*\))?[>#] ?$"),
+    "vpcs": re.compile(r"(?:^|[\r\n])[\w.\-]+> ?$"),
+}
+LOGIN_PROMPTS = {
+    "username": re.compile(r"(?:Username|login): ?$", re.IGNORECASE),
+    "password": re.compile(r"Password: ?$", re.IGNORECASE),
+}
+
+# Interactive questions IOS may ask mid-command, and the answer we send
+IOS_ANSWERS = [
+    (re.compile(r"initial configuration dialog\? \[yes/no\]: ?$"), "no"),
+    (re.compile(r"\[confirm\] ?$"), ""),
+    (re.compile(r"Destination filename \[[^\]]*\]\? ?$"), ""),
+]
+
+# Lines IOS prints when it rejects a command
+IOS_ERROR = re.compile(r"^% (?:Invalid|Incomplete|Ambiguous|Unknown|Bad)[^\r\n]*", re.MULTILINE)
+
+# Only the end of the buffer can hold a prompt; don't rescan long outputs
+_TAIL = 512
+
+# Any IOS configuration-mode prompt inside a stream of output: "SW1(config-if)#"
+_CONFIG_PROMPT = re.compile(r"(?:^|[\r\n])[\w.\-]+\(config[\w\-]*\)# ?")
+_ENTER_CONFIG = re.compile(r"^\s*conf(?:igure)?(?:\s+t(?:erminal)?)?\s*$", re.IGNORECASE)
+
+# Config lines in flight at once during a bulk push (0 = one prompt at a time)
+BULK_WINDOW = 16
+
+# Times a command is retried on a reopened console after the session drops
+COMMAND_RETRIES = 3
+
+
+class ExpectTimeout(Exception):
+    """Raised when a console does not show the expected prompt in time."""
+
+    def __init__(self, message, output=""):
+        super().__init__(message)
+        self.output = output
+
+
+class TelnetConsole:
+    """
+    Minimal telnet client on top of asyncio streams.
+
+    Option negotiation is answered inline (ECHO/SGA accepted, everything
+    else refused) and stripped from the data handed back to the caller.
+    """
+
+    def __init__(self, host, port, connect_timeout=10):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.reader = None
+        self.writer = None
+        self._pending = b""   # partial IAC sequence carried between reads
+        self._buf = ""        # received text not yet consumed by expect()
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=self.connect_timeout)
+        self._pending = b""
+        self._buf = ""
+        return self
+
+    async def close(self):
+        if self.writer is None:
+            return
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+        self.writer = None
+        self.reader = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _negotiate(self, data):
+        """Strip telnet commands from data and queue replies to the server."""
+        data = self._pending + data
+        self._pending = b""
+        out = bytearray()
+        replies = bytearray()
+        i = 0
+        n = len(data)
+        while i < n:
+            b = data[i]
+            if b != IAC:
+                out.append(b)
+                i += 1
+                continue
+            if i + 1 >= n:
+                self._pending = data[i:]
+                break
+            cmd = data[i + 1]
+            if cmd == IAC:
+                out.append(IAC)
+                i += 2
+            elif cmd in (DO, DONT, WILL, WONT):
+                if i + 2 >= n:
+                    self._pending = data[i:]
+                    break
+                opt = data[i + 2]
+                if cmd == WILL:
+                    replies += bytes([IAC, DO if opt in ACCEPTED_OPTIONS else DONT, opt])
+                elif cmd == DO:
+                    replies += bytes([IAC, WILL if opt == OPT_SGA else WONT, opt])
+                i += 3
+            elif cmd == SB:
+                end = data.find(bytes([IAC, SE]), i + 2)
+                if end < 0:
+                    self._pending = data[i:]
+                    break
+                i = end + 2
+            else:
+                i += 2
+        if replies and self.writer is not None:
+            self.writer.write(bytes(replies))
+        return bytes(out)
+
+    async def read_some(self, timeout):
+        """Return whatever arrives within timeout ("" on timeout, EOFError on close)."""
+        try:
+            chunk = await asyncio.wait_for(self.reader.read(4096), timeout=timeout)
+        except asyncio.TimeoutError:
+            return ""
+        if not chunk:
+            raise EOFError(f"console {self.host}:{self.port} closed")
+        TRACE.count("telnet_bytes_in", len(chunk))
+        return self._negotiate(chunk).decode("ascii", errors="ignore")
+
+    async def settle(self, quiet=0.05):
+        """Discard pending output until the console has been silent for `quiet` seconds."""
+        while await self.read_some(quiet):
+            pass
+        self._buf = ""
+
+    async def write_line(self, line):
+        data = line.encode("ascii") + b"\r\n"
+        TRACE.count("telnet_bytes_out", len(data))
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def expect(self, patterns, timeout, answers=()):
+        """
+        Wait until one of `patterns` matches the end of the received text.
+
+        `answers` is a list of (regex, reply) for interactive questions that
+        should be answered automatically while waiting.
+        Returns (index of matched pattern, text up to and including the match).
+        Raises ExpectTimeout with the partial output if nothing matches in time.
+        """
+        deadline = time.monotonic() + timeout
+        consumed = []
+        while True:
+            offset = max(len(self._buf) - _TAIL, 0)
+            tail = self._buf[offset:]
+            for idx, pattern in enumerate(patterns):
+                m = pattern.search(tail)
+                if m:
+                    end = offset + m.end()
+                    consumed.append(self._buf[:end])
+                    self._buf = self._buf[end:]
+                    return idx, "".join(consumed)
+            for pattern, reply in answers:
+                m = pattern.search(tail)
+                if m:
+                    end = offset + m.end()
+                    consumed.append(self._buf[:end])
+                    self._buf = self._buf[end:]
+                    await self.write_line(reply)
+                    break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                partial = "".join(consumed) + self._buf
+                raise ExpectTimeout(f"no prompt from {self.host}:{self.port} within {timeout}s", partial)
+            self._buf += await self.read_some(remaining)
+
+    async def command(self, line, kind="ios", timeout=10):
+        """
+        Send one line and wait for the device prompt to come back.
+
+        Returns {"command", "output", "error", "seconds"}; `error` is the
+        IOS rejection message (if any) or the timeout reason.
+        """
+        start = time.monotonic()
+        self._buf = ""
+        await self.write_line(line)
+        answers = IOS_ANSWERS if kind == "ios" else ()
+        try:
+            _, output = await self.expect([PROMPTS[kind]], timeout, answers)
+            m = IOS_ERROR.search(output) if kind == "ios" else None
+            error = m.group(0).strip() if m else None
+        except ExpectTimeout as e:
+            output, error = e.output, str(e)
+        return {"command": line, "output": output, "error": error,
+                "seconds": time.monotonic() - start}
+
+
+async def wait_for_console(host, port, timeout=30):
+    """Async equivalent of wait_for_telnet(): True once the port accepts connections."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=2)
+            writer.close()
+            return True
+        except (OSError, asyncio.TimeoutError):
+            await asyncio.sleep(0.5)
+    return False
+
+
+async def ios_login(console, username=None, password=None, enable_password=None, timeout=30):
+    """
+    Bring an IOS console to a privileged exec prompt with paging disabled.
+
+    Wakes the console with a newline, answers login/enable prompts with the
+    given credentials and the setup dialog with "no".
+    """
+    patterns = [PROMPTS["ios"], LOGIN_PROMPTS["username"], LOGIN_PROMPTS["password"]]
+    await console.write_line("")
+    while True:
+        idx, _ = await console.expect(patterns, timeout, IOS_ANSWERS)
+        if idx == 1:
+            await console.write_line(username or "")
+        elif idx == 2:
+            await console.write_line(password or "")
+        else:
+            break
+    await console.write_line("enable")
+    idx, _ = await console.expect([PROMPTS["ios"], LOGIN_PROMPTS["password"]], timeout)
+    if idx == 1:
+        await console.write_line(enable_password or "")
+        await console.expect([PROMPTS["ios"]], timeout)
+    await console.command("terminal length 0", "ios", timeout)
+
+
+async def vpcs_wake(console, timeout=10):
+    """Get a fresh VPCS prompt (VPCS prints nothing until it sees a newline)."""
+    await console.write_line("")
+    await console.expect([PROMPTS["vpcs"]], timeout)
+
+
+async def open_when_ready(host, port, kind="ios", timeout=300):
+    """
+    Connect to a console and wait until it shows a `kind` prompt.
+
+    Reconnects with backoff while the port is closed and keeps nudging the
+    console with newlines (answering the IOS setup dialog) while it boots.
+    Returns the open TelnetConsole sitting at a prompt, or None if `timeout`
+    expires.
+    """
+    deadline = time.monotonic() + timeout
+    answers = IOS_ANSWERS if kind == "ios" else ()
+    retry = 0.1
+    while time.monotonic() < deadline:
+        console = TelnetConsole(host, port, connect_timeout=2)
+        try:
+            await console.open()
+            window = 0.25
+            while time.monotonic() < deadline:
+                await console.write_line("")
+                try:
+                    await console.expect([PROMPTS[kind]], min(window, max(deadline - time.monotonic(), 0)), answers)
+                    return console
+                except ExpectTimeout:
+                    window = min(window * 2, 2.0)
+        except (OSError, EOFError, asyncio.TimeoutError):
+            TRACE.count("console_connect_retries")
+            await asyncio.sleep(retry)
+            retry = min(retry * 2, 2.0)
+        await console.close()
+    return None
+
+
+async def push_ios(console, commands, timeout=10, username=None, password=None, enable_password=None,
+                   window=0):
+    """
+    Log in and run commands; returns per-command results.
+    window > 0 pipelines configuration blocks (see push_config_block).
+    """
+    await ios_login(console, username, password, enable_password, timeout=max(timeout, 30))
+    if window:
+        return await push_ios_bulk(console, commands, timeout, window)
+    return [await console.command(c, "ios", timeout) for c in commands]
+
+
+async def push_vpcs(console, commands, timeout=10):
+    """Run VPCS commands one prompt at a time; returns per-command results."""
+    await vpcs_wake(console, timeout)
+    return [await console.command(c, "vpcs", timeout) for c in commands]
+
+
+def split_config_blocks(commands):
+    """
+    Split a command list into exec-mode lines and configuration blocks.
+
+    Returns [(is_block, lines)]: the lines between "configure terminal" and
+    "end" form one block that can be pipelined; everything else (including
+    "conf t", "end" and "wr") is run one prompt at a time.
+    """
+    parts = []
+    block = None
+    for line in commands:
+        if block is not None:
+            if line.strip().lower() == "end":
+                parts.append((True, block))
+                parts.append((False, [line]))
+                block = None
+            else:
+                block.append(line)
+            continue
+        parts.append((False, [line]))
+        if _ENTER_CONFIG.match(line):
+            block = []
+    if block:
+        parts.append((True, block))
+    return [p for p in parts if p[1]]
+
+
+async def push_config_block(console, lines, timeout=10, window=BULK_WINDOW):
+    """
+    Stream configuration-mode lines with at most `window` of them in flight.
+
+    Each line is sent without waiting for its own prompt; one config prompt
+    coming back frees one slot. The output is split at those prompts, so
+    every line still gets its own result and IOS errors are found in one
+    pass over the transcript. Only the lines that errored are then retried
+    one prompt at a time, after re-entering their parent context (e.g. the
+    "interface" line above an indented sub-command).
+
+    The console must already be in configuration mode. `timeout` is the
+    longest silence tolerated while lines are outstanding.
+    Returns per-line {"command", "output", "error", "seconds"} results;
+    retried lines also carry "retried": True.
+    """
+    start = time.monotonic()
+    console._buf = ""
+    buf = ""
+    results = []
+    sent = 0
+    last = start
+    while len(results) < len(lines):
+        while sent < len(lines) and sent - len(results) < max(1, window):
+            data = lines[sent].encode("ascii") + b"\r\n"
+            TRACE.count("telnet_bytes_out", len(data))
+            console.writer.write(data)
+            sent += 1
+        await console.writer.drain()
+        chunk = await console.read_some(max(timeout - (time.monotonic() - last), 0))
+        if not chunk:
+            if time.monotonic() - last >= timeout:
+                error = f"no prompt from {console.host}:{console.port} within {timeout}s"
+                results += [{"command": line, "output": buf if i == 0 else "", "error": error, "seconds": 0.0}
+                            for i, line in enumerate(lines[len(results):])]
+                buf = ""
+                break
+            continue
+        buf += chunk
+        pos = 0
+        for m in _CONFIG_PROMPT.finditer(buf):
+            if len(results) == len(lines):
+                break
+            output = buf[pos:m.end()]
+            now = time.monotonic()
+            err = IOS_ERROR.search(output)
+            results.append({"command": lines[len(results)], "output": output,
+                            "error": err.group(0).strip() if err else None, "seconds": now - last})
+            last = now
+            pos = m.end()
+        buf = buf[pos:]
+    console._buf = buf
+    TRACE.count("bulk_lines", len(lines))
+
+    # Line-by-line fallback, only for the lines IOS rejected
+    for i, res in enumerate(results):
+        if not res["error"]:
+            continue
+        TRACE.count("bulk_retried_lines")
+        parent = None
+        if lines[i][:1].isspace():
+            parent = next((l for l in reversed(lines[:i]) if not l[:1].isspace()), None)
+        if parent is not None:
+            await console.command(parent, "ios", timeout)
+        retry = await console.command(lines[i], "ios", timeout)
+        retry["output"] = res["output"] + retry["output"]
+        retry["retried"] = True
+        results[i] = retry
+    return results
+
+
+async def push_ios_bulk(console, commands, timeout=10, window=BULK_WINDOW):
+    """Run exec lines one prompt at a time and pipeline every configuration block."""
+    results = []
+    for is_block, lines in split_config_blocks(commands):
+        if is_block:
+            results += await push_config_block(console, lines, timeout, window)
+        else:
+            results += [await console.command(c, "ios", timeout) for c in lines]
+    return results
+
+
+def join_output(results):
+    """Flatten per-command results back into one console transcript."""
+    return "".join(r["output"] for r in results)
+
+
+class ConsoleSession:
+    """
+    One long-lived console session to a node.
+
+    Logs in (IOS) or wakes the prompt (VPCS) once, then serves commands
+    from any phase. A dropped connection is reopened and the interrupted
+    command retried (up to `retries` times), so callers never see the
+    reconnect.
+    """
+
+    def __init__(self, name, host, port, kind="ios", login=None, open_timeout=30, retries=COMMAND_RETRIES):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.kind = kind
+        self.login = login or {}
+        self.open_timeout = open_timeout
+        self.retries = retries
+        self.console = None
+        self.prepared = False
+        self.connects = 0
+        self._lock = None
+
+    def adopt(self, console):
+        """Take over an already-open console (e.g. from the readiness probe)."""
+        self.console = console
+        self.prepared = False
+        self.connects += 1
+
+    async def _ensure(self, timeout):
+        if self.console is None:
+            console = await open_when_ready(self.host, self.port, self.kind, self.open_timeout)
+            if console is None:
+                raise ExpectTimeout(f"{self.name}: console {self.host}:{self.port} not ready "
+                                    f"within {self.open_timeout}s")
+            self.adopt(console)
+        if not self.prepared:
+            if self.kind == "ios":
+                await ios_login(self.console, timeout=max(timeout, 30), **self.login)
+            else:
+                await vpcs_wake(self.console, timeout)
+            self.prepared = True
+
+    async def drop(self):
+        if self.console is not None:
+            await self.console.close()
+        self.console = None
+        self.prepared = False
+
+    async def run(self, commands, timeout=10, window=0):
+        """
+        Run commands; returns per-command results.
+
+        window > 0 (IOS only) pipelines configuration blocks. If the session
+        drops during a block, it is reopened and that block is replayed one
+        prompt at a time.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.console is not None:
+                try:
+                    await self.console.settle()   # stray prompts left over from the last phase
+                except (OSError, EOFError):
+                    TRACE.count("console_reconnects")
+                    await self.drop()
+            if not window or self.kind != "ios":
+                return await self._run_lines(commands, timeout)
+            results = []
+            for is_block, lines in split_config_blocks(commands):
+                if not is_block:
+                    results += await self._run_lines(lines, timeout)
+                    continue
+                try:
+                    await self._ensure(timeout)
+                    results += await push_config_block(self.console, lines, timeout, window)
+                except (OSError, EOFError):
+                    TRACE.count("console_reconnects")
+                    await self.drop()
+                    await self._run_lines(["configure terminal"], timeout)
+                    results += await self._run_lines(lines, timeout)
+            return results
+
+    async def _run_lines(self, commands, timeout):
+        results = []
+        for line in commands:
+            for attempt in range(self.retries + 1):
+                try:
+                    await self._ensure(timeout)
+                    results.append(await self.console.command(line, self.kind, timeout))
+                    break
+                except (OSError, EOFError):
+                    await self.drop()
+                    if attempt == self.retries:
+                        raise
+                    TRACE.count("console_reconnects")
+        return results
+
+
+class ConsoleSessions:
+    """
+    Pool of one ConsoleSession per node, shared by the readiness, config and
+    verify phases of a run.
+
+    The pool owns its event loop so the blocking run_* wrappers can execute
+    their phases on it one after another while the sessions stay open.
+    """
+
+    def __init__(self, endpoints, login=None, open_timeout=30, retries=COMMAND_RETRIES):
+        """endpoints: {name: (host, port, kind)}"""
+        self.loop = asyncio.new_event_loop()
+        self.sessions = {name: ConsoleSession(name, host, port, kind, login, open_timeout, retries)
+                         for name, (host, port, kind) in endpoints.items()}
+
+    def __getitem__(self, name):
+        return self.sessions[name]
+
+    def run(self, coro):
+        """Run a coroutine to completion on the pool's loop."""
+        return self.loop.run_until_complete(coro)
+
+    async def commands(self, name, commands, timeout=10, window=0):
+        return await self.sessions[name].run(commands, timeout, window)
+
+    def stats(self):
+        """{name: number of times its console was (re)opened}"""
+        return {name: s.connects for name, s in self.sessions.items()}
+
+    async def _close_all(self):
+        await asyncio.gather(*(s.drop() for s in self.sessions.values()))
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        self.run(self._close_all())
+        self.loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def _provision_one(job, sem, console_timeout, ready, sessions):
+    start = time.monotonic()
+    name = job["name"]
+    if ready is not None:
+        available = await ready(name)   # boot and probe are traced by the readiness tracker
+    queued = time.time()
+    async with sem:
+        if ready is None and sessions is None:
+            available = await wait_for_console(job["host"], job["port"], timeout=console_timeout)
+        elif ready is None:
+            available = True   # the session opens (and waits for) the console itself
+        waited = time.monotonic() - start
+        working = time.time()
+        TRACE.add_span("wait for slot" if ready is not None else "wait for console", queued, working,
+                       cat="node", lane=name, kind="wait")
+        if not available:
+            return {"name": name, "ok": False, "output": "", "commands": [],
+                    "error": "console not available", "waited": waited, "seconds": waited}
+        timeout = job.get("command_timeout", 10)
+        try:
+            window = job.get("window", 0)
+            if sessions is not None:
+                commands = await sessions.commands(name, job["commands"], timeout, window)
+            else:
+                async with TelnetConsole(job["host"], job["port"]) as console:
+                    if job.get("kind") == "vpcs":
+                        commands = await push_vpcs(console, job["commands"], timeout)
+                    else:
+                        commands = await push_ios(console, job["commands"], timeout, window=window)
+            failed = [c for c in commands if c["error"]]
+            result = {"name": name, "ok": not failed, "output": join_output(commands),
+                      "commands": commands,
+                      "error": f"{failed[0]['command']!r}: {failed[0]['error']}" if failed else None}
+        except ExpectTimeout as e:
+            result = {"name": name, "ok": False, "output": e.output, "commands": [], "error": str(e)}
+        except (OSError, EOFError, asyncio.TimeoutError) as e:
+            result = {"name": name, "ok": False, "output": "", "commands": [], "error": str(e)}
+        result["waited"] = waited
+        result["seconds"] = time.monotonic() - start
+        TRACE.add_span("configure", working, cat="node", lane=name, ok=result["ok"])
+        return result
+
+
+async def provision_consoles(jobs, concurrency=8, console_timeout=30, ready=None, sessions=None):
+    """
+    Push configs to many consoles at once.
+
+    jobs: list of {"name", "host", "port", "kind" ("ios"|"vpcs"), "commands",
+    optional "command_timeout", optional "window" (IOS bulk push, see push_config_block)}
+    ready: optional coroutine function ready(name) -> bool; when given, each
+    job waits on it instead of polling the console port, and only takes a
+    concurrency slot once its node is ready.
+    sessions: optional ConsoleSessions; jobs then run on the node's pooled
+    session instead of a fresh connection.
+    Returns {name: {"ok", "output", "commands", "error", "waited", "seconds"}}
+    in job order, where "commands" holds the per-command results.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+    results = await asyncio.gather(*(_provision_one(j, sem, console_timeout, ready, sessions) for j in jobs))
+    return {r["name"]: r for r in results}
+
+
+async def _provision_when_ready(jobs, concurrency, console_timeout, readiness, sessions):
+    await readiness.start()
+    try:
+        results = await provision_consoles(jobs, concurrency, console_timeout, ready=readiness.wait,
+                                           sessions=sessions)
+        await readiness.wait_all()   # nodes that were only started, not configured
+        return results
+    finally:
+        readiness.close()
+
+
+def run_provisioning(jobs, concurrency=8, console_timeout=30, readiness=None, sessions=None):
+    """
+    Blocking wrapper around provision_consoles() for the sync main() flow.
+
+    readiness: optional lab_readiness.NodeReadiness; it is started inside the
+    event loop and each job is pushed the moment its node becomes ready. It
+    may track more nodes than there are jobs; all of them are ready (or have
+    given up) when this returns.
+    sessions: optional ConsoleSessions; the phase runs on its loop and
+    sessions stay open for later phases.
+    """
+    if readiness is None:
+        coro = provision_consoles(jobs, concurrency=concurrency, console_timeout=console_timeout,
+                                  sessions=sessions)
+    else:
+        coro = _provision_when_ready(jobs, concurrency, console_timeout, readiness, sessions)
+    return sessions.run(coro) if sessions is not None else asyncio.run(coro)
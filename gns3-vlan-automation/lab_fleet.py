@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+lab_fleet.py
+
+Provision many copies of the VLAN lab across several GNS3 servers.
+
+Each lab instance gets its own project (VLAN_Lab_Automation_01, _02, ...)
+and is placed on a server in proportion to the server's capacity weight,
+as long as the server's console-port budget still has room for the lab's
+nodes. Labs run in a pool of worker processes (one vlan_lab_automation
+run_lab() per process, output in a per-lab log), with at most
+`concurrency` labs in flight per server. A lab that fails is retried on a
+different server. The result is a per-lab report (server, attempts,
+success, wall time per phase) as a table and a JSON file.
+
+    python lab_fleet.py --labs 12 \\
+        --server http://10.0.0.5,weight=2,concurrency=3 \\
+        --server http://10.0.0.6,weight=1,concurrency=2,ports=500
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import vlan_lab_automation as lab_automation
+
+FLEET_DIR = Path(__file__).parent / "results" / "fleet"
+
+# Defaults for a server given without options; GNS3 allocates consoles from 5000-10000
+DEFAULT_SERVER = {"weight": 1.0, "concurrency": 2, "ports": 5000}
+
+
+def parse_server(text):
+    """"URL[,weight=W][,concurrency=C][,ports=P]" -> server dict."""
+    url, *options = text.split(",")
+    server = dict(DEFAULT_SERVER, url=url.rstrip("/"))
+    for option in options:
+        key, _, value = option.partition("=")
+        if key not in DEFAULT_SERVER:
+            raise ValueError(f"unknown server option {key!r} in {text!r}")
+        server[key] = type(DEFAULT_SERVER[key])(value)
+    if server["concurrency"] < 1:
+        raise ValueError(f"concurrency must be at least 1 in {text!r}")
+    return server
+
+
+def provision_lab(job):
+    """
+    Worker: build one lab instance on one server (runs in a pool process).
+    stdout goes to the job's log file; returns a result dict for the report.
+    """
+    t0 = time.time()
+    result = {"ok": False, "phases": {}, "configured": 0, "failed": 0, "pings": "0/0", "error": None}
+    Path(job["log"]).parent.mkdir(parents=True, exist_ok=True)
+    with open(job["log"], "a") as log, contextlib.redirect_stdout(log):
+        print(f"=== {job['project']} on {job['server']} (attempt {job['attempt']}) ===")
+        try:
+            lab = lab_automation.build_lab(job["vlans"], job["hosts_per_vlan"], job["base_prefix"],
+                                           job["prefixlen"])
+            spec = lab_automation.build_lab_spec(lab)
+            spec["project"] = job["project"]
+            outcome = lab_automation.run_lab(lab, spec, server=job["server"], verify=job["verify"],
+                                             settle=job["settle"], state_file=job["state_file"],
+                                             report_dir=Path(job["log"]).parent, golden=job["golden"])
+            reachable = sum(1 for r in outcome["rows"] if r["received"] > 0)
+            result.update(phases=outcome["phases"], configured=len(outcome["configured"]),
+                          failed=len(outcome["failed"]), pings=f"{reachable}/{len(outcome['rows'])}")
+            if outcome["failed"]:
+                result["error"] = "; ".join(f"{n}: {e}" for n, e in list(outcome["failed"].items())[:3])
+            elif reachable < len(outcome["rows"]):
+                result["error"] = f"{len(outcome['rows']) - reachable} pings failed"
+            else:
+                result["ok"] = True
+        except Exception as e:   # any failure is reported and may be retried elsewhere
+            result["error"] = f"{type(e).__name__}: {e}"
+            print("Lab failed:", result["error"])
+    result["seconds"] = time.time() - t0
+    return result
+
+
+class FleetScheduler:
+    """
+    Weighted placement with per-server concurrency limits and console-port
+    budgets, plus retry of failed labs on another server.
+
+    servers: [{"url", "weight", "concurrency", "ports"}]
+    ports_per_lab: console ports one lab instance needs (one per node)
+    """
+
+    def __init__(self, servers, ports_per_lab, retries=1):
+        self.servers = servers
+        self.ports_per_lab = ports_per_lab
+        self.retries = retries
+        self.placed = {s["url"]: 0 for s in servers}
+        self.running = {s["url"]: 0 for s in servers}
+        self.ports_left = {s["url"]: s["ports"] for s in servers}
+
+    def choose(self, exclude=()):
+        """
+        Server for the next lab: the eligible one (not excluded, enough console
+        ports left) with the lowest weighted load, or None.
+        """
+        best = None
+        for s in self.servers:
+            url = s["url"]
+            if url in exclude or self.ports_left[url] < self.ports_per_lab or s["weight"] <= 0:
+                continue
+            load = (self.placed[url] + 1) / s["weight"]
+            if best is None or load < best[0]:
+                best = (load, url)
+        return best and best[1]
+
+    def place(self, count):
+        """Initial placement of `count` labs -> list of server urls (None = no capacity)."""
+        placement = []
+        for _ in range(count):
+            url = self.choose()
+            if url is not None:
+                self.placed[url] += 1
+                self.ports_left[url] -= self.ports_per_lab
+            placement.append(url)
+        return placement
+
+    def replace(self, exclude):
+        """Place a retry on another server; returns its url or None."""
+        url = self.choose(exclude)
+        if url is not None:
+            self.placed[url] += 1
+            self.ports_left[url] -= self.ports_per_lab
+        return url
+
+    def has_slot(self, url):
+        limit = next(s["concurrency"] for s in self.servers if s["url"] == url)
+        return self.running[url] < limit
+
+
+def run_fleet(servers, labs, vlans, hosts_per_vlan, verify="vlan", retries=1, workers=None,
+              settle=lab_automation.SETTLE_SECONDS, out_dir=FLEET_DIR, project_prefix=lab_automation.PROJECT_NAME,
+              base_prefix=lab_automation.BASE_PREFIX, prefixlen=lab_automation.SUBNET_PREFIXLEN, golden=False):
+    """
+    Provision `labs` lab instances across `servers`; returns one report row per lab.
+
+    golden: restore/save golden snapshots per lab project. Off by default: a
+    fleet lab is usually built once, and saving the snapshot stops and
+    restarts every lab after it is verified.
+    """
+    out_dir = Path(out_dir)
+    lab = lab_automation.build_lab(vlans, hosts_per_vlan, base_prefix, prefixlen)
+    nodes = len(lab_automation.build_lab_spec(lab)["nodes"])
+    sched = FleetScheduler(servers, ports_per_lab=nodes, retries=retries)
+    placement = sched.place(labs)
+
+    reports = []
+    pending = []   # (lab index, server url, attempt)
+    for i, url in enumerate(placement, 1):
+        project = f"{project_prefix}_{i:02d}"
+        reports.append({"lab": project, "server": url, "attempts": 0, "ok": False, "seconds": 0.0,
+                        "tried": [], "error": None if url else "no server with console ports left"})
+        if url:
+            pending.append((i - 1, url, 1))
+
+    def job_for(index, url, attempt):
+        project = reports[index]["lab"]
+        host = url.split("//")[-1].replace(":", "_").replace("/", "_")
+        return {"project": project, "server": url, "attempt": attempt, "vlans": vlans,
+                "hosts_per_vlan": hosts_per_vlan, "base_prefix": base_prefix, "prefixlen": prefixlen,
+                "verify": verify, "settle": settle, "golden": golden,
+                "log": str(out_dir / f"{project}.log"), "state_file": str(out_dir / f"state-{host}-{project}.json")}
+
+    workers = workers or sum(s["concurrency"] for s in servers)
+    ctx = multiprocessing.get_context("spawn")
+    t0 = time.time()
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=ctx) as pool:
+        futures = {}
+        while pending or futures:
+            # Dispatch every pending lab whose server has a free slot
+            waiting = []
+            for index, url, attempt in pending:
+                if len(futures) < workers and sched.has_slot(url):
+                    sched.running[url] += 1
+                    reports[index]["tried"].append(url)
+                    future = pool.submit(provision_lab, job_for(index, url, attempt))
+                    futures[future] = (index, url, attempt)
+                else:
+                    waiting.append((index, url, attempt))
+            pending = waiting
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, url, attempt = futures.pop(future)
+                sched.running[url] -= 1
+                try:
+                    result = future.result()
+                except Exception as e:   # worker process died
+                    result = {"ok": False, "error": f"{type(e).__name__}: {e}", "seconds": 0.0, "phases": {}}
+                report = reports[index]
+                spent = report["seconds"] + result["seconds"]
+                report.update(result, server=url, attempts=attempt, seconds=spent)
+                print(f"{report['lab']} on {url}: {'ok' if result['ok'] else 'FAILED'} "
+                      f"in {result['seconds']:.1f}s" + ("" if result["ok"] else f" ({result['error']})"))
+                if not result["ok"] and attempt <= sched.retries:
+                    retry = sched.replace(exclude=report["tried"])
+                    if retry:
+                        print(f"  retrying {report['lab']} on {retry}")
+                        pending.append((index, retry, attempt + 1))
+    for index, url, attempt in pending:   # only left on a server that can never run a lab
+        report = reports[index]
+        report.update(server=url, attempts=attempt, error=f"no free slot on {url}")
+        print(f"{report['lab']} on {url}: FAILED ({report['error']})")
+    print(f"{sum(r['ok'] for r in reports)}/{labs} labs provisioned in {time.time() - t0:.1f}s")
+    return reports
+
+
+def format_report(reports):
+    cols = ["lab", "server", "attempts", "ok", "project", "reconcile", "provision", "verify", "seconds", "pings"]
+    rows = []
+    for r in reports:
+        phases = r.get("phases", {})
+        row = {**r, **{k: phases.get(k) for k in ("project", "reconcile", "provision", "verify")}}
+        rows.append([_cell(row.get(c)) for c in cols])
+    widths = [max(len(c), *(len(row[i]) for row in rows)) for i, c in enumerate(cols)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(cols, widths))]
+    lines += ["  ".join(v.ljust(w) for v, w in zip(row, widths)) for row in rows]
+    for r in reports:
+        if not r["ok"]:
+            lines.append(f"  {r['lab']}: {r['error']}")
+    return "\n".join(lines)
+
+
+def _cell(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.1f}s"
+    return str(value)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Provision many VLAN labs across several GNS3 servers.")
+    parser.add_argument("--server", action="append", required=True, type=parse_server,
+                        help="URL[,weight=W][,concurrency=C][,ports=P]; repeat for every server")
+    parser.add_argument("--labs", type=int, required=True, help="number of lab instances")
+    parser.add_argument("--vlans", type=int, default=lab_automation.VLAN_COUNT)
+    parser.add_argument("--hosts-per-vlan", type=int, default=lab_automation.HOSTS_PER_VLAN)
+    parser.add_argument("--base-prefix", default=lab_automation.BASE_PREFIX)
+    parser.add_argument("--prefixlen", type=int, default=lab_automation.SUBNET_PREFIXLEN,
+                        help="per-VLAN subnet length (0 = smallest that fits)")
+    parser.add_argument("--verify", choices=["vlan", "full", "gateway", "none"], default="vlan")
+    parser.add_argument("--golden", action="store_true",
+                        help="save a golden snapshot of every lab project (and restore it on re-runs)")
+    parser.add_argument("--retries", type=int, default=1, help="other servers to try for a failed lab")
+    parser.add_argument("--workers", type=int, help="worker processes (default: sum of server concurrency)")
+    parser.add_argument("--out", type=Path, default=FLEET_DIR, help="directory for per-lab logs and the report")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    reports = run_fleet(args.server, args.labs, args.vlans, args.hosts_per_vlan, args.verify,
+                        args.retries, args.workers, out_dir=args.out, base_prefix=args.base_prefix,
+                        prefixlen=args.prefixlen or None, golden=args.golden)
+    print(format_report(reports))
+    args.out.mkdir(parents=True, exist_ok=True)
+    path = args.out / time.strftime("fleet-%Y%m%d-%H%M%S.json")
+    path.write_text(json.dumps(reports, indent=2))
+    print("Fleet report:", path)
+
+
+if __name__ == "__main__":
+    main()
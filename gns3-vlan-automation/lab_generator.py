@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+lab_generator.py
+
+Scalable VLAN lab generator.
+
+Given a VLAN count, hosts per VLAN and a base prefix, allocates one subnet
+per VLAN with the ipaddress module, puts the gateway on the last usable
+address, numbers the hosts from the first usable one, and assigns every
+host a switch port. When one switch runs out of adapters, more access
+switches are added as a tree of dot1q trunks (every switch keeps a few
+adapters for downstream switches), so depth grows with log(switches).
+
+The router connects with one access link per VLAN when it has enough
+adapters, otherwise with a single trunk and dot1q subinterfaces.
+
+generate_lab() returns a plain-dict address/port plan; lab_spec() turns it
+into a lab_topology spec with rendered device configs.
+"""
+
+import ipaddress
+from collections import deque
+
+MAX_VLAN = 4094
+RESERVED_VLANS = range(1002, 1006)   # IOS default FDDI/Token Ring VLANs, cannot be configured
+
+
+def vlan_ids(count, first=10, step=10):
+    """
+    `count` VLAN ids from `first` in steps of `step`, skipping the reserved
+    1002-1005. Raises ValueError if they do not all fit in 1-4094.
+    """
+    if first < 1 or step < 1:
+        raise ValueError("first VLAN id and VLAN step must be at least 1")
+    ids, vid = [], first
+    while len(ids) < count:
+        if vid > MAX_VLAN:
+            raise ValueError(f"{count} VLANs from {first} in steps of {step} go past VLAN {MAX_VLAN}")
+        if vid not in RESERVED_VLANS:
+            ids.append(vid)
+        vid += step
+    return ids
+
+
+def switch_iface(adapter, group=4):
+    """IOSv-L2 interface name for a GNS3 adapter number (Gi0/0-0/3, Gi1/0-1/3, ...)."""
+    return f"GigabitEthernet{adapter // group}/{adapter % group}"
+
+
+def router_iface(adapter):
+    """Router (e.g. Cisco 2911) interface name for a GNS3 adapter number."""
+    return f"GigabitEthernet0/{adapter}"
+
+
+def subnet_prefixlen(hosts):
+    """Smallest prefix length holding `hosts` hosts plus the gateway."""
+    needed = hosts + 3   # network + broadcast + gateway
+    return 32 - max(2, (needed - 1).bit_length())
+
+
+def generate_lab(vlan_count, hosts_per_vlan, base_prefix="10.0.0.0/16", prefixlen=None,
+                 first_vlan=10, vlan_step=10, vlan_names=None,
+                 router_adapters=3, switch_adapters=16, downlinks=2,
+                 router_name="R1", switch_prefix="SW", host_prefix="PC"):
+    """
+    Build the address and port plan for a lab.
+
+    prefixlen: per-VLAN subnet size (default: the smallest that fits)
+    vlan_names: optional names for the first VLANs (default "VLAN<id>")
+    router_adapters / switch_adapters: adapters available on each device
+    downlinks: adapters every switch keeps for downstream switches
+
+    Returns {
+        "router": {"name", "mode" ("access"|"trunk"), "ports": [{"adapter", "vlan"|None}]},
+        "vlans": [{"id", "name", "network", "mask", "prefixlen", "gateway", "hosts"}],
+        "switches": {name: {"uplink": (parent, parent_adapter)|None,
+                            "ports": {adapter: {"mode", "vlan", "peer"}}}},
+        "hosts": {name: {"vlan", "ip", "mask", "gateway", "switch", "adapter"}},
+        "links": [{"a": [node, adapter, 0], "b": [node, adapter, 0]}],
+    }
+    VLAN ids run from first_vlan in steps of vlan_step, skipping 1002-1005.
+    Raises ValueError if the base prefix cannot hold the requested VLANs or
+    the VLAN ids go past 4094.
+    """
+    if vlan_count < 1 or hosts_per_vlan < 0:
+        raise ValueError("need at least one VLAN and a non-negative host count")
+    if switch_adapters < downlinks + 2 or downlinks < 0:
+        raise ValueError("switch needs adapters for an uplink, downlinks and at least one host")
+    base = ipaddress.ip_network(base_prefix)
+    fit = subnet_prefixlen(hosts_per_vlan)
+    prefixlen = fit if prefixlen is None else prefixlen
+    if prefixlen > fit:
+        raise ValueError(f"/{prefixlen} cannot hold {hosts_per_vlan} hosts plus a gateway")
+    if prefixlen < base.prefixlen or (1 << (prefixlen - base.prefixlen)) < vlan_count:
+        raise ValueError(f"{base} cannot hold {vlan_count} /{prefixlen} subnets")
+    ids = vlan_ids(vlan_count, first_vlan, vlan_step)
+
+    names = list(vlan_names or [])
+    block = 1 << (32 - prefixlen)
+    net0 = int(base.network_address)
+    mask = str(ipaddress.IPv4Address((0xFFFFFFFF << (32 - prefixlen)) & 0xFFFFFFFF))
+    v4 = ipaddress.IPv4Address
+
+    lab = {"router": {"name": router_name, "mode": "access" if vlan_count <= router_adapters else "trunk",
+                      "ports": []},
+           "vlans": [], "switches": {}, "hosts": {}, "links": []}
+
+    # ---- switch tree ---------------------------------------------------------
+    root = f"{switch_prefix}1"
+    switches = lab["switches"]
+    free_downlinks = deque()   # (switch, adapter) slots for the next child switch
+
+    def add_switch(name, uplink):
+        switches[name] = {"uplink": uplink, "ports": {}}
+        reserved = list(range(switch_adapters - downlinks, switch_adapters))
+        free_downlinks.extend((name, a) for a in reserved)
+        first = 0 if uplink is None else 1
+        return deque(range(first, switch_adapters - downlinks))
+
+    host_ports = add_switch(root, None)
+    current = root
+
+    # Router side: one access link per VLAN, or one trunk carrying all of them
+    router_links = vlan_count if lab["router"]["mode"] == "access" else 1
+    for idx in range(router_links):
+        sw_adapter = host_ports.popleft()
+        vlan = ids[idx] if lab["router"]["mode"] == "access" else None
+        lab["router"]["ports"].append({"adapter": idx, "vlan": vlan})
+        switches[root]["ports"][sw_adapter] = {"mode": "trunk" if vlan is None else "access", "vlan": vlan,
+                                               "peer": router_name}
+        lab["links"].append({"a": [router_name, idx, 0], "b": [root, sw_adapter, 0]})
+
+    def next_host_port():
+        nonlocal host_ports, current
+        if not host_ports:
+            if not free_downlinks:
+                raise ValueError("out of switch ports; allow downlinks for more access switches")
+            parent, parent_adapter = free_downlinks.popleft()
+            current = f"{switch_prefix}{len(switches) + 1}"
+            host_ports = add_switch(current, (parent, parent_adapter))
+            switches[parent]["ports"][parent_adapter] = {"mode": "trunk", "vlan": None, "peer": current}
+            switches[current]["ports"][0] = {"mode": "trunk", "vlan": None, "peer": parent}
+            lab["links"].append({"a": [parent, parent_adapter, 0], "b": [current, 0, 0]})
+        return current, host_ports.popleft()
+
+    # ---- VLANs and hosts -----------------------------------------------------
+    host_no = 0
+    for idx in range(vlan_count):
+        vid = ids[idx]
+        net = net0 + idx * block
+        vlan = {"id": vid, "name": names[idx] if idx < len(names) else f"VLAN{vid}",
+                "network": str(v4(net)), "mask": mask, "prefixlen": prefixlen,
+                "gateway": str(v4(net + block - 2)), "hosts": []}
+        lab["vlans"].append(vlan)
+        for h in range(hosts_per_vlan):
+            host_no += 1
+            name = f"{host_prefix}{host_no}"
+            sw, adapter = next_host_port()
+            switches[sw]["ports"][adapter] = {"mode": "access", "vlan": vid, "peer": name}
+            lab["hosts"][name] = {"vlan": vid, "ip": str(v4(net + 1 + h)), "mask": mask,
+                                  "gateway": vlan["gateway"], "switch": sw, "adapter": adapter}
+            lab["links"].append({"a": [sw, adapter, 0], "b": [name, 0, 0]})
+            vlan["hosts"].append(name)
+    return lab
+
+
+# ---- config rendering ----------------------------------------------------------
+
+def router_config(lab):
+    """IOS config for the router: a gateway per VLAN on interfaces or dot1q subinterfaces."""
+    name = lab["router"]["name"]
+    root = next(iter(lab["switches"]))
+    cmds = ["conf t", f"hostname {name}", "no ip domain-lookup"]
+    if lab["router"]["mode"] == "access":
+        for port, vlan in zip(lab["router"]["ports"], lab["vlans"]):
+            cmds += [f"interface {router_iface(port['adapter'])}",
+                     f" description Link-to-{root}-VLAN{vlan['id']}",
+                     f" ip address {vlan['gateway']} {vlan['mask']}",
+                     " no shutdown"]
+    else:
+        trunk = router_iface(lab["router"]["ports"][0]["adapter"])
+        cmds += [f"interface {trunk}", f" description Trunk-to-{root}", " no shutdown"]
+        for vlan in lab["vlans"]:
+            cmds += [f"interface {trunk}.{vlan['id']}",
+                     f" description VLAN{vlan['id']}-{vlan['name']}",
+                     f" encapsulation dot1Q {vlan['id']}",
+                     f" ip address {vlan['gateway']} {vlan['mask']}"]
+    return cmds + ["end", "wr"]
+
+
+def switch_config(lab, name, port_group=4):
+    """IOSv-L2 config for one switch: all VLANs, access host ports, dot1q trunks."""
+    cmds = ["conf t", f"hostname {name}"]
+    for vlan in lab["vlans"]:
+        cmds += [f"vlan {vlan['id']}", f" name {vlan['name']}"]
+    for adapter, port in sorted(lab["switches"][name]["ports"].items()):
+        cmds.append(f"interface {switch_iface(adapter, port_group)}")
+        if port["mode"] == "trunk":
+            cmds += [f" description Trunk-to-{port['peer']}",
+                     " switchport trunk encapsulation dot1q",
+                     " switchport mode trunk"]
+        else:
+            kind = "Link-to" if port["peer"] == lab["router"]["name"] else "Host-port"
+            cmds += [f" description {kind}-{port['peer']}-VLAN{port['vlan']}",
+                     " switchport mode access",
+                     f" switchport access vlan {port['vlan']}"]
+        cmds.append(" no shutdown")
+    return cmds + ["end", "wr"]
+
+
+def host_config(lab, name):
+    """VPCS config for one host."""
+    h = lab["hosts"][name]
+    return [f"ip {h['ip']} {h['mask']}", f"gateway {h['gateway']}", "save"]
+
+
+def lab_spec(lab, project, router_template, switch_template, host_template, port_group=4):
+    """Turn a generate_lab() plan into a lab_topology spec (with a simple grid layout)."""
+    nodes = {lab["router"]["name"]: {"template": router_template, "kind": "ios", "x": 0, "y": -300,
+                                     "config": router_config(lab)}}
+    switch_names = list(lab["switches"])
+    for idx, name in enumerate(switch_names):
+        nodes[name] = {"template": switch_template, "kind": "ios",
+                       "x": (idx - (len(switch_names) - 1) / 2) * 200, "y": -100,
+                       "config": switch_config(lab, name, port_group)}
+    per_switch = {}
+    for name, h in lab["hosts"].items():
+        slot = per_switch.setdefault(h["switch"], 0)
+        per_switch[h["switch"]] = slot + 1
+        sx = nodes[h["switch"]]["x"]
+        nodes[name] = {"template": host_template, "kind": "vpcs",
+                       "x": sx + (slot % 4 - 1.5) * 45, "y": 100 + (slot // 4) * 60,
+                       "config": host_config(lab, name)}
+    return {"project": project, "nodes": nodes, "links": [dict(l) for l in lab["links"]]}
+
+
+def describe_lab(lab):
+    """Short human-readable address plan."""
+    lines = [f"{len(lab['vlans'])} VLANs, {len(lab['hosts'])} hosts, {len(lab['switches'])} switches, "
+             f"{len(lab['links'])} links, router in {lab['router']['mode']} mode"]
+    for v in lab["vlans"][:10]:
+        hosts = v["hosts"]
+        span = f"{hosts[0]}..{hosts[-1]}" if hosts else "no hosts"
+        subnet = f"{v['network']}/{v['prefixlen']}"
+        lines.append(f"  VLAN {v['id']:<5} {v['name']:<14} {subnet:<18} gw {v['gateway']:<15} {span}")
+    if len(lab["vlans"]) > 10:
+        lines.append(f"  ... {len(lab['vlans']) - 10} more VLANs")
+    return "\n".join(lines)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+lab_readiness.py
+
+Event-driven node readiness for the VLAN lab.
+
+Every node is started in parallel and walks through its own pipeline:
+
+    start request -> status "started" -> console shows a prompt -> ready
+
+Node status comes from the project notification stream
+(/v2/projects/{id}/notifications), falling back to polling the node list
+with adaptive backoff if the stream is unavailable. Console probes run for
+all nodes at once, and each node's "ready" event fires as soon as its own
+console answers, so configuration of fast nodes (VPCS) never waits for
+slow ones (IOS).
+"""
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gns3_client import Gns3Error
+from lab_console import open_when_ready
+from lab_trace import TRACE
+
+# Adaptive polling bounds (seconds) when the notification stream is unavailable
+POLL_MIN = 0.2
+POLL_MAX = 3.0
+
+
+class NodeReadiness:
+    """
+    Start nodes and track when each one is ready for configuration.
+
+    nodes: {name: node dict from the GNS3 API (node_id, console, console_host)}
+    kinds: {name: "ios" | "vpcs"} prompt family of each node's console
+
+    sessions: optional lab_console.ConsoleSessions; the console that answered
+    the probe is handed to the node's session instead of being closed
+
+    Use from a running event loop: `await start()`, then `await wait(name)`
+    per node, and `close()` when done. ready_at[name] holds the seconds from
+    start() to readiness; errors[name] explains nodes that never got ready.
+    """
+
+    def __init__(self, client, project_id, nodes, kinds, boot_timeout=300, use_notifications=True,
+                 sessions=None):
+        self.client = client
+        self.project_id = project_id
+        self.nodes = nodes
+        self.kinds = kinds
+        self.boot_timeout = boot_timeout
+        self.use_notifications = use_notifications
+        self.sessions = sessions
+        self.ready_at = {}
+        self.errors = {}
+        self._started = {}
+        self._ready = {}
+        self._ok = {}
+        self._tasks = []
+        self._stop = threading.Event()
+        self._stream = None
+        self._pool = None
+        self._loop = None
+        self._t0 = None
+
+    # ---- status feed (runs in a worker thread) ----------------------------
+
+    def _on_node(self, node):
+        """Status update from any source; safe to call from any thread."""
+        if self._stop.is_set():
+            return
+        if node.get("name") in self._started and node.get("status") == "started":
+            self._loop.call_soon_threadsafe(self._started[node["name"]].set)
+
+    def _watch(self):
+        if self.use_notifications:
+            try:
+                self._watch_notifications()
+            except Exception as e:   # any stream failure just degrades to polling
+                if not self._stop.is_set():
+                    print("Notification stream unavailable, polling node status instead:", e)
+            if self._stop.is_set():
+                return
+        self._poll()
+
+    def _watch_notifications(self):
+        self._stream = self.client.stream(f"/projects/{self.project_id}/notifications")
+        try:
+            for line in self._stream.iter_lines():
+                if self._stop.is_set():
+                    return
+                if not line:
+                    continue
+                msg = json.loads(line)
+                if msg.get("action") in ("node.updated", "node.created"):
+                    self._on_node(msg.get("event", {}))
+        finally:
+            self._stream.close()
+
+    def _poll(self):
+        delay = POLL_MIN
+        seen = {}
+        while not self._stop.wait(delay):
+            try:
+                nodes = self.client.nodes(self.project_id)
+            except Gns3Error:
+                delay = min(delay * 2, POLL_MAX)
+                continue
+            changed = False
+            for node in nodes:
+                if seen.get(node["name"]) != node.get("status"):
+                    seen[node["name"]] = node.get("status")
+                    changed = True
+                self._on_node(node)
+            delay = POLL_MIN if changed else min(delay * 1.5, POLL_MAX)
+
+    # ---- per-node pipeline -------------------------------------------------
+
+    async def _bring_up(self, name):
+        node = self.nodes[name]
+        try:
+            with TRACE.span("start request", cat="node", lane=name):
+                reported = await self._loop.run_in_executor(
+                    self._pool, self.client.start_node, self.project_id, node["node_id"])
+            if reported and reported.get("status") == "started":
+                self._started[name].set()
+            with TRACE.span("wait for started", cat="node", lane=name, kind="wait"):
+                await asyncio.wait_for(self._started[name].wait(), timeout=self.boot_timeout)
+            remaining = self.boot_timeout - (time.monotonic() - self._t0)
+            host = node.get("console_host") or "127.0.0.1"
+            with TRACE.span("boot to prompt", cat="node", lane=name, kind="wait"):
+                console = await open_when_ready(host, node["console"], self.kinds.get(name, "ios"), remaining)
+            if console is not None:
+                if self.sessions is not None and name in self.sessions.sessions:
+                    self.sessions[name].adopt(console)
+                else:
+                    await console.close()
+                self._ok[name] = True
+                self.ready_at[name] = time.monotonic() - self._t0
+            else:
+                self.errors[name] = "console never showed a prompt"
+        except Gns3Error as e:
+            self.errors[name] = f"start failed: {e}"
+        except asyncio.TimeoutError:
+            self.errors[name] = "node never reported started"
+        finally:
+            self._ready[name].set()
+
+    async def start(self):
+        """Kick off start requests, the status watcher and all console probes."""
+        self._loop = asyncio.get_running_loop()
+        self._t0 = time.monotonic()
+        self._pool = ThreadPoolExecutor(max_workers=self.client.max_workers)
+        for name in self.nodes:
+            self._started[name] = asyncio.Event()
+            self._ready[name] = asyncio.Event()
+            self._ok[name] = False
+        threading.Thread(target=self._watch, name="gns3-node-status", daemon=True).start()
+        self._tasks = [asyncio.ensure_future(self._bring_up(name)) for name in self.nodes]
+
+    async def wait(self, name):
+        """Block until `name` is ready (True) or has given up (False)."""
+        if name not in self._ready:
+            return False
+        await self._ready[name].wait()
+        return self._ok[name]
+
+    async def wait_all(self):
+        await asyncio.gather(*self._tasks)
+        return dict(self._ok)
+
+    def close(self):
+        self._stop.set()
+        if self._stream is not None:
+            self._stream.close()
+        for task in self._tasks:
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
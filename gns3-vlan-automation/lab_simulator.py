@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""
+lab_simulator.py
+
+Local stand-in for a GNS3 server, for development and benchmarking
+without a real lab.
+
+- A fake GNS3 v2 REST API (version, templates, projects, nodes, links,
+  node start/stop, snapshots and the project notification stream) on a
+  threaded http.server
+- One fake telnet console per node on an asyncio loop: IOS consoles with
+  an initial-config dialog, exec/config modes, hostname and ip address
+  tracking; VPCS consoles with ip/gateway/save and ping
+
+Timing and faults are configurable: boot delay per device kind (with
+jitter), prompt latency, ping round-trip time, REST latency, and injected
+failures (rejected config lines, dropped console sessions, transient 5xx
+answers to start requests).
+
+Stdlib only. Run standalone with
+
+    python lab_simulator.py --port 3080
+
+and point GNS3_SERVER at http://127.0.0.1:3080, or use Gns3Simulator
+from Python (see lab_benchmark.py).
+"""
+
+import argparse
+import asyncio
+import json
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Template name -> console kind, as installed on the reference server
+DEFAULT_TEMPLATES = {"Cisco 2911": "ios", "IOSv-L2": "ios", "VPCS": "vpcs"}
+
+# Seconds from start request to a usable console prompt
+DEFAULT_BOOT = {"ios": 2.0, "vpcs": 0.2}
+
+IAC = 255
+WILL = 251
+OPT_ECHO = 1
+OPT_SGA = 3
+
+_PING = re.compile(r"^ping\s+(\S+)(?:.*?-c\s+(\d+))?", re.IGNORECASE)
+_IP_ADDRESS = re.compile(r"^ip address (\S+) \S+")
+
+
+def _strip_telnet(data):
+    """Drop IAC negotiation sequences sent by the client."""
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        if data[i] == IAC and i + 1 < len(data):
+            i += 3 if data[i + 1] in (251, 252, 253, 254) else 2
+            continue
+        out.append(data[i])
+        i += 1
+    return bytes(out)
+
+
+def _deliver(writer, data):
+    if not writer.is_closing():
+        writer.write(data)
+
+
+class SimNode:
+    """State of one simulated device; survives console reconnects."""
+
+    def __init__(self, node_id, project_id, name, template, template_id, kind, x, y):
+        self.node_id = node_id
+        self.project_id = project_id
+        self.name = name
+        self.template = template
+        self.template_id = template_id
+        self.kind = kind
+        self.x = x
+        self.y = y
+        self.status = "stopped"
+        self.console = None
+        self.server = None
+        self.booted_at = None
+        self.hostname = "Switch" if "L2" in template else "Router"
+        self.mode = "user"
+        self.dialog_done = False
+        self.addresses = set()
+        self.commands = 0
+
+    def as_dict(self):
+        return {"node_id": self.node_id, "project_id": self.project_id, "name": self.name,
+                "template_id": self.template_id, "node_type": "vpcs" if self.kind == "vpcs" else "qemu",
+                "status": self.status, "console": self.console, "console_host": "127.0.0.1",
+                "console_type": "telnet", "x": self.x, "y": self.y}
+
+    def booted(self):
+        return self.status == "started" and time.monotonic() >= self.booted_at
+
+    def prompt(self):
+        if self.kind == "vpcs":
+            return f"{self.name}> "
+        suffix = {"user": ">", "exec": "#"}.get(self.mode, f"({self.mode})#")
+        return f"{self.hostname}{suffix}"
+
+
+class Gns3Simulator:
+    """
+    Fake GNS3 server with fake device consoles.
+
+    boot: {kind: seconds} boot delay; boot_jitter: +/- fraction applied per node
+    prompt_latency: seconds the device spends on each console line
+    console_rtt: network round trip added to every console answer (does not
+        hold up the next line, so pipelined input overlaps it)
+    ping_rtt: seconds per echo request answered by a VPCS ping
+    http_latency: seconds added to every REST call
+    error_rate: probability that an IOS config line is rejected
+    drop_rate: probability that a console connection drops on a command
+    start_fail_rate: probability that a start request answers 503
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, templates=None, boot=None, boot_jitter=0.2,
+                 prompt_latency=0.005, console_rtt=0.0, ping_rtt=0.01, http_latency=0.0,
+                 error_rate=0.0, drop_rate=0.0, start_fail_rate=0.0, seed=0):
+        self.host = host
+        self.port = port
+        self.templates = {name: {"template_id": str(uuid.uuid5(uuid.NAMESPACE_URL, name)), "name": name,
+                                 "kind": kind}
+                          for name, kind in (templates or DEFAULT_TEMPLATES).items()}
+        self.boot = dict(DEFAULT_BOOT, **(boot or {}))
+        self.boot_jitter = boot_jitter
+        self.prompt_latency = prompt_latency
+        self.console_rtt = console_rtt
+        self.ping_rtt = ping_rtt
+        self.http_latency = http_latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.start_fail_rate = start_fail_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.projects = {}
+        self.nodes = {}
+        self.links = {}
+        self.snapshots = {}     # project_id -> [snapshot]
+        self.subscribers = {}   # project_id -> [queue.Queue]
+        self.stats = {"http_requests": 0, "console_connections": 0, "console_commands": 0,
+                      "injected_errors": 0, "injected_drops": 0, "injected_start_failures": 0}
+        self.loop = None
+        self.httpd = None
+        self._threads = []
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.httpd.server_address[1]}"
+
+    # ---- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        t = threading.Thread(target=self.loop.run_forever, name="sim-consoles", daemon=True)
+        t.start()
+        self.httpd = ThreadingHTTPServer((self.host, self.port), _handler(self))
+        self.httpd.daemon_threads = True
+        h = threading.Thread(target=self.httpd.serve_forever, name="sim-rest", daemon=True)
+        h.start()
+        self._threads = [t, h]
+        return self
+
+    def stop(self):
+        if self.httpd is None:
+            return
+        with self.lock:
+            for subs in self.subscribers.values():
+                for q in subs:
+                    q.put(None)
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        servers = [n.server for n in self.nodes.values() if n.server is not None]
+        for server in servers:
+            self.loop.call_soon_threadsafe(server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._threads[0].join(5)
+        self.loop.close()
+        self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def _chance(self, p):
+        return p > 0 and self.rng.random() < p
+
+    def _notify(self, project_id, action, event):
+        with self.lock:
+            subs = list(self.subscribers.get(project_id, ()))
+        for q in subs:
+            q.put({"action": action, "event": event})
+
+    # ---- REST model --------------------------------------------------------
+
+    def api(self, method, path, body):
+        """Dispatch one REST call; returns (status, payload)."""
+        self._count("http_requests")
+        if self.http_latency:
+            time.sleep(self.http_latency)
+        parts = [p for p in path.split("?")[0].split("/") if p][1:]   # drop "v2"
+        if parts == ["version"]:
+            return 200, {"version": "2.2.54", "local": True}
+        if parts == ["templates"]:
+            return 200, [{"template_id": t["template_id"], "name": t["name"],
+                          "template_type": "vpcs" if t["kind"] == "vpcs" else "qemu"}
+                         for t in self.templates.values()]
+        if parts == ["projects"]:
+            if method == "GET":
+                return 200, list(self.projects.values())
+            if method == "POST":
+                return 201, self._create_project(body.get("name", "Untitled"))
+        if len(parts) < 2 or parts[0] != "projects" or parts[1] not in self.projects:
+            return 404, {"message": f"{method} {path} not found"}
+        pid = parts[1]
+        rest = parts[2:]
+        if rest == ["open"] and method == "POST":
+            self.projects[pid]["status"] = "opened"
+            return 201, self.projects[pid]
+        if rest == [] and method == "GET":
+            return 200, self.projects[pid]
+        if len(rest) == 2 and rest[0] == "templates" and method == "POST":
+            return self._create_node(pid, rest[1], body)
+        if rest == ["nodes"] and method == "GET":
+            return 200, [n.as_dict() for n in self.nodes.values() if n.project_id == pid]
+        if len(rest) >= 2 and rest[0] == "nodes":
+            node = self.nodes.get(rest[1])
+            if node is None or node.project_id != pid:
+                return 404, {"message": f"node {rest[1]} not found"}
+            return self._node_call(node, method, rest[2:], body)
+        if rest == ["snapshots"] and method == "GET":
+            return 200, [{k: v for k, v in s.items() if not k.startswith("_")} for s in self.snapshots.get(pid, ())]
+        if rest == ["snapshots"] and method == "POST":
+            return self._create_snapshot(pid, body.get("name", "snapshot"))
+        if len(rest) == 3 and rest[0] == "snapshots" and rest[2] == "restore" and method == "POST":
+            return self._restore_snapshot(pid, rest[1])
+        if rest == ["links"] and method == "GET":
+            return 200, [l for l in self.links.values() if l["project_id"] == pid]
+        if rest == ["links"] and method == "POST":
+            return self._create_link(pid, body)
+        if len(rest) == 2 and rest[0] == "links" and method == "DELETE":
+            if self.links.pop(rest[1], None) is None:
+                return 404, {"message": f"link {rest[1]} not found"}
+            return 204, None
+        return 404, {"message": f"{method} {path} not supported by the simulator"}
+
+    def _create_project(self, name):
+        pid = str(uuid.uuid4())
+        project = {"project_id": pid, "name": name, "status": "opened"}
+        with self.lock:
+            self.projects[pid] = project
+            self.subscribers[pid] = []
+        return project
+
+    def _create_node(self, pid, template_id, body):
+        template = next((t for t in self.templates.values() if t["template_id"] == template_id), None)
+        if template is None:
+            return 404, {"message": f"template {template_id} not found"}
+        nid = str(uuid.uuid4())
+        with self.lock:
+            count = sum(1 for n in self.nodes.values() if n.template == template["name"]) + 1
+        node = SimNode(nid, pid, f"{template['name'].split()[0]}-{count}", template["name"], template_id,
+                       template["kind"], body.get("x", 0), body.get("y", 0))
+        self._attach_console(node)
+        with self.lock:
+            self.nodes[nid] = node
+        self._notify(pid, "node.created", node.as_dict())
+        return 201, node.as_dict()
+
+    def _attach_console(self, node):
+        server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(lambda r, w: self._console(node, r, w), self.host, 0), self.loop).result()
+        node.server = server
+        node.console = server.sockets[0].getsockname()[1]
+
+    # Device state a snapshot keeps (saved configs survive a restore)
+    _SAVED = ("name", "template", "template_id", "kind", "x", "y", "hostname", "dialog_done", "addresses")
+
+    def _create_snapshot(self, pid, name):
+        with self.lock:
+            nodes = [n for n in self.nodes.values() if n.project_id == pid]
+            if any(n.status != "stopped" for n in nodes):
+                return 409, {"message": "Project must be stopped in order to export it"}
+            if any(s["name"] == name for s in self.snapshots.get(pid, ())):
+                return 409, {"message": f"The snapshot name {name} already exists"}
+            snap = {"snapshot_id": str(uuid.uuid4()), "project_id": pid, "name": name,
+                    "created_at": int(time.time()),
+                    "_nodes": {n.node_id: {k: set(getattr(n, k)) if k == "addresses" else getattr(n, k)
+                                           for k in self._SAVED} for n in nodes},
+                    "_links": [json.loads(json.dumps(l)) for l in self.links.values() if l["project_id"] == pid]}
+            self.snapshots.setdefault(pid, []).append(snap)
+        return 201, {k: v for k, v in snap.items() if not k.startswith("_")}
+
+    def _restore_snapshot(self, pid, sid):
+        snap = next((s for s in self.snapshots.get(pid, ()) if s["snapshot_id"] == sid), None)
+        if snap is None:
+            return 404, {"message": f"snapshot {sid} not found"}
+        with self.lock:
+            current = {nid: n for nid, n in self.nodes.items() if n.project_id == pid}
+        for nid, node in current.items():
+            if nid not in snap["_nodes"]:
+                self.loop.call_soon_threadsafe(node.server.close)
+        restored = {}
+        for nid, saved in snap["_nodes"].items():
+            node = current.get(nid)
+            if node is None:
+                node = SimNode(nid, pid, saved["name"], saved["template"], saved["template_id"], saved["kind"],
+                               saved["x"], saved["y"])
+                self._attach_console(node)
+            for key, value in saved.items():
+                setattr(node, key, set(value) if key == "addresses" else value)
+            node.status = "stopped"
+            node.mode = "user"
+            restored[nid] = node
+        with self.lock:
+            for nid in current:
+                self.nodes.pop(nid, None)
+            self.nodes.update(restored)
+            for lid in [lid for lid, l in self.links.items() if l["project_id"] == pid]:
+                del self.links[lid]
+            self.links.update({l["link_id"]: json.loads(json.dumps(l)) for l in snap["_links"]})
+        return 201, self.projects[pid]
+
+    def _node_call(self, node, method, rest, body):
+        if rest == [] and method == "GET":
+            return 200, node.as_dict()
+        if rest == [] and method == "PUT":
+            node.name = body.get("name", node.name)
+            node.x = body.get("x", node.x)
+            node.y = body.get("y", node.y)
+            self._notify(node.project_id, "node.updated", node.as_dict())
+            return 200, node.as_dict()
+        if rest == [] and method == "DELETE":
+            with self.lock:
+                self.nodes.pop(node.node_id, None)
+                for lid in [lid for lid, l in self.links.items()
+                            if any(e["node_id"] == node.node_id for e in l["nodes"])]:
+                    del self.links[lid]
+            self.loop.call_soon_threadsafe(node.server.close)
+            self._notify(node.project_id, "node.deleted", node.as_dict())
+            return 204, None
+        if rest == ["start"] and method == "POST":
+            if self._chance(self.start_fail_rate):
+                self._count("injected_start_failures")
+                return 503, {"message": "compute busy (injected)"}
+            if node.status != "started":
+                delay = self.boot.get(node.kind, 1.0)
+                delay *= 1 + self.rng.uniform(-self.boot_jitter, self.boot_jitter)
+                node.booted_at = time.monotonic() + delay
+                node.status = "started"
+                self._notify(node.project_id, "node.updated", node.as_dict())
+            return 200, node.as_dict()
+        if rest == ["stop"] and method == "POST":
+            node.status = "stopped"
+            node.mode = "user"
+            self._notify(node.project_id, "node.updated", node.as_dict())
+            return 200, node.as_dict()
+        return 404, {"message": f"{method} node/{'/'.join(rest)} not supported by the simulator"}
+
+    def _create_link(self, pid, body):
+        ends = body.get("nodes", [])
+        if len(ends) != 2:
+            return 400, {"message": "a link needs two endpoints"}
+        with self.lock:
+            used = {(e["node_id"], e["adapter_number"], e["port_number"])
+                    for l in self.links.values() for e in l["nodes"]}
+            for e in ends:
+                if e["node_id"] not in self.nodes:
+                    return 404, {"message": f"node {e['node_id']} not found"}
+                if (e["node_id"], e["adapter_number"], e["port_number"]) in used:
+                    return 409, {"message": f"port {e['adapter_number']}/{e['port_number']} is not free"}
+            lid = str(uuid.uuid4())
+            link = {"link_id": lid, "project_id": pid,
+                    "nodes": [{"node_id": e["node_id"], "adapter_number": e["adapter_number"],
+                               "port_number": e["port_number"]} for e in ends]}
+            self.links[lid] = link
+        return 201, link
+
+    # ---- consoles ----------------------------------------------------------
+
+    def _reachable(self, ip):
+        with self.lock:
+            return any(ip in n.addresses for n in self.nodes.values() if n.booted())
+
+    async def _console(self, node, reader, writer):
+        self._count("console_connections")
+        if node.status != "started":
+            writer.close()   # like a stopped qemu node: nothing listening behind the port
+            return
+        writer.write(bytes([IAC, WILL, OPT_ECHO, IAC, WILL, OPT_SGA]))
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = _strip_telnet(raw).decode("ascii", errors="ignore").strip("\r\n")
+                if not node.booted():
+                    continue   # still booting: input is swallowed
+                if self.prompt_latency:
+                    await asyncio.sleep(self.prompt_latency)
+                if line.strip() and self._chance(self.drop_rate):
+                    self._count("injected_drops")
+                    break
+                if node.kind == "vpcs":
+                    reply = await self._vpcs(node, line.strip())
+                else:
+                    reply = self._ios(node, line.strip())
+                prompt = "" if node.mode == "dialog" else node.prompt()
+                data = (line + "\r\n" + reply + prompt).encode("ascii")
+                if self.console_rtt:
+                    self.loop.call_later(self.console_rtt, _deliver, writer, data)
+                else:
+                    writer.write(data)
+                    await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    def _ios(self, node, line):
+        if not node.dialog_done:
+            if node.mode != "dialog":
+                node.mode = "dialog"
+                return "\r\n--- System Configuration Dialog ---\r\n\r\n" \
+                       "Would you like to enter the initial configuration dialog? [yes/no]: "
+            node.dialog_done = True
+            node.mode = "user"
+            return "\r\nPress RETURN to get started!\r\n\r\n"
+        if not line:
+            return ""
+        self._count("console_commands")
+        node.commands += 1
+        words = line.split()
+        cmd = words[0].lower()
+        if node.mode == "user":
+            if cmd == "enable":
+                node.mode = "exec"
+                return ""
+            if cmd == "terminal":
+                return ""
+            return "% Unknown command or computer name, or unable to find computer address\r\n"
+        if node.mode == "exec":
+            if cmd in ("conf", "configure"):
+                node.mode = "config"
+                return "Enter configuration commands, one per line.  End with CNTL/Z.\r\n"
+            if cmd in ("wr", "write", "copy"):
+                return "Building configuration...\r\n[OK]\r\n"
+            if cmd in ("terminal", "end", "enable", "show", "ping"):
+                return ""
+            if cmd == "disable":
+                node.mode = "user"
+                return ""
+            return "% Invalid input detected at '^' marker.\r\n"
+        # configuration modes
+        if self._chance(self.error_rate):
+            self._count("injected_errors")
+            return "% Invalid input detected at '^' marker.\r\n"
+        if cmd == "end":
+            node.mode = "exec"
+        elif cmd == "exit":
+            node.mode = "exec" if node.mode == "config" else "config"
+        elif cmd == "hostname" and len(words) > 1:
+            node.hostname = words[1]
+        elif cmd == "interface" and len(words) > 1:
+            node.mode = "config-subif" if "." in words[-1] else "config-if"
+        elif cmd == "vlan" and len(words) > 1 and words[1].isdigit():
+            node.mode = "config-vlan"
+        elif cmd == "line":
+            node.mode = "config-line"
+        else:
+            m = _IP_ADDRESS.match(line)
+            if m:
+                with self.lock:
+                    node.addresses.add(m.group(1))
+        return ""
+
+    async def _vpcs(self, node, line):
+        if not line:
+            return ""
+        self._count("console_commands")
+        node.commands += 1
+        words = line.split()
+        cmd = words[0].lower()
+        if cmd == "ip" and len(words) > 1:
+            with self.lock:
+                node.addresses = {words[1]}
+            return f"Checking for duplicate address...\r\n{node.name} : {' '.join(words[1:])}\r\n"
+        if cmd == "set" and len(words) > 2 and words[1] == "ip":   # older "set ip A M G" syntax
+            with self.lock:
+                node.addresses = {words[2]}
+            return ""
+        if cmd in ("gateway", "save"):
+            return "Saving startup configuration to startup.vpc\r\n.  done\r\n" if cmd == "save" else ""
+        m = _PING.match(line)
+        if m:
+            ip, count = m.group(1), int(m.group(2) or 5)
+            out = []
+            ok = bool(node.addresses) and self._reachable(ip)
+            for seq in range(1, count + 1):
+                await asyncio.sleep(self.ping_rtt)
+                if ok:
+                    out.append(f"84 bytes from {ip} icmp_seq={seq} ttl=63 time={self.ping_rtt * 1000:.3f} ms")
+                else:
+                    out.append(f"{ip} icmp_seq={seq} timeout")
+            return "\r\n".join(out) + "\r\n"
+        return f"Bad command: \"{line}\". Use ? for help.\r\n"
+
+
+def _handler(sim):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if not length:
+                return {}
+            try:
+                return json.loads(self.rfile.read(length))
+            except ValueError:
+                return {}
+
+        def _send(self, status, payload):
+            data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _dispatch(self, method):
+            body = self._body() if method in ("POST", "PUT") else {}
+            m = re.match(r"^/v2/projects/([^/]+)/notifications$", self.path)
+            if method == "GET" and m:
+                return self._notifications(m.group(1))
+            status, payload = sim.api(method, self.path, body)
+            self._send(status, payload)
+
+        def _notifications(self, pid):
+            if pid not in sim.projects:
+                return self._send(404, {"message": f"project {pid} not found"})
+            q = queue.Queue()
+            with sim.lock:
+                sim.subscribers[pid].append(q)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                while True:
+                    try:
+                        msg = q.get(timeout=0.5)
+                    except queue.Empty:
+                        msg = {"action": "ping", "event": {}}
+                    if msg is None:
+                        break
+                    data = json.dumps(msg).encode("utf-8") + b"\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (ConnectionError, OSError):
+                pass
+            finally:
+                with sim.lock:
+                    sim.subscribers[pid].remove(q)
+                self.close_connection = True
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_PUT(self):
+            self._dispatch("PUT")
+
+        def do_DELETE(self):
+            self._dispatch("DELETE")
+
+    return Handler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a fake GNS3 server with simulated IOS/VPCS consoles.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3080)
+    parser.add_argument("--boot-ios", type=float, default=DEFAULT_BOOT["ios"], help="IOS boot delay (s)")
+    parser.add_argument("--boot-vpcs", type=float, default=DEFAULT_BOOT["vpcs"], help="VPCS boot delay (s)")
+    parser.add_argument("--prompt-latency", type=float, default=0.005, help="device seconds per console line")
+    parser.add_argument("--console-rtt", type=float, default=0.0, help="network round trip of console answers (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability an IOS config line is rejected")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="probability a console drops on a command")
+    parser.add_argument("--start-fail-rate", type=float, default=0.0, help="probability a start request gets 503")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sim = Gns3Simulator(args.host, args.port, boot={"ios": args.boot_ios, "vpcs": args.boot_vpcs},
+                        prompt_latency=args.prompt_latency, console_rtt=args.console_rtt, error_rate=args.error_rate,
+                        drop_rate=args.drop_rate, start_fail_rate=args.start_fail_rate)
+    with sim:
+        print(f"GNS3 simulator listening on {sim.url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("Stopping;", ", ".join(f"{k}={v}" for k, v in sim.stats.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+lab_topology.py
+
+Declarative lab description and an idempotent reconciler.
+
+A lab spec is a plain, JSON-serialisable dict:
+
+    {
+        "project": "VLAN_Lab_Automation",
+        "nodes": {
+            "R1":  {"template": "Cisco 2911", "kind": "ios",  "x": 0, "y": -200, "config": [...]},
+            "PC1": {"template": "VPCS",       "kind": "vpcs", "x": 0, "y": 200,  "config": [...]},
+        },
+        "links": [
+            {"a": ["R1", 0, 0], "b": ["SW1", 0, 0]},    # [node, adapter, port]
+        ],
+    }
+
+plan_changes() compares the spec with one snapshot of the project (nodes +
+links) and a local record of the config last pushed to each node, and
+returns only the work still needed. apply_plan() carries out the topology
+part of that plan through a Gns3Client.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+
+def config_digest(lines):
+    """Stable fingerprint of a device config (list of CLI lines)."""
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def link_key(a, b):
+    """Order-independent identity of a link between two (node, adapter, port) endpoints."""
+    return tuple(sorted([tuple(a), tuple(b)]))
+
+
+def spec_link_keys(spec):
+    return {link_key(l["a"], l["b"]): l for l in spec["links"]}
+
+
+def golden_name(spec):
+    """
+    Snapshot name for a fully built and configured copy of `spec`.
+    Any change to nodes, templates, links or device configs changes the name.
+    """
+    canonical = json.dumps(spec, sort_keys=True, separators=(",", ":"))
+    return "golden-" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+# ---- applied-config state ----------------------------------------------------
+
+def load_state(path, project_name, project_id):
+    """
+    Return {node name: config digest} last applied to this project.
+    A record written for a different project_id (project recreated) is ignored.
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    try:
+        record = json.loads(path.read_text()).get(project_name, {})
+    except (OSError, ValueError):
+        return {}
+    if record.get("project_id") != project_id:
+        return {}
+    return dict(record.get("configs", {}))
+
+
+def save_state(path, project_name, project_id, configs):
+    path = Path(path)
+    try:
+        data = json.loads(path.read_text()) if path.exists() else {}
+    except (OSError, ValueError):
+        data = {}
+    data[project_name] = {"project_id": project_id, "configs": configs}
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2, sort_keys=True))
+    tmp.replace(path)
+
+
+# ---- diff --------------------------------------------------------------------
+
+def plan_changes(spec, nodes, links, template_ids, applied, prune=True):
+    """
+    Compute the changes needed to make the project match `spec`.
+
+    nodes/links: current project state as returned by the GNS3 API
+    template_ids: {template name: template_id}
+    applied: {node name: config digest} from load_state()
+    prune: delete nodes and links that are not in the spec
+
+    Returns a dict of lists:
+        delete_links  - link_ids to remove (unknown, or blocking a rebuilt node)
+        delete_nodes  - node_ids to remove (unknown, or wrong template)
+        create_nodes  - node specs ({"name", "template", "x", "y"}) to create
+        create_links  - spec links to create
+        configure     - node names whose config must be pushed
+        keep          - {name: node} existing nodes left in place
+    """
+    by_name = {n["name"]: n for n in nodes}
+    name_of = {n["node_id"]: n["name"] for n in nodes}
+
+    plan = {"delete_links": [], "delete_nodes": [], "create_nodes": [],
+            "create_links": [], "configure": [], "keep": {}}
+
+    for name, want in spec["nodes"].items():
+        have = by_name.get(name)
+        if have is not None and have.get("template_id") in (None, template_ids.get(want["template"])):
+            plan["keep"][name] = have
+            continue
+        if have is not None:
+            plan["delete_nodes"].append(have["node_id"])
+        plan["create_nodes"].append({"name": name, "template": want["template"],
+                                     "x": want.get("x", 0), "y": want.get("y", 0)})
+    if prune:
+        plan["delete_nodes"] += [n["node_id"] for n in nodes if n["name"] not in spec["nodes"]]
+    gone = set(plan["delete_nodes"])
+
+    wanted = spec_link_keys(spec)
+    present = set()
+    for link in links:
+        ends = link.get("nodes", [])
+        if any(e["node_id"] in gone for e in ends):
+            continue   # removed together with its node
+        if len(ends) != 2 or any(e["node_id"] not in name_of for e in ends):
+            if prune:
+                plan["delete_links"].append(link["link_id"])
+            continue
+        key = link_key(*[(name_of[e["node_id"]], e["adapter_number"], e["port_number"]) for e in ends])
+        if key in wanted and key not in present:
+            present.add(key)
+        elif prune:
+            plan["delete_links"].append(link["link_id"])
+    plan["create_links"] = [l for key, l in wanted.items() if key not in present]
+
+    created = {n["name"] for n in plan["create_nodes"]}
+    for name, want in spec["nodes"].items():
+        if name in created or applied.get(name) != config_digest(want.get("config", [])):
+            plan["configure"].append(name)
+    return plan
+
+
+def plan_is_empty(plan):
+    return not any(plan[k] for k in ("delete_links", "delete_nodes", "create_nodes",
+                                     "create_links", "configure"))
+
+
+def describe_plan(plan):
+    """One-line summary of a plan for progress output."""
+    if plan_is_empty(plan):
+        return "no changes, lab matches spec"
+    return (f"{len(plan['create_nodes'])} nodes to create, {len(plan['delete_nodes'])} to delete, "
+            f"{len(plan['create_links'])} links to create, {len(plan['delete_links'])} to delete, "
+            f"{len(plan['configure'])} devices to configure")
+
+
+# ---- apply -------------------------------------------------------------------
+
+def apply_plan(client, project_id, plan):
+    """
+    Apply the topology part of a plan: deletions first (links, then nodes),
+    then node and link creation, each batch in parallel.
+    Returns {name: node} for every node in the project afterwards.
+    """
+    client.map(lambda lid: client.delete(f"/projects/{project_id}/links/{lid}"), plan["delete_links"])
+    client.map(lambda nid: client.delete(f"/projects/{project_id}/nodes/{nid}"), plan["delete_nodes"])
+    nodes = dict(plan["keep"])
+    nodes.update(client.create_nodes(project_id, plan["create_nodes"]))
+    client.create_links(project_id, [
+        (nodes[l["a"][0]]["node_id"], l["a"][1], l["a"][2], nodes[l["b"][0]]["node_id"], l["b"][1], l["b"][2])
+        for l in plan["create_links"]
+    ])
+    return nodes
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+lab_trace.py
+
+Run instrumentation for the lab automation: timed spans and counters.
+
+Spans cover each phase of a run (project, reconcile, provision, verify),
+each node's pipeline (start request, boot, console probe, waiting for a
+slot, config push, pings) and each REST call. A span is either "work"
+(we are doing something) or "wait" (we are waiting for a device or a
+slot), so the summary can show where time really goes. Counters track
+HTTP calls and retries, telnet bytes in/out and console reconnects.
+
+All modules record into the shared TRACE instance; it is cheap enough to
+stay on. export() writes Chrome trace-event JSON (open it in
+chrome://tracing or https://ui.perfetto.dev), and summary() renders the
+table printed at the end of a run.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class Tracer:
+    """Thread-safe collector of spans and counters (wall-clock seconds)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.t0 = time.time()
+            self.spans = []
+            self.counters = defaultdict(int)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def add_span(self, name, start, end=None, cat="phase", lane=None, kind="work", **args):
+        """
+        Record a finished span; returns its duration in seconds.
+
+        lane: row in the trace viewer (node name, or thread name by default)
+        kind: "work" or "wait"
+        """
+        end = time.time() if end is None else end
+        span = {"name": name, "cat": cat, "start": start, "end": end, "kind": kind,
+                "lane": lane or threading.current_thread().name, "args": args}
+        with self.lock:
+            self.spans.append(span)
+        return end - start
+
+    @contextmanager
+    def span(self, name, cat="phase", lane=None, kind="work", **args):
+        start = time.time()
+        try:
+            yield args
+        finally:
+            self.add_span(name, start, cat=cat, lane=lane, kind=kind, **args)
+
+    # ---- output ------------------------------------------------------------
+
+    def chrome_trace(self):
+        """Trace-event JSON object: one complete ("X") event per span, one row per lane."""
+        with self.lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        lanes = {}
+        events = []
+        for s in sorted(spans, key=lambda s: s["start"]):
+            tid = lanes.setdefault(s["lane"], len(lanes) + 1)
+            events.append({"name": s["name"], "cat": f"{s['cat']},{s['kind']}", "ph": "X", "pid": 1, "tid": tid,
+                           "ts": round((s["start"] - self.t0) * 1e6), "dur": round((s["end"] - s["start"]) * 1e6),
+                           "args": s["args"]})
+        events += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": lane}}
+                   for lane, tid in lanes.items()]
+        events.append({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "vlan_lab_automation"}})
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"counters": counters, "summary": self.totals()}}
+
+    def export(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.chrome_trace()))
+        return path
+
+    def totals(self):
+        """{"cat/name": {"count", "total", "max", "kind"}} aggregated over all spans."""
+        with self.lock:
+            spans = list(self.spans)
+        agg = {}
+        for s in spans:
+            key = f"{s['cat']}/{s['name']}"
+            a = agg.setdefault(key, {"count": 0, "total": 0.0, "max": 0.0, "kind": s["kind"]})
+            dur = s["end"] - s["start"]
+            a["count"] += 1
+            a["total"] += dur
+            a["max"] = max(a["max"], dur)
+        return agg
+
+    def summary(self):
+        """Table of phases, per-node wait vs work, REST calls and counters."""
+        agg = self.totals()
+        width = max([28] + [len(k) for k in agg])
+        lines = [f"{'span':<{width}} {'kind':<5} {'count':>6} {'total':>9} {'max':>9}"]
+        phases = [(k, a) for k, a in agg.items() if k.startswith("phase/")]
+        others = sorted(((k, a) for k, a in agg.items() if not k.startswith("phase/")),
+                        key=lambda kv: -kv[1]["total"])
+        for key, a in phases + others:
+            lines.append(f"{key:<{width}} {a['kind']:<5} {a['count']:>6} {a['total']:>8.2f}s {a['max']:>8.2f}s")
+        nodes = [a for k, a in others if k.startswith("node/")]
+        wait = sum(a["total"] for a in nodes if a["kind"] == "wait")
+        work = sum(a["total"] for a in nodes if a["kind"] == "work")
+        if wait + work:
+            lines.append(f"per-node time: {work:.1f}s working, {wait:.1f}s waiting "
+                         f"({100 * wait / (wait + work):.0f}% waiting)")
+        with self.lock:
+            counters = sorted(self.counters.items())
+        if counters:
+            lines.append("counters: " + ", ".join(f"{k}={v}" for k, v in counters))
+        return "\n".join(lines)
+
+
+# Shared by every module of a run
+TRACE = Tracer()
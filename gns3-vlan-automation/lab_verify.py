@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+lab_verify.py
+
+Parallel connectivity verification for the VLAN lab.
+
+Builds a ping matrix from the lab plan (full N x N mesh, sampled per VLAN
+pair, or host -> own gateway), runs it from every VPCS host at once (each
+host works through its own list on one console session), parses the VPCS
+ping output into loss and RTT figures and writes JSON/CSV reports plus a
+terminal summary.
+
+Pairs are spread so that each source host gets as few pings as possible;
+with sampled or gateway checks a whole lab verifies in about one ping round.
+"""
+
+import asyncio
+import csv
+import json
+import random
+import re
+import time
+from pathlib import Path
+
+from lab_console import ExpectTimeout, TelnetConsole, vpcs_wake
+from lab_trace import TRACE
+
+# VPCS ping output
+_REPLY = re.compile(r"bytes from \S+ icmp_seq=(\d+) ttl=\d+ time=([\d.]+) ms")
+_LOST = re.compile(r"icmp_seq=\d+ timeout|not reachable|Destination host unreachable", re.IGNORECASE)
+
+PING_COUNT = 3        # echo requests per pair
+PING_WAIT_MS = 1000   # per-reply wait passed to VPCS (-w)
+
+
+def build_pairs(lab, mode="vlan", samples=1, seed=0):
+    """
+    Choose (source host, destination name, destination ip) pairs.
+
+    mode "full": every host to every other host
+         "vlan": `samples` pairs for every ordered VLAN pair (including
+                 within a VLAN), rotating through hosts so the load is spread
+         "gateway": every host to its own gateway
+    """
+    hosts = lab["hosts"]
+    if mode == "gateway":
+        return [(name, f"gw-VLAN{h['vlan']}", h["gateway"]) for name, h in hosts.items()]
+    if mode == "full":
+        return [(src, dst, hosts[dst]["ip"]) for src in hosts for dst in hosts if src != dst]
+    if mode != "vlan":
+        raise ValueError(f"unknown verify mode {mode!r}")
+    rng = random.Random(seed)
+    members = {}
+    for v in lab["vlans"]:
+        order = list(v["hosts"])
+        rng.shuffle(order)
+        members[v["id"]] = order
+    cursor = {vid: 0 for vid in members}
+    pairs = []
+
+    def take(vid):
+        order = members[vid]
+        name = order[cursor[vid] % len(order)]
+        cursor[vid] += 1
+        return name
+
+    for a in members:
+        for b in members:
+            if not members[a] or not members[b]:
+                continue
+            for _ in range(samples):
+                src, dst = take(a), take(b)
+                if src == dst:
+                    if len(members[b]) < 2:
+                        continue
+                    dst = take(b)
+                pairs.append((src, dst, hosts[dst]["ip"]))
+    return pairs
+
+
+def parse_ping(output, count=PING_COUNT):
+    """Turn VPCS ping output into {"sent", "received", "loss", "rtt_min", "rtt_avg", "rtt_max"}."""
+    rtts = [float(m.group(2)) for m in _REPLY.finditer(output)]
+    sent = max(count, len(rtts) + len(_LOST.findall(output)))
+    received = len(rtts)
+    return {
+        "sent": sent,
+        "received": received,
+        "loss": round(1 - received / sent, 3) if sent else 1.0,
+        "rtt_min": min(rtts) if rtts else None,
+        "rtt_avg": round(sum(rtts) / len(rtts), 3) if rtts else None,
+        "rtt_max": max(rtts) if rtts else None,
+    }
+
+
+async def _ping_from(src, targets, node, sem, count, wait_ms, sessions):
+    """Run all of one host's pings over a single console session."""
+    timeout = count * (wait_ms / 1000 + 1) + 5
+    lines = [f"ping {ip} -c {count} -w {wait_ms}" for _, ip in targets]
+    queued = time.time()
+    async with sem:
+        TRACE.add_span("wait for ping slot", queued, cat="node", lane=src, kind="wait")
+        try:
+            with TRACE.span("ping", cat="node", lane=src, pairs=len(lines)):
+                if sessions is not None:
+                    outputs = await sessions.commands(src, lines, timeout)
+                else:
+                    host = node.get("console_host") or "127.0.0.1"
+                    async with TelnetConsole(host, node["console"]) as console:
+                        await vpcs_wake(console)
+                        outputs = [await console.command(line, "vpcs", timeout) for line in lines]
+        except (OSError, EOFError, ExpectTimeout, asyncio.TimeoutError) as e:
+            return [{"src": src, "dst": dst, "dst_ip": ip, "sent": 0, "received": 0, "loss": 1.0,
+                     "rtt_min": None, "rtt_avg": None, "rtt_max": None, "error": str(e) or type(e).__name__}
+                    for dst, ip in targets]
+    return [{"src": src, "dst": dst, "dst_ip": ip, **parse_ping(res["output"], count), "error": res["error"]}
+            for (dst, ip), res in zip(targets, outputs)]
+
+
+async def verify(pairs, nodes, concurrency=64, count=PING_COUNT, wait_ms=PING_WAIT_MS, sessions=None):
+    """
+    Run the ping matrix from all source hosts concurrently.
+
+    nodes: {name: node dict with console/console_host}
+    sessions: optional lab_console.ConsoleSessions to reuse open consoles
+    Returns one result row per pair.
+    """
+    by_src = {}
+    for src, dst, ip in pairs:
+        by_src.setdefault(src, []).append((dst, ip))
+    sem = asyncio.Semaphore(max(1, concurrency))
+    batches = await asyncio.gather(*(_ping_from(src, targets, nodes[src], sem, count, wait_ms, sessions)
+                                     for src, targets in by_src.items()))
+    return [row for batch in batches for row in batch]
+
+
+def run_verify(pairs, nodes, concurrency=64, count=PING_COUNT, wait_ms=PING_WAIT_MS, sessions=None):
+    """Blocking wrapper around verify() for the sync main() flow (on the session pool's loop if given)."""
+    coro = verify(pairs, nodes, concurrency, count, wait_ms, sessions)
+    return sessions.run(coro) if sessions is not None else asyncio.run(coro)
+
+
+# ---- reporting ---------------------------------------------------------------
+
+FIELDS = ["src", "dst", "dst_ip", "src_vlan", "dst_vlan", "sent", "received", "loss",
+          "rtt_min", "rtt_avg", "rtt_max", "error"]
+
+
+def annotate(rows, lab):
+    """Add source/destination VLAN ids to result rows (gateway targets use the source VLAN)."""
+    for r in rows:
+        r["src_vlan"] = lab["hosts"][r["src"]]["vlan"]
+        dst = lab["hosts"].get(r["dst"])
+        r["dst_vlan"] = dst["vlan"] if dst else r["src_vlan"]
+    return rows
+
+
+def write_reports(rows, out_dir, stem=None):
+    """Write rows as <stem>.json and <stem>.csv under out_dir; returns both paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = stem or time.strftime("connectivity-%Y%m%d-%H%M%S")
+    json_path = out_dir / f"{stem}.json"
+    csv_path = out_dir / f"{stem}.csv"
+    json_path.write_text(json.dumps(rows, indent=2))
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    return json_path, csv_path
+
+
+def summarize(rows, max_failures=10):
+    """Terminal summary: totals, a VLAN x VLAN pass matrix and the first failures."""
+    ok = [r for r in rows if r["received"] > 0]
+    lines = [f"{len(ok)}/{len(rows)} pairs reachable"]
+    rtts = [r["rtt_avg"] for r in ok if r["rtt_avg"] is not None]
+    if rtts:
+        lines[0] += f", avg RTT {sum(rtts) / len(rtts):.1f} ms, worst {max(rtts):.1f} ms"
+
+    vlans = sorted({r["src_vlan"] for r in rows} | {r["dst_vlan"] for r in rows})
+    if 1 < len(vlans) <= 16:
+        cell = {}
+        for r in rows:
+            passed, total = cell.get((r["src_vlan"], r["dst_vlan"]), (0, 0))
+            cell[(r["src_vlan"], r["dst_vlan"])] = (passed + (r["received"] > 0), total + 1)
+        lines.append("src\\dst " + " ".join(f"{v:>7}" for v in vlans))
+        for a in vlans:
+            row = []
+            for b in vlans:
+                passed, total = cell.get((a, b), (0, 0))
+                row.append(f"{passed}/{total}".rjust(7) if total else "      -")
+            lines.append(f"{a:<7} " + " ".join(row))
+
+    failed = [r for r in rows if r["received"] == 0]
+    for r in failed[:max_failures]:
+        reason = r["error"] or f"{r['sent']} sent, 0 received"
+        lines.append(f"  FAIL {r['src']} -> {r['dst']} ({r['dst_ip']}): {reason}")
+    if len(failed) > max_failures:
+        lines.append(f"  ... {len(failed) - max_failures} more failures")
+    return "\n".join(lines)
@@ -2,25 +2,41 @@
 """
 vlan_lab_automation.py
 
-Creates the VLAN lab in GNS3 and configures R1, SW1, and 6 VPCS hosts.
+Creates the VLAN lab in GNS3 and configures R1, SW1, and 6 VPCS hosts
+(or any number of VLANs/hosts/access switches, see --vlans/--hosts-per-vlan).
 
 Adjust the TEMPLATE names and GNS3 server URL at the top as necessary.
 
-Tested approach: uses gns3fy to create nodes/links and uses telnetlib to push CLI to device consoles.
+The lab is described declaratively (build_lab_spec) and reconciled against
+the project, so re-runs only create, delete or reconfigure what drifted.
+
+Tested approach: creates nodes/links in parallel through a pooled REST client
+(see gns3_client.py) and pushes CLI to all device consoles concurrently over
+asyncio telnet streams (see lab_console.py). One console session per node
+is kept open for the whole run, so readiness probing, configuration and
+verification share a single login per device.
 """
 
+import argparse
+import os
 import time
-import json
-import socket
-import telnetlib
-import requests
-from gns3fy import Gns3Connector, Project, Node, Link
+from pathlib import Path
+
+from gns3_client import Gns3Client, Gns3Error
+from lab_console import ConsoleSessions, run_provisioning
+from lab_generator import describe_lab, generate_lab, lab_spec
+from lab_readiness import NodeReadiness
+from lab_topology import (apply_plan, config_digest, describe_plan, golden_name, load_state, plan_changes,
+                          plan_is_empty, save_state)
+from lab_trace import TRACE
+from lab_verify import annotate, build_pairs, run_verify, summarize, write_reports
 
 # ---------------------------
 # === USER CONFIGURATION ====
 # ---------------------------
-GNS3_SERVER = "http://172.16.132.128"   # your GNS3 server
+GNS3_SERVER = os.environ.get("GNS3_SERVER", "http://172.16.132.128")   # your GNS3 server (or lab_simulator.py)
 PROJECT_NAME = "VLAN_Lab_Automation"
+GNS3_WORKERS = 8                        # parallel REST calls (and pooled keep-alive connections)
 
 ROUTER_TEMPLATE = "Cisco 2911"   # change to match your template name
 SWITCH_TEMPLATE = "IOSv-L2"      # change to match your template name
@@ -28,363 +44,262 @@ PC_TEMPLATE = "VPCS"             # usually "VPCS"
 
 # Node naming
 ROUTER_NAME = "R1"
-SWITCH_NAME = "SW1"
-PC_NAMES = [f"PC{i}" for i in range(1, 7)]
-
-# Subnet definitions (/26)
-VLAN_INFO = {
-    10: {"name": "Engineering", "network": "10.0.0.0",   "pc_ips": ["10.0.0.1", "10.0.0.2"]},
-    20: {"name": "HR",          "network": "10.0.0.64",  "pc_ips": ["10.0.0.65", "10.0.0.66"]},
-    30: {"name": "Sales",       "network": "10.0.0.128", "pc_ips": ["10.0.0.129", "10.0.0.130"]},
-}
-
-SUBNET_MASK = "255.255.255.192"  # /26
-CIDR_SUFFIX = "/26"
-
-# Port mapping assumptions (these map adapter indices on nodes)
-# We'll keep a straightforward mapping:
-# R1 adapters: 0,1,2 connect to SW1 adapters: 0,1,2 (these are GigabitEthernet0/0..0/2 on router)
-# SW1 adapters 3..8 will connect to PCs
-R1_SW_PORTS = [(0, 0), (1, 1), (2, 2)]  # (router_adapter, switch_adapter)
-SW_PC_PORTS = [
-    (3, PC_NAMES[0]),  # SW adapter 3 -> PC1
-    (4, PC_NAMES[1]),  # SW adapter 4 -> PC2
-    (5, PC_NAMES[2]),  # SW adapter 5 -> PC3
-    (6, PC_NAMES[3]),  # SW adapter 6 -> PC4
-    (7, PC_NAMES[4]),  # SW adapter 7 -> PC5
-    (8, PC_NAMES[5]),  # SW adapter 8 -> PC6
-]
-
-# Router interface names that correspond to adapter indices (assumption)
-ROUTER_IFACES = ["GigabitEthernet0/0", "GigabitEthernet0/1", "GigabitEthernet0/2"]
+
+# Lab size: VLAN count, hosts per VLAN and the prefix VLAN subnets are carved from.
+# The defaults reproduce the classic lab: VLANs 10/20/30 on 10.0.0.0/26, .64/26, .128/26,
+# gateway on the last usable address, PC1..PC6 on SW1.
+VLAN_COUNT = 3
+HOSTS_PER_VLAN = 2
+BASE_PREFIX = "10.0.0.0/24"
+SUBNET_PREFIXLEN = 26            # None = smallest subnet that fits HOSTS_PER_VLAN
+VLAN_NAMES = ["Engineering", "HR", "Sales"]   # further VLANs are named VLAN<id>
+FIRST_VLAN = 10                  # VLAN ids: FIRST_VLAN, +VLAN_STEP, ... up to 4094, skipping 1002-1005
+VLAN_STEP = 10
+
+# Adapter budgets: more VLANs than router adapters -> one dot1q trunk with subinterfaces;
+# more hosts than fit on SW1 -> extra access switches trunked in a tree (SW2, SW3, ...)
+ROUTER_ADAPTERS = 3              # Cisco 2911: GigabitEthernet0/0..0/2
+SWITCH_ADAPTERS = 16             # IOSv-L2: Gi0/0..Gi3/3
+SWITCH_DOWNLINKS = 2             # adapters each switch keeps for downstream switches
+
+# Console provisioning: how many device consoles are configured at the same time,
+# and how long to wait for each console to accept connections
+CONSOLE_CONCURRENCY = 8
+CONSOLE_TIMEOUT = 30
+BOOT_TIMEOUT = 300     # max seconds from start request to a console prompt
+CONFIG_WINDOW = 16     # IOS config lines streamed ahead of their prompts (0 = one line at a time)
+
+# Connectivity verification: hosts pinging at the same time, and where reports go
+VERIFY_CONCURRENCY = 64
+REPORT_DIR = Path(__file__).parent / "results"
+
+# After a successful build, snapshot the project as a "golden" copy keyed by a hash of the
+# spec; later runs with the same spec restore it instead of rebuilding and reconfiguring
+GOLDEN_SNAPSHOTS = True
+
+# Pause after configuration before pinging, for interfaces and STP to settle
+SETTLE_SECONDS = 5
+
+# Record of the config last pushed to each node, so re-runs only touch what changed
+STATE_FILE = Path(__file__).parent / "lab_state.json"
 
 # ---------------------------
 # === Helper functions ======
 # ---------------------------
-def last_usable_address(network_str):
-    # network_str like "10.0.0.0" with /26 mask
-    parts = list(map(int, network_str.split('.')))
-    base = (parts[0]<<24) | (parts[1]<<16) | (parts[2]<<8) | parts[3]
-    # /26 block size = 64, broadcast = base + 63
-    broadcast = base + 63
-    last_usable = broadcast - 1
-    return "{}.{}.{}.{}".format((last_usable>>24)&0xFF, (last_usable>>16)&0xFF, (last_usable>>8)&0xFF, last_usable&0xFF)
-
-def wait_for_telnet(host, port, timeout=30):
-    start = time.time()
-    while time.time() - start < timeout:
-        try:
-            s = socket.create_connection((host, port), timeout=2)
-            s.close()
-            return True
-        except Exception:
-            time.sleep(0.5)
-    return False
-
-def send_ios_commands_via_telnet(host, port, commands, wait_after=0.5, username=None, password=None, enable_password=None):
+def build_lab(vlans=VLAN_COUNT, hosts_per_vlan=HOSTS_PER_VLAN, base_prefix=BASE_PREFIX,
+              prefixlen=SUBNET_PREFIXLEN, first_vlan=FIRST_VLAN, vlan_step=VLAN_STEP):
+    """Address and port plan for the lab (see lab_generator.generate_lab)."""
+    return generate_lab(vlans, hosts_per_vlan, base_prefix, prefixlen=prefixlen,
+                        first_vlan=first_vlan, vlan_step=vlan_step, vlan_names=VLAN_NAMES,
+                        router_adapters=ROUTER_ADAPTERS, switch_adapters=SWITCH_ADAPTERS,
+                        downlinks=SWITCH_DOWNLINKS, router_name=ROUTER_NAME)
+
+def build_lab_spec(lab):
+    """Declarative description of the whole lab (see lab_topology.py)."""
+    return lab_spec(lab, PROJECT_NAME, ROUTER_TEMPLATE, SWITCH_TEMPLATE, PC_TEMPLATE)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build, configure and test the VLAN lab in GNS3.")
+    parser.add_argument("--vlans", type=int, default=VLAN_COUNT, help="number of VLANs")
+    parser.add_argument("--hosts-per-vlan", type=int, default=HOSTS_PER_VLAN, help="VPCS hosts in each VLAN")
+    parser.add_argument("--base-prefix", default=BASE_PREFIX, help="prefix the VLAN subnets are allocated from")
+    parser.add_argument("--prefixlen", type=int, default=SUBNET_PREFIXLEN,
+                        help="per-VLAN subnet length (default: %(default)s; 0 = smallest that fits)")
+    parser.add_argument("--first-vlan", type=int, default=FIRST_VLAN, help="id of the first VLAN")
+    parser.add_argument("--vlan-step", type=int, default=VLAN_STEP,
+                        help="distance between VLAN ids (ids must stay within 1-4094; 1002-1005 are skipped)")
+    parser.add_argument("--verify", choices=["vlan", "full", "gateway", "none"], default="vlan",
+                        help="ping matrix: sampled per VLAN pair (default), full N x N mesh, "
+                             "each host to its gateway, or skip")
+    parser.add_argument("--samples", type=int, default=1, help="pings per VLAN pair in --verify vlan mode")
+    parser.add_argument("--config-window", type=int, default=CONFIG_WINDOW,
+                        help="IOS config lines in flight during the bulk push (0 = one prompt at a time)")
+    parser.add_argument("--no-golden", action="store_true",
+                        help="neither restore nor save the golden snapshot of this lab")
+    parser.add_argument("--plan-only", action="store_true", help="print the address plan and exit")
+    parser.add_argument("--trace", type=Path, help="Chrome trace file for this run (default: results/trace-<time>.json)")
+    return parser.parse_args()
+
+# ---------------------------
+# === Main automation flow ==
+# ---------------------------
+def run_lab(lab, spec, server=GNS3_SERVER, verify="vlan", samples=1, settle=SETTLE_SECONDS,
+            state_file=STATE_FILE, report_dir=REPORT_DIR, window=CONFIG_WINDOW, golden=GOLDEN_SNAPSHOTS):
     """
-    Connect to an IOS console via telnet and send commands.
-    This is a *best-effort* simple implementation; it does not
-    fully implement an expect library.
+    Reconcile, boot, configure and verify one lab against a GNS3 server.
+
+    With golden=True a project that drifted from the spec is restored from
+    its golden snapshot when one exists, and a clean build is saved as one.
+
+    Returns {"phases": {phase: seconds}, "configured": [names], "failed": {name: reason},
+    "rows": ping results, "restored": snapshot name or None}; lab_benchmark.py drives
+    this against lab_simulator.py.
     """
-    tn = telnetlib.Telnet(host, port, timeout=10)
-    time.sleep(0.5)
-    # Read existing buffer
+    project_name = spec["project"]
+    golden = golden_name(spec) if golden else None
+    phases = {}
+    outcome = {"phases": phases, "configured": [], "failed": {}, "rows": [], "restored": None}
+
+    print("Connecting to GNS3 server:", server)
+    client = Gns3Client(server, max_workers=GNS3_WORKERS)
     try:
-        tn.read_very_eager()
-    except Exception:
-        pass
-
-    def _w(cmd, pause=0.2):
-        tn.write(cmd.encode('ascii') + b"\n")
-        time.sleep(pause)
-
-    # Enter enable and config
-    _w("")  # send newline to get prompt
-    if username:
-        _w(username); time.sleep(0.2)
-    if password:
-        _w(password); time.sleep(0.2)
-    _w("enable")
-    if enable_password:
-        _w(enable_password)
-    _w("terminal length 0")
-    for c in commands:
-        _w(c, pause=0.3)
-    time.sleep(wait_after)
-    output = tn.read_very_eager().decode('ascii', errors='ignore')
-    tn.close()
-    return output
-
-def send_vpcs_commands(host, port, cmds, wait_after=0.2):
+        t0 = time.time()
+        # create project, or reuse an existing one with the same name
+        proj, created = client.get_or_create_project(project_name)
+        project_id = proj["project_id"]
+        print("Created project:" if created else "Using existing project:", project_name)
+        phases["project"] = TRACE.add_span("project", t0)
+
+        # Diff the desired lab against one snapshot of the project and apply only the changes
+        t0 = time.time()
+        template_ids = {n["template"]: client.template_id(n["template"]) for n in spec["nodes"].values()}
+        applied = load_state(state_file, project_name, project_id)
+        plan = plan_changes(spec, client.nodes(project_id), client.links(project_id), template_ids, applied)
+        snapshot = client.find_snapshot(project_id, golden) if golden and not plan_is_empty(plan) else None
+        if snapshot is not None:
+            # A finished copy of exactly this spec exists: roll back to it instead of rebuilding
+            tr = time.time()
+            print(f"Restoring golden snapshot {golden} ({describe_plan(plan)} otherwise)")
+            client.restore_snapshot(project_id, snapshot["snapshot_id"])
+            applied = {name: config_digest(n.get("config", [])) for name, n in spec["nodes"].items()}
+            save_state(state_file, project_name, project_id, applied)
+            plan = plan_changes(spec, client.nodes(project_id), client.links(project_id), template_ids, applied)
+            outcome["restored"] = golden
+            phases["restore"] = TRACE.add_span("restore", tr)
+        print("Reconcile plan:", describe_plan(plan))
+        node_info = apply_plan(client, project_id, plan)
+        print(f"Topology reconciled in {time.time() - t0:.1f}s.")
+        phases["reconcile"] = TRACE.add_span("reconcile", t0)
+
+        # Nodes whose config is already applied only need to be running
+        idle = [name for name, n in node_info.items() if name not in plan["configure"] and n.get("status") != "started"]
+
+        # Push configs concurrently (one asyncio task per console) to nodes that need it
+        jobs = []
+        for name in plan["configure"]:
+            want = spec["nodes"][name]
+            info = node_info[name]
+            print(f"Queueing {name} ({len(want['config'])} config lines)")
+            jobs.append({"name": name, "kind": want["kind"], "commands": want["config"], "window": window,
+                         "host": info.get("console_host", "127.0.0.1"), "port": info.get("console")})
+
+        # One console session per node, opened by the readiness probe (or on first use)
+        # and reused by configuration and verification
+        sessions = ConsoleSessions({name: (info.get("console_host") or "127.0.0.1", info.get("console"),
+                                           spec["nodes"][name]["kind"])
+                                    for name, info in node_info.items() if name in spec["nodes"]},
+                                   open_timeout=CONSOLE_TIMEOUT)
+        try:
+            boot = plan["configure"] + idle
+            if boot:
+                # Start every node in parallel; each job is pushed as soon as its own console shows a prompt,
+                # and nodes that only need starting are waited for before verification
+                kinds = {name: spec["nodes"][name]["kind"] for name in boot}
+                readiness = NodeReadiness(client, project_id, {name: node_info[name] for name in boot},
+                                          kinds, boot_timeout=BOOT_TIMEOUT, sessions=sessions)
+                print(f"Starting {len(boot)} nodes and pushing configuration to {len(jobs)} as consoles come up "
+                      f"(concurrency={CONSOLE_CONCURRENCY})...")
+                t0 = time.time()
+                results = run_provisioning(jobs, concurrency=CONSOLE_CONCURRENCY, console_timeout=CONSOLE_TIMEOUT,
+                                           readiness=readiness, sessions=sessions)
+                for name, reason in readiness.errors.items():
+                    print(f"Warning: {name} not ready ({reason})")
+                for name, secs in sorted(readiness.ready_at.items(), key=lambda kv: kv[1]):
+                    print(f"  {name} ready after {secs:.1f}s")
+                for name, res in results.items():
+                    if res["ok"]:
+                        excerpt = 1000 if spec["nodes"][name]["kind"] == "ios" else 200
+                        print(f"{name} configured in {res['seconds']:.1f}s, output excerpt:\n", res["output"][:excerpt])
+                        applied[name] = config_digest(spec["nodes"][name]["config"])
+                        outcome["configured"].append(name)
+                    else:
+                        print(f"Warning: {name} not configured ({res['error']})")
+                        outcome["failed"][name] = res["error"]
+                print(f"Console provisioning finished in {time.time() - t0:.1f}s")
+                phases["provision"] = TRACE.add_span("provision", t0)
+                if jobs:
+                    save_state(state_file, project_name, project_id,
+                               {name: digest for name, digest in applied.items() if name in spec["nodes"]})
+
+                # Allow some time for network convergence
+                if settle:
+                    print("Waiting a few seconds for interfaces to settle...")
+                    time.sleep(settle)
+
+            # Ping matrix from all VPCS hosts at once (see lab_verify.py)
+            if verify != "none":
+                pairs = build_pairs(lab, verify, samples=samples)
+                print(f"Running {len(pairs)} connectivity checks ({verify}) from {len({p[0] for p in pairs})} hosts...")
+                t0 = time.time()
+                rows = annotate(run_verify(pairs, node_info, concurrency=VERIFY_CONCURRENCY,
+                                           sessions=sessions), lab)
+                print(f"Connectivity checks finished in {time.time() - t0:.1f}s")
+                phases["verify"] = TRACE.add_span("verify", t0)
+                print(summarize(rows))
+                json_path, csv_path = write_reports(rows, report_dir)
+                print("Connectivity report:", json_path, csv_path)
+                outcome["rows"] = rows
+
+            reconnects = {name: n - 1 for name, n in sessions.stats().items() if n > 1}
+            if reconnects:
+                print("Console sessions reopened:", ", ".join(f"{k} x{v}" for k, v in reconnects.items()))
+        finally:
+            sessions.close()
+
+        verified = all(r["received"] > 0 for r in outcome["rows"])
+        if golden and jobs and not outcome["failed"] and verified:
+            t0 = time.time()
+            save_golden(client, project_id, golden, {name: n["kind"] for name, n in spec["nodes"].items()})
+            phases["snapshot"] = TRACE.add_span("snapshot", t0)
+    finally:
+        client.close()
+    return outcome
+
+def save_golden(client, project_id, name, kinds):
     """
-    VPCS console is telnet-like; it accepts commands quickly.
-    We'll connect and send the VPCS lines.
+    Snapshot a freshly built lab as its golden copy. GNS3 only snapshots
+    stopped projects, so nodes are stopped for the snapshot, then started
+    again and waited for, leaving the lab running as it was.
     """
-    tn = telnetlib.Telnet(host, port, timeout=10)
-    time.sleep(0.5)
-    for c in cmds:
-        tn.write(c.encode('ascii') + b"\n")
-        time.sleep(0.15)
-    # Optionally read
+    t0 = time.time()
     try:
-        out = tn.read_very_eager().decode('ascii', errors='ignore')
-    except Exception:
-        out = ""
-    tn.close()
-    return out
+        if client.find_snapshot(project_id, name) is not None:
+            return
+        running = {n["name"]: n for n in client.nodes(project_id) if n.get("status") == "started"}
+        print(f"Saving golden snapshot {name} ({len(running)} nodes restart)...")
+        client.map(lambda n: client.stop_node(project_id, n["node_id"]), running.values())
+        try:
+            client.create_snapshot(project_id, name)
+        finally:
+            readiness = NodeReadiness(client, project_id, running, kinds, boot_timeout=BOOT_TIMEOUT)
+            run_provisioning([], readiness=readiness)
+        print(f"Golden snapshot saved in {time.time() - t0:.1f}s")
+    except Gns3Error as e:
+        print("Warning: golden snapshot not saved:", e)
 
-# ---------------------------
-# === Main automation flow ==
-# ---------------------------
 def main():
-    print("Connecting to GNS3 server:", GNS3_SERVER)
-    connector = Gns3Connector(url=GNS3_SERVER)
-    # create project
-    proj = Project(name=PROJECT_NAME, connector=connector)
+    args = parse_args()
+    t0 = time.time()
     try:
-        proj.create()
-        print("Created project:", PROJECT_NAME)
-    except Exception:
-        # project may already exist; try to get it
-        projects = connector.get("projects").json()
-        found = None
-        for p in projects:
-            if p["name"] == PROJECT_NAME:
-                found = p
-                break
-        if not found:
-            raise RuntimeError("Could not create or find project on server.")
-        proj.project_id = found["project_id"]
-        proj.get()
-        print("Using existing project:", PROJECT_NAME)
-
-    # Create router node
-    router = Node(name=ROUTER_NAME, project_id=proj.project_id, connector=connector, template=ROUTER_TEMPLATE)
-    router.create()
-    print("Created router:", ROUTER_NAME)
-
-    # Create switch node
-    switch = Node(name=SWITCH_NAME, project_id=proj.project_id, connector=connector, template=SWITCH_TEMPLATE)
-    switch.create()
-    print("Created switch:", SWITCH_NAME)
-
-    # Create PC nodes (VPCS)
-    pc_nodes = {}
-    for pc_name in PC_NAMES:
-        node = Node(name=pc_name, project_id=proj.project_id, connector=connector, template=PC_TEMPLATE)
-        node.create()
-        pc_nodes[pc_name] = node
-        print("Created PC:", pc_name)
-
-    # Refresh nodes to get IDs and adapter info
-    proj.get()
-    nodes = proj.nodes
-    id_map = {n["name"]: n["node_id"] for n in nodes}
-
-    # Build link objects and create links via API
-    # We'll call create link endpoints directly via requests for exact adapter indices
-    def create_link(node_a_id, adapter_a, port_a, node_b_id, adapter_b, port_b):
-        payload = {
-            "nodes": [
-                {"node_id": node_a_id, "adapter_number": adapter_a, "port_number": port_a},
-                {"node_id": node_b_id, "adapter_number": adapter_b, "port_number": port_b}
-            ]
-        }
-        url = f"{GNS3_SERVER}/v2/projects/{proj.project_id}/links"
-        r = requests.post(url, json=payload)
-        r.raise_for_status()
-        return r.json()
-
-    # Create links between R1 and SW1 (3 links)
-    for idx, (r_adapter, s_adapter) in enumerate(R1_SW_PORTS):
-        print(f"Linking router adapter {r_adapter} to switch adapter {s_adapter}")
-        create_link(id_map[ROUTER_NAME], r_adapter, 0, id_map[SWITCH_NAME], s_adapter, 0)
-
-    # Create links from switch to PCs
-    # We assume VPCS templates create a single adapter with adapter_number 0 and port_number 0
-    # We'll map each PC to an adapter index on the switch as indicated in SW_PC_PORTS
-    for (sw_adapter, pc_name) in SW_PC_PORTS:
-        print(f"Linking switch adapter {sw_adapter} to {pc_name}")
-        create_link(id_map[SWITCH_NAME], sw_adapter, 0, id_map[pc_name], 0, 0)
-
-    print("Links created. Starting nodes...")
-
-    # Start nodes
-    for node in nodes:
-        node_obj = Node(name=node["name"], project_id=proj.project_id, connector=connector)
-        node_obj.node_id = node["node_id"]
-        try:
-            node_obj.start()
-            print("Started", node["name"])
-        except Exception as e:
-            print("Warning: could not start node", node["name"], e)
-
-    # Wait a bit for consoles to be available
-    time.sleep(5)
-
-    # Get node details (to read console_host and console port)
-    nodes_detail = requests.get(f"{GNS3_SERVER}/v2/projects/{proj.project_id}/nodes").json()
-    node_info = {n["name"]: n for n in nodes_detail}
-
-    # Prepare router configuration commands
-    router_cmds = []
-    # Set up each router interface with the last usable gateway address for each VLAN
-    vlan_list = sorted(VLAN_INFO.keys())
-    for idx, vlan in enumerate(vlan_list):
-        info = VLAN_INFO[vlan]
-        gw = last_usable_address(info["network"])
-        iface = ROUTER_IFACES[idx] if idx < len(ROUTER_IFACES) else f"GigabitEthernet0/{idx}"
-        router_cmds.append(f"interface {iface}")
-        router_cmds.append(f" description Link-to-SW1-VLAN{vlan}")
-        router_cmds.append(f" ip address {gw} {SUBNET_MASK}")
-        router_cmds.append(" no shutdown")
-
-    # Add a basic hostname and disable domain lookup for cleaner console
-    router_full_cfg = ["conf t", f"hostname {ROUTER_NAME}", "no ip domain-lookup"] + router_cmds + ["end", "wr"]
-
-    # Prepare switch configuration commands (IOSv-L2)
-    # We'll create VLANs and assign switch ports to VLANs (access)
-    sw_cmds = ["conf t", f"hostname {SWITCH_NAME}"]
-    for vlan in vlan_list:
-        info = VLAN_INFO[vlan]
-        sw_cmds.append(f"vlan {vlan}")
-        sw_cmds.append(f" name {info['name']}")
-    # Map switch adapter numbers to VLANs:
-    # We used SW adapters 0..2 for trunk to router (actually router links are access per requirement, each in its own VLAN)
-    # We'll make those switch ports access ports in the respective VLANs
-    # adapter 0 -> VLAN10, adapter1->VLAN20, adapter2->VLAN30
-    sw_adapter_to_vlan = {0: 10, 1: 20, 2: 30}
-    # Assign PC ports to VLANs:
-    # SW adapter 3 & 4 -> VLAN10 (PC1, PC2)
-    # SW adapter 5 & 6 -> VLAN20 (PC3, PC4)
-    # SW adapter 7 & 8 -> VLAN30 (PC5, PC6)
-    port_vlan_map = {
-        3: 10, 4: 10,
-        5: 20, 6: 20,
-        7: 30, 8: 30
-    }
-    # configure interfaces on switch
-    # Interface naming depends on IOSv-L2 image; commonly GigabitEthernet0/<n>
-    for adapter, vlan in sw_adapter_to_vlan.items():
-        sw_cmds.append(f"interface GigabitEthernet0/{adapter}")
-        sw_cmds.append(f" description Link-to-R1-VLAN{vlan}")
-        sw_cmds.append(" switchport mode access")
-        sw_cmds.append(f" switchport access vlan {vlan}")
-        sw_cmds.append(" no shutdown")
-    for adapter, vlan in port_vlan_map.items():
-        sw_cmds.append(f"interface GigabitEthernet0/{adapter}")
-        sw_cmds.append(f" description Host-port VLAN{vlan}")
-        sw_cmds.append(" switchport mode access")
-        sw_cmds.append(f" switchport access vlan {vlan}")
-        sw_cmds.append(" no shutdown")
-
-    sw_cmds += ["end", "wr"]
-    switch_full_cfg = sw_cmds
-
-    # Push configs to router
-    r_info = node_info.get(ROUTER_NAME)
-    if r_info is None:
-        raise RuntimeError("Could not find router node info in project.")
-    r_console_host = r_info.get("console_host", "127.0.0.1")
-    r_console_port = r_info.get("console")
-    print(f"Router console at {r_console_host}:{r_console_port}, waiting for availability...")
-    if not wait_for_telnet(r_console_host, r_console_port, timeout=30):
-        print("Warning: router console not available within timeout.")
-    else:
-        print("Pushing router configuration...")
-        out = send_ios_commands_via_telnet(r_console_host, r_console_port, router_full_cfg, wait_after=1)
-        print("Router config output excerpt:\n", out[:1000])
-
-    # Push configs to switch
-    s_info = node_info.get(SWITCH_NAME)
-    if s_info is None:
-        raise RuntimeError("Could not find switch node info in project.")
-    s_console_host = s_info.get("console_host", "127.0.0.1")
-    s_console_port = s_info.get("console")
-    print(f"Switch console at {s_console_host}:{s_console_port}, waiting for availability...")
-    if not wait_for_telnet(s_console_host, s_console_port, timeout=30):
-        print("Warning: switch console not available within timeout.")
-    else:
-        print("Pushing switch configuration...")
-        out = send_ios_commands_via_telnet(s_console_host, s_console_port, switch_full_cfg, wait_after=1)
-        print("Switch config output excerpt:\n", out[:1000])
-
-    # Configure VPCS hosts
-    # VPCS consoles: fetch console info from node_info for each PC
-    for pc_name in PC_NAMES:
-        p_info = node_info.get(pc_name)
-        if p_info is None:
-            print("Could not find PC node info for", pc_name)
-            continue
-        phost = p_info.get("console_host", "127.0.0.1")
-        pport = p_info.get("console")
-        # compute IP and default gateway from VLAN assignments
-        # find which VLAN the PC belongs to by matching PC_NAMES order to VLAN_INFO pc_ips
-        assigned_ip = None
-        assigned_gw = None
-        for vlan, info in VLAN_INFO.items():
-            if pc_name in PC_NAMES:
-                # check if this PC should have an IP in this VLAN by matching listed PC_IPs order
-                for idx, ip in enumerate(info["pc_ips"]):
-                    # map: PC1->first ip of VLAN10 etc by overall order
-                    # We'll map PC indices to the order given in PC_NAMES
-                    # Simpler: assign sequentially in PC_NAMES order based on VLAN ordering
-                    pass
-        # Instead of complex mapping, use explicit mapping order:
-    # We'll map PC1->VLAN10 .1, PC2->VLAN10 .2, PC3->VLAN20 .65, PC4->VLAN20 .66, PC5->VLAN30 .129, PC6->VLAN30 .130
-    pc_ip_assignments = {
-        "PC1": ("10.0.0.1", "10.0.0.62"),
-        "PC2": ("10.0.0.2", "10.0.0.62"),
-        "PC3": ("10.0.0.65", "10.0.0.126"),
-        "PC4": ("10.0.0.66", "10.0.0.126"),
-        "PC5": ("10.0.0.129", "10.0.0.190"),
-        "PC6": ("10.0.0.130", "10.0.0.190"),
-    }
-    for pc_name, (pip, pgw) in pc_ip_assignments.items():
-        p_info = node_info.get(pc_name)
-        if not p_info:
-            print("Missing node info for", pc_name)
-            continue
-        phost = p_info.get("console_host", "127.0.0.1")
-        pport = p_info.get("console")
-        print(f"Configuring {pc_name} at {phost}:{pport} -> IP {pip} GW {pgw}")
-        if not wait_for_telnet(phost, pport, timeout=20):
-            print("Warning: VPCS console not available for", pc_name)
-            continue
-        vcmds = [
-            f"ip {pip} {SUBNET_MASK}",
-            f"gateway {pgw}",
-            "save"
-        ]
-        out = send_vpcs_commands(phost, pport, vcmds)
-        print(pc_name, "vpcs response excerpt:", out[:200])
-
-    # Allow some time for network convergence
-    print("Waiting a few seconds for interfaces to settle...")
-    time.sleep(5)
-
-    # Run ping tests from VPCS (using VPCS console)
-    def vpcs_ping(pc_name, dest):
-        p_info = node_info.get(pc_name)
-        if not p_info:
-            return False, "no node info"
-        phost = p_info.get("console_host", "127.0.0.1")
-        pport = p_info.get("console")
-        if not wait_for_telnet(phost, pport, timeout=10):
-            return False, "no telnet"
-        cmds = [f"ping {dest}", "exit"]
-        out = send_vpcs_commands(phost, pport, cmds)
-        return True, out
-
-    print("Running basic connectivity tests (ping from PC1->PC3 etc)...")
-    tests = [("PC1", "10.0.0.65"), ("PC3", "10.0.0.1"), ("PC5", "10.0.0.129")]
-    for src, dst in tests:
-        ok, result = vpcs_ping(src, dst)
-        print(f"{src} -> {dst} ping result (ok={ok}):\n{result}")
-
-    print("Automation complete. Please verify in GNS3 GUI and adjust template names if needed.")
+        lab = build_lab(args.vlans, args.hosts_per_vlan, args.base_prefix, args.prefixlen or None,
+                        args.first_vlan, args.vlan_step)
+    except ValueError as e:
+        raise SystemExit(f"Cannot build the lab: {e}")
+    spec = build_lab_spec(lab)
+    print(f"Address plan and configs built in {TRACE.add_span('plan', t0) * 1000:.1f} ms:")
+    print(describe_lab(lab))
+    if args.plan_only:
+        return
+
+    try:
+        run_lab(lab, spec, verify=args.verify, samples=args.samples, window=args.config_window,
+                golden=not args.no_golden)
+        print("Automation complete. Please verify in GNS3 GUI and adjust template names if needed.")
+    finally:
+        # Where the time went, even if the run failed part-way
+        print(TRACE.summary())
+        trace_path = TRACE.export(args.trace or REPORT_DIR / time.strftime("trace-%Y%m%d-%H%M%S.json"))
+        print("Trace written to", trace_path, "(open in chrome://tracing or ui.perfetto.dev)")
 
 if __name__ == "__main__":
     main()
-